@@ -0,0 +1,112 @@
+"""
+Memory benchmark for long arrangements: streamed to a file vs built in memory.
+
+Renders arrangements of growing length (8-bar blocks, every block distinct by
+default, the worst case for the cell deduplication) and reports wall time,
+tracemalloc peak and file size for:
+
+    stream   ArrangementService.write_arrangement into a temporary file
+    bytes    generate_arrangement(output='bytes')
+    mido     generate_arrangement() -> mido.MidiFile (every message a Python object)
+
+The stream peak should stay flat as the song grows; the other two grow with it.
+Stage histograms keep a bounded reservoir of recent samples (utils.metrics);
+they are filled before measuring so their growth is not counted as
+arrangement memory. The cell cache is off unless --cell-cache is given (it holds up to that many
+cells on top of the streaming buffers), and every track chunk is kept in memory
+up to --spool-kb before it spills to disk.
+
+Reference peaks (1 CPU, every 8-bar block filled end to end):
+     bars   stream      bytes       mido      file
+      512   164 KB     277 KB    24.2 MB    129 KB
+     2048   223 KB     773 KB          -    521 KB
+
+Usage (from backend/):
+    python benchmarks/bench_arrangement_stream.py
+    python benchmarks/bench_arrangement_stream.py --bars 64 512 --modes stream bytes --repeat 3
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.arrangement_service import TRACKS_CONFIG, ArrangementService
+from services.integrated_midi_generator import IntegratedMidiGenerator
+
+BLOCK_BARS = 8
+SECTIONS = ['intro', 'verse', 'chorus', 'drop', 'bridge', 'breakdown', 'build', 'outro']
+MODES = ['stream', 'bytes', 'mido']
+RESERVOIR = 2048  # utils.metrics.Histogram default reservoir_size
+
+
+def make_structure(bars: int, repeat_sections: bool) -> list:
+    blocks = []
+    for index in range(max(1, bars // BLOCK_BARS)):
+        section = SECTIONS[index % len(SECTIONS)]
+        # Distinct blocks unless repeats are asked for: each one gets its own type
+        blocks.append({'type': section if repeat_sections else f"{section}_{index}", 'bars': BLOCK_BARS})
+    return blocks
+
+
+def fill_metric_reservoirs(service: ArrangementService, style: str) -> None:
+    structure = make_structure(BLOCK_BARS * 64, repeat_sections=False)
+    for seed in range(-(-RESERVOIR // (len(structure) * len(TRACKS_CONFIG)))):
+        service.generate_arrangement(structure, style, seed=seed, output='bytes')
+
+
+def run_mode(service: ArrangementService, mode: str, structure: list, style: str, seed: int) -> int:
+    if mode == 'stream':
+        with tempfile.TemporaryFile() as out:
+            return service.write_arrangement(out, structure, style, seed=seed)
+    if mode == 'bytes':
+        return len(service.generate_arrangement(structure, style, seed=seed, output='bytes'))
+    midi = service.generate_arrangement(structure, style, seed=seed)
+    return sum(len(track) for track in midi.tracks)
+
+
+def measure(service: ArrangementService, mode: str, structure: list, style: str, repeat: int):
+    timings = []
+    for seed in range(repeat):
+        started = time.perf_counter()
+        size = run_mode(service, mode, structure, style, seed)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    run_mode(service, mode, structure, style, 0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / 1024, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, nargs='+', default=[64, 128, 256, 512])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--style', default='techno')
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--repeat-sections', action='store_true',
+                        help="cycle through 8 section types instead of making every block distinct")
+    parser.add_argument('--cell-cache', type=int, default=0)
+    parser.add_argument('--spool-kb', type=int, default=16)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    service = ArrangementService(IntegratedMidiGenerator(), cache_size=args.cell_cache,
+                                 spool_bytes=args.spool_kb * 1024)
+    fill_metric_reservoirs(service, args.style)
+    print(f"{'bars':>5} {'mode':>7} {'best ms':>9} {'peak KB':>9} {'size':>9}")
+    for bars in args.bars:
+        structure = make_structure(bars, args.repeat_sections)
+        for mode in args.modes:
+            best, peak_kb, size = measure(service, mode, structure, args.style, args.repeat)
+            unit = 'msgs' if mode == 'mido' else 'B'
+            print(f"{bars:>5} {mode:>7} {best:>9.1f} {peak_kb:>9.0f} {size:>7} {unit}")
+
+
+if __name__ == '__main__':
+    main()
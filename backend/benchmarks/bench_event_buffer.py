@@ -0,0 +1,118 @@
+"""
+Before/after benchmark for the columnar EventBuffer pipeline.
+
+Runs the same post-processing chain (ghost notes -> groove -> velocity curve ->
+articulations -> humanization) once on the legacy list-of-dicts events and once
+on an EventBuffer, and reports latency plus allocation counts (tracemalloc).
+
+Usage (from backend/):
+    python benchmarks/bench_event_buffer.py
+    python benchmarks/bench_event_buffer.py --bars 8 64 256 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.event_buffer import EventBuffer
+from services.generation_context import GenerationContext
+from services.groove_engine import GrooveEngine
+from services.humanization_engine import HumanizationEngine
+from services.production_engine import ProductionEngine
+from services.rhythm_engine import RhythmEngine
+
+STYLE = 'techno'
+KIT = {'kick': 36, 'snare': 38, 'hat': 42, 'perc': 39}
+
+
+def make_dict_events(bars: int, seed: int = 0):
+    """Legacy representation: one dict per 16th-note hit of a 4-piece kit."""
+    rng = random.Random(seed)
+    events = []
+    for step in range(bars * 16):
+        for name, pitch in KIT.items():
+            if rng.random() < 0.5:
+                events.append({
+                    'time': step * 0.25,
+                    'duration': 0.25,
+                    'velocity': rng.randint(90, 110),
+                    'pitch': pitch,
+                    'channel': 9,
+                    'instrument_type': name,
+                })
+    return events
+
+
+class Pipeline:
+    def __init__(self):
+        self.rhythm = RhythmEngine()
+        self.groove = GrooveEngine()
+        self.production = ProductionEngine()
+        self.humanizer = HumanizationEngine()
+
+    def run(self, events, ctx):
+        events = self.rhythm.add_ghost_notes(events, STYLE, ctx=ctx)
+        events = self.groove.apply_groove(events, STYLE, 0.6, ctx=ctx)
+        events = self.production.velocity.apply_velocity_curve(events, 'natural', ctx=ctx)
+        events = self.production.articulation.add_articulations(events, STYLE, ctx=ctx)
+        return self.humanizer.humanize_midi(events, ctx=ctx)
+
+
+def measure(fn, make_input, repeat: int):
+    # Latency (input construction excluded)
+    timings = []
+    for i in range(repeat):
+        events = make_input()
+        ctx = GenerationContext(i)
+        start = time.perf_counter()
+        fn(events, ctx)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Peak traced memory and net new memory blocks for a single run
+    events = make_input()
+    ctx = GenerationContext(0)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn(events, ctx)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return {
+        'p50_ms': statistics.median(timings),
+        'max_ms': max(timings),
+        'peak_kb': peak / 1024,
+        'allocations': allocations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, nargs='+', default=[4, 16, 64, 256])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    pipeline = Pipeline()
+    print(f"{'bars':>5} {'events':>7} {'impl':>7} {'p50 ms':>9} {'max ms':>9} {'peak KB':>9} {'allocs':>8}")
+    for bars in args.bars:
+        template = make_dict_events(bars)
+        buffer_template = EventBuffer.from_dicts(template)
+        results = {
+            'dicts': measure(pipeline.run, lambda: [dict(e) for e in template], args.repeat),
+            'buffer': measure(pipeline.run, buffer_template.copy, args.repeat),
+        }
+        for impl, r in results.items():
+            print(f"{bars:>5} {len(template):>7} {impl:>7} {r['p50_ms']:>9.2f} {r['max_ms']:>9.2f} "
+                  f"{r['peak_kb']:>9.1f} {r['allocations']:>8}")
+        speedup = results['dicts']['p50_ms'] / max(results['buffer']['p50_ms'], 1e-9)
+        print(f"{'':>5} {'':>7} {'speedup':>7} {speedup:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-request generator construction overhead, before/after the generator registry.
+
+"per-request" builds the generator inside every request (the old route code),
+"registry" takes the shared instance from generator_registry. Both then render
+the same small seeded pattern, so the difference is the construction cost that
+the registry removes. Construction alone is also reported per generator.
+
+Usage (from backend/):
+    python benchmarks/bench_generator_construction.py
+    python benchmarks/bench_generator_construction.py --repeat 200 --bars 1 4
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.arrangement_service import ArrangementService
+from services.generator_registry import generator_registry
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.midi_generator import MidiGenerator
+
+CONSTRUCTORS = {
+    'IntegratedMidiGenerator': lambda: IntegratedMidiGenerator(enable_humanization=True),
+    'MidiGenerator': MidiGenerator,
+    'ArrangementService': ArrangementService,
+}
+
+
+def percentiles(timings_ms):
+    ordered = sorted(timings_ms)
+    p99_index = min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))
+    return statistics.median(ordered), ordered[p99_index]
+
+
+def time_calls(fn, repeat: int):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--bars', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'construction':<26} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, build in CONSTRUCTORS.items():
+        p50, p99 = time_calls(lambda _i: build(), args.repeat)
+        print(f"{name:<26} {p50:>9.3f} {p99:>9.3f}")
+
+    generator_registry.prewarm()
+    print()
+    print(f"{'bars':>5} {'mode':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for bars in args.bars:
+        def request(generator, i):
+            generator.generate(description="techno drums", style='techno', instrument='drums', bars=bars, seed=i)
+
+        modes = {
+            'per-request': lambda i: request(IntegratedMidiGenerator(enable_humanization=True), i),
+            'registry': lambda i: request(generator_registry.get('integrated'), i),
+        }
+        results = {mode: time_calls(fn, args.repeat) for mode, fn in modes.items()}
+        for mode, (p50, p99) in results.items():
+            print(f"{bars:>5} {mode:>12} {p50:>9.3f} {p99:>9.3f}")
+        saved = [before - after for before, after in zip(results['per-request'], results['registry'])]
+        print(f"{'':>5} {'saved':>12} {saved[0]:>9.3f} {saved[1]:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
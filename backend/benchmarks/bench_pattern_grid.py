@@ -0,0 +1,125 @@
+"""
+DNA pattern rendering: the old per-step Python loop vs the vectorized grid.
+
+"loop" is the pre-vectorization generate_pattern_with_dna (one probability,
+one velocity and one random() roll per step, recursive kit), kept here as a
+reference; "grid" is AdvancedPatternGenerator.generate_pattern_with_dna.
+Both render the same style/instrument/DNA with the same seeds.
+
+Usage (from backend/):
+    python benchmarks/bench_pattern_grid.py
+    python benchmarks/bench_pattern_grid.py --bars 4 16 64 --instrument hat --repeat 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import style_tables
+from services.advanced_midi_generator import AdvancedPatternGenerator, PatternDNA, QUARTER_NOTES
+from services.generation_context import GenerationContext
+
+
+def loop_probability(base_value, density, position, evolution):
+    prob = float(base_value)
+    if density < 0.3:
+        prob *= (0.7 + density * 0.3) if position % 4 == 0 else (density * 2)
+    elif density < 0.7:
+        prob *= (0.5 + density * 0.7)
+    else:
+        prob *= (0.8 + density * 0.2)
+        if position % 2 == 1 and base_value == 0:
+            prob += (density - 0.7) * 0.5
+    if evolution > 0:
+        prob += evolution * 0.2 * np.sin((position / 64) * np.pi * 2)
+    return np.clip(prob, 0, 1)
+
+
+def loop_velocity(position, curve_type, complexity, rng):
+    base_velocity = 100
+    if curve_type == 'accent':
+        base_velocity = 120 if (position % 16) in [0, 8] else 90
+    elif curve_type == 'exponential':
+        base_velocity = 60 + (position % 16) * 3
+    elif curve_type == 'random':
+        base_velocity = rng.randint(70, 110)
+    humanization = rng.randint(-int(10 * complexity + 1), int(10 * complexity + 1))
+    return int(np.clip(base_velocity + humanization, 1, 127))
+
+
+def loop_pattern(style, instrument, dna, bars, phrase_offset, rng):
+    """The per-step implementation replaced by the grid renderer."""
+    if instrument in ['full_kit', 'full_drums', 'drums']:
+        events = []
+        for component in ['kick', 'snare', 'hat']:
+            events.extend(loop_pattern(style, component, dna, bars, phrase_offset, rng))
+        events.sort(key=lambda x: x['time'])
+        return events
+
+    base_pattern = style_tables.pattern(style, instrument)
+    if not base_pattern.any():
+        base_pattern = QUARTER_NOTES
+    events = []
+    for bar in range(bars):
+        for step in range(16):
+            position = bar * 16 + step
+            base_value = base_pattern[step]
+            hit_probability = loop_probability(base_value, dna.density, position, dna.evolution)
+            if style in ['jazz', 'neo_soul'] and instrument not in ['kick'] and step in [0, 8]:
+                hit_probability *= 0.3
+            if instrument not in ['kick', 'snare', 'hat', 'perc'] and dna.density < 0.5:
+                hit_probability = 1.0 if base_value else 0.0
+            if rng.random() < hit_probability:
+                velocity = loop_velocity(position, dna.velocity_curve, dna.complexity, rng)
+                duration = 0.125 if instrument in ['hat', 'shake', 'arp'] else 1.0 if instrument in ['pad', 'chords'] else 0.25
+                raw_time = position * 0.25 + phrase_offset
+                events.append({'time': raw_time, 'velocity': velocity, 'duration': duration,
+                               'probability': hit_probability, 'instrument_type': instrument})
+                if instrument in ['snare', 'hat'] and dna.complexity > 0.6 and rng.random() < (dna.complexity - 0.5):
+                    events.append({'time': raw_time + 0.125, 'velocity': int(velocity * 0.4), 'duration': 0.0625,
+                                   'probability': 0.5, 'instrument_type': instrument})
+    return events
+
+
+def measure(fn, repeat: int):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(GenerationContext(i))
+        timings.append((time.perf_counter() - start) * 1000)
+    ordered = sorted(timings)
+    return statistics.median(ordered), ordered[min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--style', default='techno')
+    parser.add_argument('--instrument', default='drums')
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    generator = AdvancedPatternGenerator()
+    dna = PatternDNA(density=0.8, complexity=0.7, groove=0.3, velocity_curve='accent', evolution=0.4)
+    print(f"{'bars':>5} {'events':>7} {'impl':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for bars in args.bars:
+        events = generator.generate_pattern_with_dna(args.style, args.instrument, dna, bars, 0.0, ctx=GenerationContext(0))
+        results = {
+            'loop': measure(lambda ctx: loop_pattern(args.style, args.instrument, dna, bars, 0.0, ctx.rng), args.repeat),
+            'grid': measure(lambda ctx: generator.generate_pattern_with_dna(
+                args.style, args.instrument, dna, bars, 0.0, ctx=ctx), args.repeat),
+        }
+        for impl, (p50, p99) in results.items():
+            print(f"{bars:>5} {len(events):>7} {impl:>7} {p50:>9.3f} {p99:>9.3f}")
+        print(f"{'':>5} {'':>7} {'speedup':>7} {results['loop'][0] / max(results['grid'][0], 1e-9):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
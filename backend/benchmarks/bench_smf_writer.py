@@ -0,0 +1,61 @@
+"""
+Output encoding benchmark: mido objects + MidiFile.save() vs services.smf_writer.
+
+Both paths encode the same EventBuffer with the same seed (the outputs are
+byte-identical); only the final "events -> .mid bytes" step is timed.
+
+Usage (from backend/):
+    python benchmarks/bench_smf_writer.py
+    python benchmarks/bench_smf_writer.py --bars 4 16 64 --repeat 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.event_buffer import EventBuffer
+from services.generation_context import GenerationContext
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.smf_writer import midi_file_bytes
+
+from bench_event_buffer import make_dict_events
+
+
+def measure(fn, repeat: int):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(GenerationContext(i))
+        timings.append((time.perf_counter() - start) * 1000)
+    ordered = sorted(timings)
+    return statistics.median(ordered), ordered[min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    generator = IntegratedMidiGenerator()
+    print(f"{'bars':>5} {'events':>7} {'encoder':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for bars in args.bars:
+        events = EventBuffer.from_dicts(make_dict_events(bars))
+        assert (generator._events_to_smf(events, 120, GenerationContext(0))
+                == midi_file_bytes(generator._events_to_midi(events, 120, GenerationContext(0))))
+        results = {
+            'mido': measure(lambda ctx: midi_file_bytes(generator._events_to_midi(events, 120, ctx)), args.repeat),
+            'native': measure(lambda ctx: generator._events_to_smf(events, 120, ctx), args.repeat),
+        }
+        for encoder, (p50, p99) in results.items():
+            print(f"{bars:>5} {len(events):>7} {encoder:>7} {p50:>9.3f} {p99:>9.3f}")
+        print(f"{'':>5} {'':>7} {'speedup':>7} {results['mido'][0] / max(results['native'][0], 1e-9):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""
+Generation benchmark suite: every style x instrument x section x bar count.
+
+Sweeps IntegratedMidiGenerator.SUPPORTED_STYLES, drum and melodic instruments,
+sub_option sections and bar counts through IntegratedMidiGenerator.generate
+(output='bytes', the path the API uses) with fixed seeds 0..repeat-1, and
+reports per case:
+    p50/p99/max latency (ms), events (note-ons in the output), events/s,
+    peak traced memory (KB, tracemalloc, one extra run) and the mean
+    per-stage breakdown from utils.stage_timer.
+Cases are also aggregated per style / instrument / section / bars and overall.
+
+Usage (from backend/):
+    python benchmarks/bench_suite.py --json bench.json
+    python benchmarks/bench_suite.py --styles techno trap --bars 4 16 --repeat 5
+    python benchmarks/bench_suite.py --compare bench.json            # run, then compare
+    python benchmarks/bench_suite.py --compare bench.json --current new.json
+
+Compare mode flags a case (or aggregate) as a regression when its p50 latency
+grows by more than --threshold (relative) AND --min-delta-ms (absolute), or its
+peak memory grows by more than --threshold; the exit status is 1 if anything
+regressed, so it can gate CI.
+
+Reference bar sweep (--bars 4 8 16 32 --repeat 3, all styles, 1 CPU), taken
+after phrase structures were fixed to fill every requested bar. Numbers from
+before that fix are not comparable: they rendered about 45 notes at any length.
+    bars   p50 ms   p99 ms   notes/case   events/s   peak KB
+       4     1.46     2.78           44      29466      61.1
+       8     1.46     3.70           87      55680     106.8
+      16     1.73     6.17          174      90944     198.3
+      32     2.15    11.74          347     135052     381.2
+"""
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+import mido
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from utils.stage_timer import collect_stages
+
+SCHEMA_VERSION = 1
+
+DRUM_INSTRUMENTS = ['drums', 'kick', 'snare', 'hat']
+MELODIC_INSTRUMENTS = ['bass', 'lead', 'chords', 'pad']
+SECTIONS = ['intro', 'verse', 'chorus', 'drop', 'arp', 'chords']
+BARS = [4, 8]
+GROUPS = ('style', 'instrument', 'section', 'bars')
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile (0-100), same convention as utils.metrics."""
+    ordered = sorted(samples)
+    index = int(round(q / 100.0 * (len(ordered) - 1)))
+    return ordered[min(len(ordered) - 1, max(0, index))]
+
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    return {
+        'p50_ms': percentile(samples, 50),
+        'p90_ms': percentile(samples, 90),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': max(samples),
+    }
+
+
+def count_events(data: bytes) -> int:
+    """Note-ons (velocity > 0) in an encoded .mid file."""
+    midi = mido.MidiFile(file=io.BytesIO(data))
+    return sum(1 for track in midi.tracks for msg in track if msg.type == 'note_on' and msg.velocity > 0)
+
+
+def case_key(style: str, instrument: str, section: str, bars: int) -> str:
+    return f"{style}/{instrument}/{section}/{bars}"
+
+
+def run_case(generator: IntegratedMidiGenerator, style: str, instrument: str, section: str,
+             bars: int, repeat: int) -> Dict:
+    params = dict(description=f"{style} {instrument}", style=style, instrument=instrument,
+                  sub_option=section, bars=bars, output='bytes')
+    samples, stage_totals = [], {}
+    data = b''
+    for seed in range(repeat):
+        with collect_stages() as timings:
+            start = time.perf_counter()
+            data, _ = generator.generate(seed=seed, **params)
+            samples.append((time.perf_counter() - start) * 1000)
+        for stage, seconds in timings.stages.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    # Peak memory of one (seed 0) run, traced separately so tracing does not skew latency
+    tracemalloc.start()
+    generator.generate(seed=0, **params)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    events = count_events(data)  # last seed; seeds are fixed so this is reproducible
+    stats = latency_stats(samples)
+    return {
+        'style': style, 'instrument': instrument, 'section': section, 'bars': bars,
+        **stats,
+        'samples_ms': samples,
+        'events': events,
+        'events_per_sec': events / (stats['p50_ms'] / 1000) if stats['p50_ms'] > 0 else None,
+        'peak_kb': peak / 1024,
+        'stages_ms': {stage: seconds * 1000 / repeat for stage, seconds in stage_totals.items()},
+    }
+
+
+def summarize(cases: Iterable[Dict]) -> Dict:
+    """Aggregate latency over all samples of the given cases."""
+    cases = list(cases)
+    samples = [s for case in cases for s in case['samples_ms']]
+    events = sum(case['events'] * len(case['samples_ms']) for case in cases)
+    return {
+        'cases': len(cases),
+        **latency_stats(samples),
+        'mean_ms': statistics.fmean(samples),
+        'events_per_sec': events / (sum(samples) / 1000) if samples else None,
+        'peak_kb': max(case['peak_kb'] for case in cases),
+    }
+
+
+def run_suite(styles: List[str], instruments: List[str], sections: List[str], bars_list: List[int],
+              repeat: int, progress: bool = True) -> Dict:
+    generator = IntegratedMidiGenerator()
+    generator.generate(description="warm up", style='techno', instrument='drums', seed=0, output='bytes')
+
+    cases, errors = {}, {}
+    started = time.perf_counter()
+    for style in styles:
+        for instrument in instruments:
+            for section in sections:
+                for bars in bars_list:
+                    key = case_key(style, instrument, section, bars)
+                    try:
+                        cases[key] = run_case(generator, style, instrument, section, bars, repeat)
+                    except Exception as e:
+                        errors[key] = f"{type(e).__name__}: {e}"
+        if progress:
+            print(f"  {style:<12} done ({time.perf_counter() - started:.1f} s)", file=sys.stderr)
+
+    summary = {'overall': summarize(cases.values()) if cases else None}
+    for group in GROUPS:
+        values = dict.fromkeys(case[group] for case in cases.values())
+        summary[f'by_{group}'] = {
+            str(value): summarize(c for c in cases.values() if c[group] == value) for value in values
+        }
+
+    return {
+        'schema': SCHEMA_VERSION,
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'duration_s': time.perf_counter() - started,
+        },
+        'config': {'styles': styles, 'instruments': instruments, 'sections': sections,
+                   'bars': bars_list, 'repeat': repeat},
+        'summary': summary,
+        'cases': cases,
+        'errors': errors,
+    }
+
+
+# --- Compare ------------------------------------------------------------------
+
+def _worse(old: Dict, new: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    """Metrics on which `new` is significantly worse than `old`."""
+    worse = []
+    if new['p50_ms'] > old['p50_ms'] * (1 + threshold) and new['p50_ms'] - old['p50_ms'] > min_delta_ms:
+        worse.append('p50_ms')
+    if new['peak_kb'] > old['peak_kb'] * (1 + threshold):
+        worse.append('peak_kb')
+    return worse
+
+
+def _change(name: str, old: Dict, new: Dict, changed: List[str]) -> Dict:
+    return {
+        'name': name,
+        'metrics': changed,
+        'p50_ms': [old['p50_ms'], new['p50_ms']],
+        'peak_kb': [old['peak_kb'], new['peak_kb']],
+        'ratio': new['p50_ms'] / old['p50_ms'] if old['p50_ms'] else None,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.15, min_delta_ms: float = 0.5) -> Dict:
+    """
+    Compare two suite results. Cases present in both are compared one to one;
+    the aggregates (overall, per style/instrument/...) only when both runs swept
+    the same configuration, otherwise they would average different cases.
+    """
+    if baseline.get('schema') != current.get('schema'):
+        raise ValueError(f"Schema mismatch: baseline {baseline.get('schema')}, current {current.get('schema')}")
+
+    pairs = [(key, baseline['cases'][key], case) for key, case in current['cases'].items()
+             if key in baseline['cases']]
+    same_config = baseline['config'] == current['config']
+    if same_config and current['summary']['overall'] and baseline['summary']['overall']:
+        pairs.append(('overall', baseline['summary']['overall'], current['summary']['overall']))
+        for group in GROUPS:
+            old_group = baseline['summary'][f'by_{group}']
+            for value, new in current['summary'][f'by_{group}'].items():
+                if value in old_group:
+                    pairs.append((f'{group}={value}', old_group[value], new))
+
+    regressions, improvements = [], []
+    for name, old, new in pairs:
+        worse = _worse(old, new, threshold, min_delta_ms)
+        if worse:
+            regressions.append(_change(name, old, new, worse))
+            continue
+        better = _worse(new, old, threshold, min_delta_ms)
+        if better:
+            improvements.append(_change(name, old, new, better))
+
+    regressions.sort(key=lambda r: -(r['ratio'] or 0))
+    improvements.sort(key=lambda r: r['ratio'] or 0)
+    return {
+        'threshold': threshold,
+        'min_delta_ms': min_delta_ms,
+        'compared': len(pairs),
+        'same_config': same_config,
+        'missing': sorted(set(baseline['cases']) - set(current['cases'])),
+        'new': sorted(set(current['cases']) - set(baseline['cases'])),
+        'new_errors': sorted(set(current['errors']) - set(baseline['errors'])),
+        'regressions': regressions,
+        'improvements': improvements,
+    }
+
+
+# --- Report ---------------------------------------------------------------------
+
+def print_summary(result: Dict) -> None:
+    print(f"{'group':<24} {'cases':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'events/s':>10} {'peak KB':>9}")
+    summary = result['summary']
+    rows = [('overall', summary['overall'])]
+    for group in GROUPS:
+        rows.extend((f'{group}={value}', stats) for value, stats in summary[f'by_{group}'].items())
+    for name, stats in rows:
+        if stats is None:
+            continue
+        print(f"{name:<24} {stats['cases']:>6} {stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+              f"{stats['max_ms']:>8.2f} {stats['events_per_sec'] or 0:>10.0f} {stats['peak_kb']:>9.1f}")
+    by_error: Dict[str, List[str]] = {}
+    for key, error in result['errors'].items():
+        by_error.setdefault(error, []).append(key)
+    for error, keys in by_error.items():
+        styles = sorted({key.split('/')[0] for key in keys})
+        print(f"ERROR in {len(keys)} cases (styles: {', '.join(styles)}): {error}")
+
+
+def print_comparison(report: Dict) -> None:
+    print(f"Compared {report['compared']} cases/aggregates "
+          f"(threshold {report['threshold']:.0%}, min delta {report['min_delta_ms']} ms)")
+    if not report['same_config']:
+        print("  sweep configuration differs from the baseline: aggregates not compared")
+    for label in ('missing', 'new', 'new_errors'):
+        if report[label]:
+            print(f"  {label}: {len(report[label])} ({', '.join(report[label][:5])}...)")
+    for title, rows in (('REGRESSIONS', report['regressions']), ('improvements', report['improvements'])):
+        if not rows:
+            continue
+        print(f"{title}: {len(rows)}")
+        for row in rows[:25]:
+            old_ms, new_ms = row['p50_ms']
+            old_kb, new_kb = row['peak_kb']
+            print(f"  {row['name']:<36} p50 {old_ms:8.2f} -> {new_ms:8.2f} ms   "
+                  f"peak {old_kb:8.1f} -> {new_kb:8.1f} KB   [{', '.join(row['metrics'])}]")
+    if not report['regressions']:
+        print("No regressions.")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--styles', nargs='+', default=sorted(IntegratedMidiGenerator.SUPPORTED_STYLES))
+    parser.add_argument('--instruments', nargs='+', default=DRUM_INSTRUMENTS + MELODIC_INSTRUMENTS)
+    parser.add_argument('--sections', nargs='+', default=SECTIONS)
+    parser.add_argument('--bars', type=int, nargs='+', default=BARS)
+    parser.add_argument('--repeat', type=int, default=3, help='seeds per case (0..repeat-1)')
+    parser.add_argument('--json', metavar='PATH', help='write the full result as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against a stored result')
+    parser.add_argument('--current', metavar='PATH', help='with --compare: compare this file instead of running')
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative regression threshold')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='ignore p50 changes smaller than this')
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    if args.current:
+        with open(args.current) as f:
+            result = json.load(f)
+    else:
+        result = run_suite(args.styles, args.instruments, args.sections, args.bars, args.repeat)
+        print_summary(result)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(result, f, indent=1)
+            print(f"Wrote {args.json}")
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    report = compare(baseline, result, args.threshold, args.min_delta_ms)
+    print()
+    print_comparison(report)
+    return 1 if report['regressions'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
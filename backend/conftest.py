@@ -0,0 +1,22 @@
+"""
+Test session setup: everything the app writes at import or request time (the
+SQLite database, generated .mid files, the generation cache, test_output.als)
+goes to a temporary directory, never to the real storage/ or sql_app.db.
+Runs before any test module imports main, database or the routers.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+_test_root = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_test_root, 'sql_app.db')}"
+os.environ["STORAGE_DIR"] = os.path.join(_test_root, "storage", "midi_files")
+os.environ["GENERATION_CACHE_DIR"] = os.path.join(_test_root, "storage", "cache")
+# Relative paths (storage/exports, test_output.als) land in the temporary directory too
+os.chdir(_test_root)
+atexit.register(shutil.rmtree, _test_root, ignore_errors=True)
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -23,6 +23,22 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def add_missing_columns(metadata, bind=engine):
+    """
+    create_all() never alters existing tables: add nullable columns that were
+    added to the models since the table was created (ALTER TABLE ... ADD COLUMN).
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in metadata.tables.values():
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
 # Funcție helper pentru a obține o sesiune DB în endpoint-uri
 def get_db():
     db = SessionLocal()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, status, Body
+from fastapi import FastAPI, HTTPException, Depends, Request, status, Body, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from fastapi.security import OAuth2PasswordBearer
@@ -14,7 +14,7 @@ import logging
 from sqlalchemy.orm import Session
 from jose import jwt
 import traceback
-from database import engine
+from database import add_missing_columns, engine
 from models import models
 from models import analytics  # Import analytics models
 from models import social  # Import social/sharing models
@@ -23,6 +23,7 @@ from routers import auth
 from routers import download
 from routers.auth import get_db, get_current_user_email, oauth2_scheme
 from utils.security import ALGORITHM, SECRET_KEY
+from utils.midi_response import INLINE_HEADERS, generation_params, midi_response, persist_generation, wants_inline
 
 # Configurare Logging
 logger = logging.getLogger("uvicorn.error")
@@ -33,6 +34,7 @@ STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Crearea tabelelor în baza de date (including analytics, social, and projects)
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(models.Base.metadata)  # e.g. generations.generation_time_ms on older databases
 analytics.Base.metadata.create_all(bind=engine)  # Create analytics tables
 social.Base.metadata.create_all(bind=engine)  # Create social/sharing tables
 projects.Base.metadata.create_all(bind=engine)  # Create multi-track project tables
@@ -97,7 +99,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],  # Permite frontend-ului să citească headerul pentru download
+    expose_headers=INLINE_HEADERS,  # Permite frontend-ului să citească headerele pentru download / preview inline
 )
 
 # Includem rutele de autentificare
@@ -128,14 +130,35 @@ app.include_router(arrangement.router)
 from routers import analysis
 app.include_router(analysis.router)
 
+# Include Metrics router (generation latency / queue depth)
+from routers import metrics as metrics_router
+app.include_router(metrics_router.router)
+
+# Generation runs on a pool of warm workers, off the event loop
+from services.generation_executor import (
+    generation_executor, generate_midi_task, GenerationQueueFull
+)
+from services.single_flight import cached_generation
+from services.generator_registry import generator_registry
+
+@app.on_event("startup")
+def start_generation_executor():
+    generation_executor.start()
+
+@app.on_event("shutdown")
+def stop_generation_executor():
+    generation_executor.shutdown()
+    if generator_registry.is_built('arrangement'):
+        generator_registry.get('arrangement').shutdown()
+
 # Mount static files to serve MIDI files
 # 1. Asigură-te că folderul există fizic
-os.makedirs("storage/midi_files", exist_ok=True)
+os.makedirs(STORAGE_DIR, exist_ok=True)
 
 # 2. MONTAREA STATICĂ (Asta e cheia!)
 # Spunem serverului: "Când cineva cere URL-ul '/midi_files', dă-le fișierele din folderul 'storage/midi_files'"
-app.mount("/midi_files", StaticFiles(directory="storage/midi_files"), name="midi_files")
-app.mount("/storage", StaticFiles(directory="storage"), name="storage")
+app.mount("/midi_files", StaticFiles(directory=STORAGE_DIR), name="midi_files")
+app.mount("/storage", StaticFiles(directory=STORAGE_DIR.parent), name="storage")
 
 # Importuri pentru generarea MIDI
 from services.midi_generator import MidiGenerator
@@ -174,6 +197,7 @@ class MidiRequest(BaseModel):
     passing_tones: Optional[bool] = False
     ghost_notes: Optional[bool] = True
     bpm: Optional[int] = 120 # Added for filename and generation context
+    seed: Optional[int] = None # Same seed + same params -> same pattern (served from cache)
 
 
 # Auth helper moved to routers/auth.py
@@ -183,10 +207,19 @@ from utils.rate_limiter import generation_limiter
 @app.post("/api/generate/midi", dependencies=[Depends(generation_limiter)])
 async def generate_midi(
     request: MidiRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    inline: bool = False,
+    persist: bool = True,
     current_email: str = Depends(get_current_user_email),
     db: Session = Depends(get_db)
 ):
-    """Endpoint pentru generarea MIDI modulară cu control complet asupra tonalității (V2)"""
+    """
+    Endpoint pentru generarea MIDI modulară cu control complet asupra tonalității (V2)
+
+    ?inline=1 (sau Accept: audio/midi) returnează direct bytes-ii MIDI; fișierul și
+    istoricul se salvează după răspuns (background task), sau deloc cu ?persist=0.
+    """
     print(f"Incoming request: {request}") # Debugging
 
     # 1. Găsim userul în DB pe baza emailului din token
@@ -207,12 +240,9 @@ async def generate_midi(
     numeric_complexity = complexity_map.get(str(request.complexity).lower(), 0.6)
 
     try:
-        # 2. Folosim IntegratedMidiGenerator
-        generator = IntegratedMidiGenerator()
-        
+        # 2. Folosim IntegratedMidiGenerator (pe un worker din pool, nu pe event loop)
         # 3. Apelam functia de generare
-        # Note: IntegratedMidiGenerator.generate returns (midi_file, seed)
-        midi, seed = generator.generate(
+        params = dict(
             description=request.description,
             style=request.style,
             instrument=request.instrument, # Fallback
@@ -225,8 +255,13 @@ async def generate_midi(
             structure=request.structure,
             passing_tones=request.passing_tones,
             ghost_notes=request.ghost_notes,
-            bpm=request.bpm # Pass BPM to generator
+            bpm=request.bpm, # Pass BPM to generator
+            seed=request.seed
         )
+        # Cerere identica cu seed explicit -> bytes din cache (sau din generarea identica in curs)
+        result = await cached_generation("generate_midi", generate_midi_task, params)
+        seed = result.seed
+        stored_params = generation_params("generate_midi", params, seed=seed)
 
         # 4. Salvăm fișierul
         safe_key = request.musical_key.replace("#", "sharp")
@@ -250,13 +285,26 @@ async def generate_midi(
         # But wait, looking at line 212 call: I didn't pass bpm explicitly there!
         # I need to add bpm=request.bpm to the generate call too if I want it respected.
 
-        midi.save(file_path)
+        description = f"[{variant.upper()}] {request.musical_key} {request.musical_scale.title()} - {request.description}"
+
+        # Preview inline: bytes direct în răspuns, salvarea pe disc după (sau deloc)
+        if wants_inline(http_request, inline):
+            if persist:
+                background_tasks.add_task(persist_generation, file_path, result.midi_bytes, description, user.id,
+                                          result.generation_ms, stored_params, result.cached)
+            return midi_response(result.midi_bytes, filename, seed=seed,
+                                 url=f"/midi_files/{filename}" if persist else None)
+
+        file_path.write_bytes(result.midi_bytes)
 
         # 5. Salvăm în DB
         new_generation = models.Generation(
-            description=f"[{variant.upper()}] {request.musical_key} {request.musical_scale.title()} - {request.description}",
+            description=description,
             file_path=str(file_path),
-            user_id=user.id
+            user_id=user.id,
+            generation_time_ms=result.generation_ms,
+            cached=result.cached,
+            params=stored_params
         )
         db.add(new_generation)
         db.commit()
@@ -270,6 +318,8 @@ async def generate_midi(
             "seed": seed
         }
 
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"Error generating MIDI: {str(e)}")
         # Log traceback
@@ -293,7 +343,7 @@ async def generate_advanced(
     )
     
     # Generate with DNA
-    generator = AdvancedPatternGenerator()
+    generator = generator_registry.get('advanced')
     pattern = generator.generate_pattern_with_dna(
         style='techno',
         instrument='drums',
@@ -301,7 +351,7 @@ async def generate_advanced(
     )
     
     # Humanize
-    humanizer = HumanizationEngine()
+    humanizer = generator_registry.get('humanizer')
     pattern = humanizer.humanize_midi(pattern)
     
     return pattern
@@ -348,7 +398,7 @@ async def generate_variations(
     ai_params = brain.analyze_request(original.description)
 
     # 3. Generăm variațiile
-    generator = MidiGenerator()
+    generator = generator_registry.get('midi')
     variations_data = generator.create_variations(ai_params)
 
     response_variations = []
@@ -414,7 +464,7 @@ async def download_midi(
         # Dacă fișierul lipsește, îl regenerăm (fallback)
         brain = MusicIntelligence()
         ai_params = brain.analyze_request(gen.description)
-        generator = MidiGenerator()
+        generator = generator_registry.get('midi')
         # Default la full_drums pentru backward compatibility
         midi = generator.generate_track(ai_params, instrument_mode='full_drums')
 
@@ -459,7 +509,7 @@ async def download_project_bundle(
         # Fallback: regenerăm MIDI-ul dacă lipsește
         brain = MusicIntelligence()
         ai_params = brain.analyze_request(gen.description)
-        generator = MidiGenerator()
+        generator = generator_registry.get('midi')
         # Default la full_drums pentru backward compatibility
         midi = generator.generate_track(ai_params, instrument_mode='full_drums')
         midi.save(gen.file_path)
@@ -536,7 +586,7 @@ async def generate_ableton_project(
     ai_params['bpm'] = request.bpm  # Override cu BPM-ul cerut
 
     # 3. Generăm track-ul MIDI complet (full drums)
-    generator = MidiGenerator()
+    generator = generator_registry.get('midi')
     midi = generator.generate_track(ai_params, instrument_mode='full_drums')
 
     # 4. Salvăm MIDI-ul temporar
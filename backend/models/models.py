@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -34,6 +34,12 @@ class Generation(Base):
     description = Column(String)
     file_path = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Server-measured generation time (worker side, generate + encode); NULL when not generated here
+    generation_time_ms = Column(Integer, nullable=True)
+    # Served from the generation cache / another request's run: generation_time_ms is then this request's wait
+    cached = Column(Boolean, nullable=True)
+    # {'task': ..., 'params': {...}} incl. the seed: enough to re-render the file or edit part of it
+    params = Column(JSON, nullable=True)
     
     # Legătura cu User (Foreign Key)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -4,12 +4,17 @@ from typing import List, Dict, Optional
 from pydantic import BaseModel
 import mido
 import os
+import datetime
 from pathlib import Path
 import logging
 
 from routers.auth import get_db, get_current_user_email
 from models import models
-from services.arrangement_service import ArrangementService
+from services.admission_control import BATCH
+from services.generation_executor import (
+    generation_executor, generate_arrangement_task, regenerate_block_task, GenerationQueueFull
+)
+from utils.midi_response import generation_params, stored_midi_bytes
 
 # Config
 router = APIRouter(prefix="/api/generate/arrangement", tags=["arrangement"])
@@ -21,6 +26,7 @@ class ArrangementBlock(BaseModel):
     type: str # intro, verse, chorus, bridge, outro
     bars: int = 4
     intensity: str = "medium"
+    seed: Optional[int] = None # set when the block was regenerated on its own
 
 class ArrangementRequest(BaseModel):
     name: str = "My Song"
@@ -30,6 +36,11 @@ class ArrangementRequest(BaseModel):
     key: str = "C"
     scale: str = "minor"
     blocks: List[ArrangementBlock]
+    seed: Optional[int] = None
+
+class RegenerateBlockRequest(BaseModel):
+    block_index: int # 0-based index into the stored blocks
+    seed: Optional[int] = None # seed for the new block (None = random)
 
 @router.post("/")
 async def generate_arrangement(
@@ -45,31 +56,32 @@ async def generate_arrangement(
         raise HTTPException(status_code=401, detail="User not found")
 
     try:
-        # Use Service
-        service = ArrangementService()
-        
         # Convert Pydantic blocks to dicts
         structure = [b.dict() for b in request.blocks]
         
-        final_mid = service.generate_arrangement(
+        # ArrangementService runs on a warm executor worker, off the event loop
+        params = dict(
             structure=structure,
             style=request.style,
             key=request.key,
             scale=request.scale,
             bpm=request.bpm,
-            instrument=request.instrument
+            instrument=request.instrument,
+            seed=request.seed
         )
-
-        # Save
+        # Streamed straight into storage by the worker (long songs never sit in memory);
+        # scheduled as batch work so it does not hold up interactive previews
         filename = f"amc_Arrangement_{user.id}_{request.name.replace(' ', '_')}.mid"
         file_path = STORAGE_DIR / filename
-        final_mid.save(file_path)
+        result = await generation_executor.run(generate_arrangement_task, params, str(file_path), priority=BATCH)
         
         # Record
         new_gen = models.Generation(
             description=f"[ARRANGEMENT] {request.name} ({len(request.blocks)} blocks) - {request.key} {request.scale}",
             file_path=str(file_path),
-            user_id=user.id
+            user_id=user.id,
+            generation_time_ms=result.generation_ms,
+            params=generation_params("generate_arrangement", params, seed=result.seed)
         )
         db.add(new_gen)
         db.commit()
@@ -78,9 +90,85 @@ async def generate_arrangement(
             "url": f"/midi_files/{filename}",
             "filename": filename,
             "status": "success",
-            "blocks_processed": len(request.blocks)
+            "blocks_processed": len(request.blocks),
+            "generation_id": new_gen.id,
+            "seed": result.seed
         }
 
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Arrangement Service Failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/{generation_id}/regenerate-block")
+async def regenerate_block(
+    generation_id: int,
+    request: RegenerateBlockRequest,
+    current_email: str = Depends(get_current_user_email),
+    db: Session = Depends(get_db)
+):
+    """
+    Regenerate one block of a stored arrangement (all of its tracks) and splice
+    it into the stored file; the other blocks are kept as they are. Saved as a
+    new generation whose structure records the block's new seed.
+    """
+    user = db.query(models.User).filter(models.User.email == current_email).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    generation = db.query(models.Generation).filter(models.Generation.id == generation_id).first()
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    if generation.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to edit this generation")
+
+    stored = generation.params or {}
+    if stored.get("task") != "generate_arrangement":
+        raise HTTPException(status_code=400, detail="This generation has no stored arrangement parameters")
+    source = stored["params"]
+    structure = source["structure"]
+    if not 0 <= request.block_index < len(structure):
+        raise HTTPException(status_code=400, detail=f"block_index must be in 0..{len(structure) - 1}")
+
+    try:
+        # Batch work like the full render: without a stored file it re-renders the whole song
+        result = await generation_executor.run(regenerate_block_task, dict(
+            source=source, block_index=request.block_index, seed=request.seed,
+            base=stored_midi_bytes(db, generation)
+        ), priority=BATCH)
+
+        block = dict(structure[request.block_index], seed=result.seed)
+        new_structure = structure[:request.block_index] + [block] + structure[request.block_index + 1:]
+        timestamp = int(datetime.datetime.now().timestamp())
+        filename = f"{Path(generation.file_path).stem}_block{request.block_index + 1}_{timestamp}.mid"
+        file_path = STORAGE_DIR / filename
+        file_path.write_bytes(result.midi_bytes)
+
+        new_gen = models.Generation(
+            description=f"{generation.description} (block {request.block_index + 1} '{block.get('type')}' regenerated)",
+            file_path=str(file_path),
+            user_id=user.id,
+            generation_time_ms=result.generation_ms,
+            params=generation_params("generate_arrangement", source, structure=new_structure)
+        )
+        db.add(new_gen)
+        db.commit()
+
+        return {
+            "url": f"/midi_files/{filename}",
+            "filename": filename,
+            "status": "success",
+            "generation_id": new_gen.id,
+            "block_index": request.block_index,
+            "seed": result.seed
+        }
+
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Block regeneration failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
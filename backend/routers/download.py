@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 from services.packager_service import ProjectPackager
-from services.midi_generator import MidiGenerator # <--- Acum acest import va merge!
+from services.generator_registry import generator_registry
 import os
 import tempfile
 
@@ -9,7 +9,6 @@ router = APIRouter(prefix="/api/download", tags=["download"])
 
 # Instanțiem serviciile
 packager = ProjectPackager(assets_dir="assets") 
-midi_gen = MidiGenerator()
 
 @router.post("/package")
 async def download_package(
@@ -25,7 +24,7 @@ async def download_package(
 
         # 2. Generăm conținutul MIDI folosind generatorul
         # (Aici poți pune logică mai complexă pe viitor)
-        midi_gen.generate_simple_midi(temp_midi_path, bpm=bpm)
+        generator_registry.get('midi').generate_simple_midi(temp_midi_path, bpm=bpm)
 
         # 3. Creăm ZIP-ul Universal (Packager-ul știe să facă restul)
         zip_buffer = packager.create_universal_package(
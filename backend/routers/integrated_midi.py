@@ -2,10 +2,10 @@
 Router for IntegratedMidiGenerator endpoints
 Provides advanced MIDI generation with DNA-based patterns
 """
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Request, BackgroundTasks
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from sqlalchemy.orm import Session
 import os
 import datetime
@@ -13,7 +13,11 @@ from pathlib import Path
 import logging
 
 from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.generation_executor import generation_executor, generate_midi_task, regenerate_bars_task, GenerationQueueFull
+from services.single_flight import cached_generation
+from services.admission_control import INTERACTIVE, STANDARD
 from routers.auth import get_db
+from utils.midi_response import generation_params, midi_response, persist_generation, stored_midi_bytes, wants_inline
 from models import models
 from utils.security import ALGORITHM, SECRET_KEY
 from fastapi.security import OAuth2PasswordBearer
@@ -42,11 +46,11 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/integrated-midi", tags=["Integrated MIDI"])
 
 # Storage directory - MUST match main.py's STORAGE_DIR
-STORAGE_DIR = Path("storage/midi_files")
+STORAGE_DIR = Path(os.getenv("STORAGE_DIR", "storage/midi_files"))
 STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
-# Initialize generator (singleton pattern)
-midi_generator = IntegratedMidiGenerator(enable_humanization=True)
+# Generation runs on generation_executor's workers using the shared instances
+# from services.generator_registry; metadata endpoints only read class attributes.
 
 
 # Request/Response Models
@@ -91,6 +95,12 @@ class IntegratedMidiRequest(BaseModel):
         }
 
 
+class RegenerateBarsRequest(BaseModel):
+    """Request model for regenerating part of a stored pattern"""
+    bars: List[int] = Field(..., min_length=1, description="0-based indices of the bars to regenerate")
+    seed: Optional[int] = Field(None, description="Seed for the new bars (None=random)")
+
+
 class MidiGenerateResponse(BaseModel):
     """Response model for MIDI generation"""
     success: bool
@@ -105,6 +115,10 @@ class MidiGenerateResponse(BaseModel):
 @router.post("/generate", response_model=MidiGenerateResponse)
 async def generate_integrated_midi(
     request: IntegratedMidiRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    inline: bool = False,
+    persist: bool = True,
     current_email: str = Depends(get_current_user_email),
     db: Session = Depends(get_db)
 ):
@@ -117,7 +131,19 @@ async def generate_integrated_midi(
     - Humanization engine
     - Proper MIDI channel assignment
     - Complete parameter control
+
+    With ?inline=1 (or Accept: audio/midi) the .mid bytes are the response body
+    and the file/history row are saved after the response; ?persist=0 skips saving
+    (previews).
     """
+    return await _generate_integrated_midi(request, http_request, background_tasks, inline, persist,
+                                           current_email, db, priority=STANDARD)
+
+
+async def _generate_integrated_midi(request: IntegratedMidiRequest, http_request: Request,
+                                    background_tasks: BackgroundTasks, inline: bool, persist: bool,
+                                    current_email: str, db: Session, priority: str):
+    """/generate with the executor scheduling class of the calling route."""
     try:
         # Get user
         user = db.query(models.User).filter(models.User.email == current_email).first()
@@ -126,8 +152,8 @@ async def generate_integrated_midi(
 
         logger.info(f"Generating MIDI for user {user.email}: {request.description}")
 
-        # Generate MIDI using IntegratedMidiGenerator
-        midi_file, used_seed = midi_generator.generate(
+        # Generate MIDI using IntegratedMidiGenerator (off the event loop)
+        params = dict(
             description=request.description,
             style=request.style,
             instrument=request.instrument,
@@ -144,6 +170,11 @@ async def generate_integrated_midi(
             musical_key=request.musical_key,
             musical_scale=request.musical_scale
         )
+        # Seeded requests are deterministic: repeats come from the generation cache,
+        # identical concurrent ones share a single in-flight generation
+        result = await cached_generation("generate_midi", generate_midi_task, params, priority=priority)
+        used_seed = result.seed
+        stored_params = generation_params("generate_midi", params, seed=used_seed)
 
         # Generate filename
         timestamp = int(datetime.datetime.now().timestamp())
@@ -152,10 +183,6 @@ async def generate_integrated_midi(
         filename = f"{safe_description}_{request.instrument or 'pattern'}_{user.id}_{timestamp}.mid"
         file_path = STORAGE_DIR / filename
 
-        # Save MIDI file
-        midi_file.save(str(file_path))
-        logger.info(f"Saved MIDI to {file_path}")
-
         # Create description with metadata
         full_description = (
             f"[{request.instrument.upper() if request.instrument else 'PATTERN'}] "
@@ -164,11 +191,28 @@ async def generate_integrated_midi(
             f"({request.bpm} BPM, {request.bars} bars)"
         )
 
+        # Inline: return the bytes now, write file + history row after the response
+        if wants_inline(http_request, inline):
+            if persist:
+                background_tasks.add_task(persist_generation, file_path, result.midi_bytes,
+                                          full_description, user.id, result.generation_ms, stored_params,
+                                          result.cached)
+            return midi_response(result.midi_bytes, filename, seed=used_seed,
+                                 url=f"/storage/midi_files/{filename}" if persist else None,
+                                 tracks=result.track_count)
+
+        # Save MIDI file
+        file_path.write_bytes(result.midi_bytes)
+        logger.info(f"Saved MIDI to {file_path}")
+
         # Save to database
         new_generation = models.Generation(
             description=full_description,
             file_path=str(file_path),
-            user_id=user.id
+            user_id=user.id,
+            generation_time_ms=result.generation_ms,
+            cached=result.cached,
+            params=stored_params
         )
         db.add(new_generation)
         db.commit()
@@ -191,13 +235,16 @@ async def generate_integrated_midi(
                 "bars": request.bars,
                 "key": request.musical_key,
                 "scale": request.musical_scale,
-                "tracks": len(midi_file.tracks),
+                "tracks": result.track_count,
                 "used_dna": request.use_dna,
                 "humanized": request.humanize,
                 "seed": used_seed
             }
         )
 
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
     except ValueError as e:
         logger.error(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -207,6 +254,87 @@ async def generate_integrated_midi(
         raise HTTPException(status_code=500, detail=f"Failed to generate MIDI: {str(e)}")
 
 
+@router.post("/generations/{generation_id}/regenerate-bars", response_model=MidiGenerateResponse)
+async def regenerate_bars(
+    generation_id: int,
+    request: RegenerateBarsRequest,
+    current_email: str = Depends(get_current_user_email),
+    db: Session = Depends(get_db)
+):
+    """
+    Regenerate only some bars of a stored pattern; every other bar is kept exactly.
+
+    The stored .mid is the base (re-rendered from the stored parameters if the
+    file is gone), only the new bars are spliced in, and the result is saved as
+    a new generation whose parameters record the edit.
+    """
+    try:
+        user = db.query(models.User).filter(models.User.email == current_email).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        generation = db.query(models.Generation).filter(models.Generation.id == generation_id).first()
+        if not generation:
+            raise HTTPException(status_code=404, detail="Generation not found")
+        if generation.user_id != user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to edit this generation")
+
+        stored = generation.params or {}
+        if stored.get("task") != "generate_midi":
+            raise HTTPException(status_code=400, detail="This generation has no stored pattern parameters")
+        source = stored["params"]
+
+        result = await generation_executor.run(regenerate_bars_task, dict(
+            source=source, bars=request.bars, seed=request.seed, base=stored_midi_bytes(db, generation)
+        ))
+
+        bars = sorted(set(request.bars))
+        edits = source.get("edits", []) + [{"bars": bars, "seed": result.seed}]
+        timestamp = int(datetime.datetime.now().timestamp())
+        filename = f"{Path(generation.file_path).stem}_bars{'-'.join(str(bar + 1) for bar in bars)}_{timestamp}.mid"
+        file_path = STORAGE_DIR / filename
+        file_path.write_bytes(result.midi_bytes)
+
+        new_generation = models.Generation(
+            description=f"{generation.description} (bars {', '.join(str(bar + 1) for bar in bars)} regenerated)",
+            file_path=str(file_path),
+            user_id=user.id,
+            generation_time_ms=result.generation_ms,
+            params=generation_params("generate_midi", source, edits=edits)
+        )
+        db.add(new_generation)
+        db.commit()
+        db.refresh(new_generation)
+
+        return MidiGenerateResponse(
+            success=True,
+            generation_id=new_generation.id,
+            file_path=str(file_path),
+            download_url=f"/storage/midi_files/{filename}",
+            message=f"Regenerated {len(bars)} bar(s)",
+            metadata={
+                "source_generation_id": generation.id,
+                "bars": bars,
+                "seed": result.seed,
+                "tracks": result.track_count
+            }
+        )
+
+    except HTTPException:
+        raise
+
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        logger.error(f"Bar regeneration failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to regenerate bars: {str(e)}")
+
+
 @router.get("/download/{generation_id}")
 async def download_integrated_midi(
     generation_id: int,
@@ -250,7 +378,7 @@ async def download_integrated_midi(
 async def get_supported_styles():
     """Get list of supported music styles"""
     return {
-        "styles": list(midi_generator.SUPPORTED_STYLES),
+        "styles": list(IntegratedMidiGenerator.SUPPORTED_STYLES),
         "description": "Supported music styles for integrated MIDI generation"
     }
 
@@ -259,8 +387,8 @@ async def get_supported_styles():
 async def get_supported_instruments():
     """Get list of supported instruments"""
     return {
-        "drum_instruments": list(midi_generator.DRUM_INSTRUMENTS),
-        "melodic_instruments": list(midi_generator.MELODIC_INSTRUMENTS),
+        "drum_instruments": list(IntegratedMidiGenerator.DRUM_INSTRUMENTS),
+        "melodic_instruments": list(IntegratedMidiGenerator.MELODIC_INSTRUMENTS),
         "description": "Supported instruments for integrated MIDI generation"
     }
 
@@ -302,13 +430,19 @@ async def get_presets():
 @router.post("/quick-generate")
 async def quick_generate(
     description: str,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
     style: str = "techno",
+    seed: Optional[int] = None,
+    inline: bool = False,
+    persist: bool = True,
     current_email: str = Depends(get_current_user_email),
     db: Session = Depends(get_db)
 ):
     """
     Quick generate with minimal parameters.
     Uses smart defaults based on style.
+    Pass a seed to get a repeatable (and cacheable) pattern.
     """
     # Map style to common parameters
     style_defaults = {
@@ -330,7 +464,10 @@ async def quick_generate(
         style=style,
         bpm=defaults["bpm"],
         instrument=defaults["instrument"],
-        complexity=defaults["complexity"]
+        complexity=defaults["complexity"],
+        seed=seed
     )
 
-    return await generate_integrated_midi(request, current_email, db)
+    # Previews are interactive: they go ahead of arrangement renders
+    return await _generate_integrated_midi(request, http_request, background_tasks, inline, persist,
+                                           current_email, db, priority=INTERACTIVE)
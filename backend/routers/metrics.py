@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+
+from utils.metrics import metrics
+from utils.stage_timer import STAGE_HISTOGRAM
+from services.generation_executor import generation_executor
+from services.generation_cache import generation_cache
+from services.single_flight import generation_flights
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+
+@router.get("")
+def get_metrics():
+    """
+    In-process counters, gauges and latency histograms (seconds) for this worker,
+    plus the current generation executor configuration, cache usage and
+    single-flight coalescing (identical concurrent requests served by one run).
+    """
+    snapshot = metrics.snapshot()
+    snapshot["executor"] = {
+        "kind": generation_executor.kind,
+        "workers": generation_executor.workers,
+        "pool_size": generation_executor.pool_size,
+        "queue_size": generation_executor.queue_size,
+        "pending": generation_executor.pending,
+        "max_in_flight": generation_executor.admission.max_in_flight,
+        "in_flight": generation_executor.admission.in_flight,
+        "waiting": generation_executor.admission.waiting,
+        "queue_timeout": generation_executor.admission.queue_timeout,
+        "interactive_reserve": generation_executor.admission.interactive_reserve,
+        "classes": generation_executor.admission.stats(),
+    }
+    snapshot["cache"] = generation_cache.stats()
+    snapshot["single_flight"] = generation_flights.stats()
+    return snapshot
+
+
+@router.get("/stages")
+def get_stage_metrics():
+    """
+    Generation pipeline breakdown: the generation_stage_seconds histogram of
+    every stage (base_rhythm, ghost_notes, phrasing, pitch, ..., encode).
+    """
+    prefix = f"{STAGE_HISTOGRAM}{{stage="
+    histograms = metrics.snapshot()["histograms"]
+    return {
+        key[len(prefix):-1]: snapshot
+        for key, snapshot in histograms.items()
+        if key.startswith(prefix)
+    }
@@ -0,0 +1,263 @@
+"""
+Global admission control and priority scheduling for generation work on this worker.
+
+The per-IP rate limiter (utils.rate_limiter) caps each client, not the CPU: a
+burst from many clients still queues up behind the pool and every request's
+latency grows without bound. AdmissionController bounds the whole worker:
+
+    - at most `max_in_flight` generations run at once;
+    - at most `max_queue` more wait for a slot, each for at most `queue_timeout`
+      seconds;
+    - anything beyond that is rejected immediately with GenerationQueueFull,
+      which routes turn into 503 + Retry-After. A request that waits for the
+      whole timeout is rejected the same way (AdmissionTimeout).
+
+So a request is either running within max_in_flight, or waiting a bounded
+time, or told to come back later. The latency of admitted requests stays
+bounded under overload.
+
+Requests also belong to a priority class, so a one-bar preview does not queue
+behind a 32-block arrangement:
+
+    interactive  /quick-generate previews (weight 8)
+    standard     pattern generation and edits (weight 4, the default)
+    batch        arrangement renders and exports (weight 1, at most half the slots)
+
+When slots are contended the next one goes to the waiting class with the
+lowest virtual time (start-time fair queueing: each grant advances its class
+by 1 / weight), so classes share slots in proportion to their weights and
+batch work still progresses under a stream of previews. FIFO within a class.
+A class may have its own concurrency cap (`class_limits`). Interactive
+requests also get `interactive_reserve` extra slots that no other class can
+take, so a preview starts at once even while arrangements fill every shared
+slot.
+
+GenerationExecutor.run acquires a slot before handing work to the pool and
+releases it when the worker finishes. The release can come from a worker
+thread, so the controller is thread-safe and wakes waiters on their event loop.
+
+Metrics: gauges generation_in_flight, generation_queue_depth (waiting) and
+generation_pending (both), plus generation_class_in_flight{priority} and
+generation_class_queue_depth{priority}; counters generation_rejected_total{task}
+(every rejection) and generation_admission_timeouts_total{task}; histogram
+generation_admission_wait_seconds{task, priority}.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+INTERACTIVE, STANDARD, BATCH = 'interactive', 'standard', 'batch'
+PRIORITIES = (INTERACTIVE, STANDARD, BATCH)  # also the tie-break order
+DEFAULT_WEIGHTS = {INTERACTIVE: 8.0, STANDARD: 4.0, BATCH: 1.0}
+
+
+class GenerationQueueFull(RuntimeError):
+    """Raised when the executor queue is full; routes map it to 503."""
+    def __init__(self, pending: int, capacity: int, retry_after: int = 1):
+        super().__init__(f"Generation queue is full ({pending}/{capacity}). Please retry shortly.")
+        self.retry_after = retry_after
+
+
+class AdmissionTimeout(GenerationQueueFull):
+    """Raised when a queued request did not get a slot within the queue timeout."""
+    def __init__(self, waited: float, retry_after: int = 1):
+        RuntimeError.__init__(self, f"No generation slot free after {waited:.1f} s. Please retry shortly.")
+        self.retry_after = retry_after
+
+
+@dataclass
+class PriorityClass:
+    """A scheduling class: its share of contended slots and its own cap (None = any free slot)."""
+    name: str
+    weight: float
+    max_in_flight: Optional[int] = None
+    in_flight: int = 0
+    virtual_time: float = 0.0
+    waiters: Deque[asyncio.Future] = field(default_factory=deque)
+
+
+def parse_class_settings(text: Optional[str]) -> Dict[str, float]:
+    """'interactive=8,batch=1' -> {'interactive': 8.0, 'batch': 1.0} (env configuration)."""
+    settings = {}
+    for item in (text or '').split(','):
+        if item.strip():
+            name, _, value = item.partition('=')
+            settings[name.strip()] = float(value)
+    return settings
+
+
+class AdmissionController:
+    # Seconds a slot is assumed to be held before any generation has finished
+    INITIAL_RUN_ESTIMATE = 0.5
+    MAX_RETRY_AFTER = 60
+
+    def __init__(self, max_in_flight: int = 2, max_queue: int = 32, queue_timeout: Optional[float] = 10.0,
+                 interactive_reserve: int = 1, weights: Optional[Dict[str, float]] = None,
+                 class_limits: Optional[Dict[str, int]] = None):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout if queue_timeout and queue_timeout > 0 else None
+        self.interactive_reserve = max(0, interactive_reserve)
+
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        limits = {BATCH: max(1, self.max_in_flight // 2), **(class_limits or {})}
+        unknown = (set(weights) | set(limits)) - set(PRIORITIES)
+        if unknown:
+            raise ValueError(f"Unknown priority class(es) {sorted(unknown)} (expected {', '.join(PRIORITIES)})")
+        self._classes = {
+            name: PriorityClass(name, max(1e-3, float(weights[name])),
+                                int(limits[name]) if limits.get(name) else None)
+            for name in PRIORITIES
+        }
+        self._in_flight = 0
+        self._clock = 0.0
+        self._lock = threading.Lock()
+        self._run_estimate = self.INITIAL_RUN_ESTIMATE
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(cls.waiters) for cls in self._classes.values())
+
+    @property
+    def pending(self) -> int:
+        return self._in_flight + self.waiting
+
+    @property
+    def max_total(self) -> int:
+        """Slots including the interactive reserve (the pool needs this many workers)."""
+        return self.max_in_flight + self.interactive_reserve
+
+    @property
+    def capacity(self) -> int:
+        return self.max_total + self.max_queue
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            cls.name: {'weight': cls.weight, 'max_in_flight': cls.max_in_flight,
+                       'in_flight': cls.in_flight, 'waiting': len(cls.waiters)}
+            for cls in self._classes.values()
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (1..MAX_RETRY_AFTER)."""
+        rounds = (self.waiting + 1) / self.max_in_flight
+        return min(self.MAX_RETRY_AFTER, max(1, math.ceil(rounds * self._run_estimate)))
+
+    def _update_gauges(self) -> None:
+        waiting = self.waiting
+        metrics.gauge("generation_in_flight").set(self._in_flight)
+        metrics.gauge("generation_queue_depth").set(waiting)
+        metrics.gauge("generation_pending").set(self._in_flight + waiting)
+        for cls in self._classes.values():
+            metrics.gauge("generation_class_in_flight", priority=cls.name).set(cls.in_flight)
+            metrics.gauge("generation_class_queue_depth", priority=cls.name).set(len(cls.waiters))
+
+    # --- Scheduling (under self._lock) ------------------------------------------
+
+    def _can_run(self, cls: PriorityClass) -> bool:
+        if cls.max_in_flight is not None and cls.in_flight >= cls.max_in_flight:
+            return False
+        if self._in_flight >= self.max_total:
+            return False
+        # Only interactive requests may use the reserved slots
+        shared = self._in_flight - self._classes[INTERACTIVE].in_flight
+        return cls.name == INTERACTIVE or shared < self.max_in_flight
+
+    def _start(self, cls: PriorityClass) -> None:
+        # A class that was idle starts at the current clock instead of spending saved-up credit
+        start = max(cls.virtual_time, self._clock)
+        self._clock = start
+        cls.virtual_time = start + 1.0 / cls.weight
+        cls.in_flight += 1
+        self._in_flight += 1
+
+    def _dispatch(self) -> List[Tuple[PriorityClass, asyncio.Future]]:
+        """Hand free slots to waiters, lowest virtual time first."""
+        granted = []
+        while True:
+            ready = [cls for cls in self._classes.values() if cls.waiters and self._can_run(cls)]
+            if not ready:
+                return granted
+            cls = min(ready, key=lambda c: max(c.virtual_time, self._clock))
+            self._start(cls)
+            granted.append((cls, cls.waiters.popleft()))
+
+    # --- Slots ------------------------------------------------------------------
+
+    def _get_class(self, priority: str) -> PriorityClass:
+        try:
+            return self._classes[priority]
+        except KeyError:
+            raise ValueError(f"Unknown priority '{priority}' (expected {', '.join(PRIORITIES)})") from None
+
+    async def acquire(self, task: str = 'generate', priority: str = STANDARD) -> None:
+        """Take a slot, waiting in the queue if needed; raises GenerationQueueFull when refused."""
+        cls = self._get_class(priority)
+        with self._lock:
+            # Waiters that could use a free slot are always dispatched first,
+            # so a free slot here is not taken from anyone
+            if not cls.waiters and self._can_run(cls):
+                self._start(cls)
+                self._update_gauges()
+                metrics.histogram("generation_admission_wait_seconds", task=task, priority=priority).observe(0.0)
+                return
+            if self.waiting >= self.max_queue:
+                metrics.counter("generation_rejected_total", task=task).inc()
+                raise GenerationQueueFull(self.pending, self.capacity, self.retry_after())
+            waiter = asyncio.get_running_loop().create_future()
+            cls.waiters.append(waiter)
+            self._update_gauges()
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            with self._lock:
+                granted = waiter not in cls.waiters
+                if not granted:
+                    cls.waiters.remove(waiter)
+                    self._update_gauges()
+            if granted:
+                # The slot was handed over as we gave up: pass it on
+                self.release(priority)
+            if isinstance(e, asyncio.TimeoutError):
+                waited = time.perf_counter() - queued_at
+                metrics.counter("generation_admission_timeouts_total", task=task).inc()
+                metrics.counter("generation_rejected_total", task=task).inc()
+                raise AdmissionTimeout(waited, self.retry_after()) from None
+            raise
+        metrics.histogram("generation_admission_wait_seconds", task=task,
+                          priority=priority).observe(time.perf_counter() - queued_at)
+
+    def release(self, priority: str = STANDARD, run_seconds: Optional[float] = None) -> None:
+        """Give a slot back (from any thread); freed slots go straight to the next waiters."""
+        with self._lock:
+            if run_seconds is not None:
+                self._run_estimate = 0.8 * self._run_estimate + 0.2 * run_seconds
+            cls = self._classes[priority]
+            cls.in_flight -= 1
+            self._in_flight -= 1
+            granted = self._dispatch()
+            self._update_gauges()
+        for cls, waiter in granted:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_grant, waiter)
+            except RuntimeError:
+                # Its event loop is gone, so is the request
+                self.release(cls.name)
+
+
+def _grant(waiter: asyncio.Future) -> None:
+    # A waiter that timed out or was cancelled meanwhile releases the slot itself
+    if not waiter.done():
+        waiter.set_result(None)
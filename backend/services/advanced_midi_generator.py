@@ -1,51 +1,37 @@
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-import random
+from functools import lru_cache
 
 # Import new engines
-from services.style_patterns import StylePatterns
+from services.style_patterns import StylePatterns, MUSIC_STYLES  # MUSIC_STYLES re-exported for existing imports
+from services import kit_engine
 from services.groove_engine import GrooveEngine
 from services.music_theory_engine import MusicTheoryEngine
+from services.generation_context import GenerationContext, ensure_context
+from services.event_buffer import (
+    DEFAULT_PPQ, EventBuffer, FLAG_ARP, FLAG_CHORD, beats_to_ticks, instrument_code, ticks_to_beats
+)
 
-MUSIC_STYLES = {
-    # ELECTRONIC
-    'techno': {'bpm': 130, 'swing': 0.1, 'energy': 'driving'},
-    'house': {'bpm': 125, 'swing': 0.15, 'energy': 'groovy'},
-    'deep_house': {'bpm': 120, 'swing': 0.2, 'energy': 'smooth'},
-    'trap': {'bpm': 140, 'swing': 0.05, 'energy': 'aggressive'},
-    'dnb': {'bpm': 174, 'swing': 0.1, 'energy': 'fast'},
-    'dubstep': {'bpm': 140, 'swing': 0.0, 'energy': 'heavy'},
-    'ambient': {'bpm': 80, 'swing': 0.0, 'energy': 'atmospheric'},
-    
-    # POPULAR/MAINSTREAM
-    'pop': {'bpm': 120, 'swing': 0.1, 'energy': 'bright'},
-    'rock': {'bpm': 120, 'swing': 0.05, 'energy': 'powerful'}, 
-    'indie': {'bpm': 110, 'swing': 0.1, 'energy': 'alternative'},
-    'funk': {'bpm': 110, 'swing': 0.25, 'energy': 'groovy'},
-    'disco': {'bpm': 120, 'swing': 0.15, 'energy': 'danceable'},
-    
-    # URBAN/HIP-HOP
-    'hip_hop': {'bpm': 90, 'swing': 0.2, 'energy': 'laid-back'},
-    'boom_bap': {'bpm': 90, 'swing': 0.15, 'energy': 'classic'},
-    'lofi': {'bpm': 85, 'swing': 0.3, 'energy': 'chill'},
-    'rnb': {'bpm': 95, 'swing': 0.25, 'energy': 'smooth'},
-    
-    # JAZZ/SOUL
-    'jazz': {'bpm': 120, 'swing': 0.35, 'energy': 'sophisticated'}, # Updated per request
-    'soul': {'bpm': 100, 'swing': 0.2, 'energy': 'emotional'},
-    'gospel': {'bpm': 110, 'swing': 0.15, 'energy': 'uplifting'},
-    
-    # LATIN/WORLD
-    'reggaeton': {'bpm': 95, 'swing': 0.0, 'energy': 'rhythmic'},
-    'latin': {'bpm': 100, 'swing': 0.1, 'energy': 'tropical'},
-    'afrobeat': {'bpm': 120, 'swing': 0.2, 'energy': 'percussive'},
-    
-    # HARD
-    'metal': {'bpm': 140, 'swing': 0.0, 'energy': 'aggressive'},
-    'punk': {'bpm': 180, 'swing': 0.0, 'energy': 'raw'},
-    'cinematic': {'bpm': 70, 'swing': 0.0, 'energy': 'atmospheric'}
-}
+QUARTER_NOTES = np.array([1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0], dtype=np.uint8)
+
+KIT_INSTRUMENTS = ('full_kit', 'full_drums', 'drums')
+DRUM_COMPONENTS = ('kick', 'snare', 'hat', 'perc')
+MELODIC_COMPONENTS = ('chords', 'lead', 'pad', 'arp', 'melody')
+# In beats; the grid is rendered in ticks (whole ticks for any valid PPQ, see event_buffer.check_ppq)
+NOTE_DURATIONS = {'hat': 0.125, 'shake': 0.125, 'arp': 0.125, 'pad': 1.0, 'chords': 1.0}
+STEP_BEATS = 0.25  # one 16th step
+GHOST_OFFSET_BEATS = 0.125
+GHOST_DURATION_BEATS = 0.0625
+PLACEHOLDER_PROGRESSION = (1, 4, 5, 1)
+
+
+@lru_cache(maxsize=256)
+def voice_durations(voices: Tuple[str, ...], ppq: int) -> np.ndarray:
+    """Note length in ticks per voice (memoized, read-only)."""
+    durations = beats_to_ticks([NOTE_DURATIONS.get(voice, STEP_BEATS) for voice in voices], ppq)
+    durations.setflags(write=False)
+    return durations
 
 @dataclass
 class PatternDNA:
@@ -67,12 +53,12 @@ class AdvancedPatternGenerator:
         self.style_patterns = StylePatterns()
         self.groove_engine = GrooveEngine()
     
-    def _get_phrase_start_offset(self, style: str) -> float:
+    def _get_phrase_start_offset(self, style: str, rng) -> float:
         """
         Dan Update: Calculate phrase start offset to avoid 'Downbeat Bias'.
         Returns offset in beats (quarter notes).
         """
-        roll = random.random()
+        roll = rng.random()
         if style in ['jazz', 'neo_soul', 'lofi']:
             if roll < 0.30: return 0.0      # Downbeat (Beat 1)
             elif roll < 0.60: return 3.5    # Pickup (And of 4 of previous bar - functionally -0.5 or push to end) -> interpreted as shift
@@ -86,198 +72,207 @@ class AdvancedPatternGenerator:
                                   instrument: str,
                                   dna: PatternDNA,
                                   bars: int = 4,
-                                  phrase_offset: float = None) -> List[Dict]:
+                                  phrase_offset: float = None,
+                                  ctx: Optional[GenerationContext] = None,
+                                  kit: Optional[str] = None) -> List[Dict]:
         """
         Generate pattern using detailed style definitions and DNA parameters.
-        Handles 'full_kit' by compositing patterns.
+        Handles 'full_kit' by rendering every voice of `kit` (see kit_engine.KITS,
+        default kick/snare/hat) on one shared grid, already in time order.
+
+        The whole (voices x bars*16) probability matrix is computed with array ops,
+        hits are drawn with one call to ctx.np_rng and velocities are computed for
+        all hits at once; the same seed always gives the same pattern.
         """
-        events = []
-        
+        grid = self._render_pattern(style, instrument, dna, bars, phrase_offset, ctx, kit, DEFAULT_PPQ)
+        return self._grid_to_events(*grid, DEFAULT_PPQ)
+
+    def generate_pattern_buffer(self,
+                                style: str,
+                                instrument: str,
+                                dna: PatternDNA,
+                                bars: int = 4,
+                                phrase_offset: float = None,
+                                ctx: Optional[GenerationContext] = None,
+                                kit: Optional[str] = None,
+                                ppq: int = DEFAULT_PPQ) -> EventBuffer:
+        """
+        generate_pattern_with_dna as an EventBuffer at `ppq` (times in ticks),
+        straight from the grid columns without building event dicts. Tagged like
+        EventBuffer.from_dicts(generate_pattern_with_dna(...)) for the same seed.
+        """
+        grid, voices = self._render_pattern(style, instrument, dna, bars, phrase_offset, ctx, kit, ppq)
+        # is_chord / is_arp tags of the dict events, per voice (never on ghost notes)
+        voice_flags = np.array([FLAG_CHORD if voice in ('chords', 'pad') else FLAG_ARP if voice == 'arp' else 0
+                                for voice in voices])
+        codes = np.array([instrument_code(voice) for voice in voices])
+        return EventBuffer.from_columns(
+            time=grid['time'],
+            duration=grid['duration'],
+            velocity=grid['velocity'],
+            instrument=codes[grid['voice']],
+            flags=np.where(grid['ghost'], 0, voice_flags[grid['voice']]),
+            ppq=ppq
+        )
+
+    def _render_pattern(self, style: str, instrument: str, dna: PatternDNA, bars: int,
+                        phrase_offset: Optional[float], ctx: Optional[GenerationContext],
+                        kit: Optional[str], ppq: int) -> Tuple[Dict[str, np.ndarray], Tuple[str, ...]]:
+        """Shared front half of both entry points: (grid columns, voices)."""
+        ctx = ensure_context(ctx)
+        rng = ctx.rng
+
         # Determine global offset if not provided (for coherence)
         if phrase_offset is None:
-            phrase_offset = self._get_phrase_start_offset(style)
+            phrase_offset = self._get_phrase_start_offset(style, rng)
 
         # --- Handle Aggregate Instruments ---
-        if instrument in ['full_kit', 'full_drums', 'drums']:
-            # Generate kit components recursively with SAME offset
-            for component in ['kick', 'snare', 'hat']:
-                component_events = self.generate_pattern_with_dna(style, component, dna, bars, phrase_offset)
-                events.extend(component_events)
-            
-            # Sort composite events
-            events.sort(key=lambda x: x['time'])
-            
-            # [Fix] Do NOT apply groove here. IntegratedMidiGenerator applies it globally.
-            # This prevents "Double Swing" and ensures coherence.
-            return events
+        # Kit components share the SAME offset and grid.
+        # [Fix] Do NOT apply groove here. IntegratedMidiGenerator applies it globally.
+        # This prevents "Double Swing" and ensures coherence.
+        voices = kit_engine.kit_voices(kit) if instrument in KIT_INSTRUMENTS else (instrument,)
+
+        grid = self._render_grid(style, voices, dna, bars, phrase_offset, ctx.np_rng, ppq)
+        return grid, voices
 
-        # --- Base Logic for Single Instruments ---
-        
-        # 1. Get Base Pattern from StylePatterns
-        base_pattern = StylePatterns.get_pattern(style, instrument)
-        
-        # SAFETY FIX: If pattern is missing (or all zeros/empty), default to quarter notes
-        if not base_pattern or not any(base_pattern):
-             # Default to Standard 4/4 (Quarter notes)
-             base_pattern = [1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0]
-        
-        # 2. Get Style Metadata using LOCAL DICTIONARY (User Request)
-        style_meta = MUSIC_STYLES.get(style, StylePatterns.get_style_metadata(style))
-        
+    def _render_grid(self, style: str, voices: Tuple[str, ...], dna: PatternDNA, bars: int,
+                     phrase_offset: float, np_rng: np.random.Generator,
+                     ppq: int = DEFAULT_PPQ) -> Dict[str, np.ndarray]:
+        """
+        Vectorized hit/velocity rendering for one or more voices.
+        Returns columns (voice, position, time, velocity, duration, probability, ghost)
+        in time order (voices in `voices` order on ties), each ghost note half a step
+        after its hit. Times and durations are integer ticks at `ppq`.
+        """
         pattern_length = 16 # 16 steps per bar
-        
-        # Pre-calculate Chord Progression if needed (for melodic/chords)
-        progression = []
-        if instrument in ['chords', 'lead', 'pad', 'arp', 'melody']:
-            # [FIX] Legacy static call caused crash. IntegratedMidiGenerator handles progression now.
-            # Using placeholder degrees for standalone compatibility.
-            progression = [1, 4, 5, 1] 
-            # Repeat progression to fill bars
-            while len(progression) < bars:
-                progression.extend(progression)
-        
-        for bar in range(bars):
-            # For melodic instruments, determine current chord degree
-            current_degree = progression[bar % len(progression)] if progression else 1
-            
-            for step in range(pattern_length):
-                position = bar * pattern_length + step
-                step_in_pattern = step % 16
-                
-                # Get base value (1 or 0)
-                base_value = base_pattern[step_in_pattern]
-                
-                # 3. Calculate Hit Probability (Density Logic)
-                hit_probability = self._calculate_hit_probability(
-                    base_value,
-                    dna.density,
-                    position,
-                    dna.evolution
-                )
-                
-                # [Dan Update] Syncopation Logic: Force rests on strong beats for Jazz
-                if style in ['jazz', 'neo_soul'] and instrument not in ['kick']: # Keep kick anchoring? Or loosen it too. Let's loosen all.
-                     if step_in_pattern in [0, 8]: # Beats 1 and 3
-                         # Drastically reduce probability to force "dancing" around the beat
-                         hit_probability *= 0.3 
-                
-                # Adjust probability for melodic coherence (fewer random notes)
-                if instrument not in ['kick', 'snare', 'hat', 'perc']:
-                    if dna.density < 0.5:
-                         # Force stick to grid more for low density melody
-                        hit_probability = 1.0 if base_value else 0.0
-                
-                # Roll for hit
-                if random.random() < hit_probability:
-                    # 4. Calculate Velocity
-                    velocity = self._calculate_velocity(
-                        position, 
-                        dna.velocity_curve,
-                        dna.complexity
-                    )
-                    
-                    # 5. Create Event (Straight Grid first)
-                    note_duration = 0.25 # Default quarter note
-                    
-                    # Fine-tune durations
-                    if instrument in ['hat', 'shake', 'arp']:
-                        note_duration = 0.125
-                    elif instrument in ['pad', 'chords']:
-                        note_duration = 1.0 # Sustain
-                    
-                    # [Dan Update] Apply Phrase Start Offset
-                    raw_time = position * 0.25 + phrase_offset
-                    
-                    event = {
-                        'time': raw_time, 
-                        'velocity': velocity,
-                        'duration': note_duration,
-                        'probability': hit_probability,
-                        'instrument_type': instrument # Tag for pitch assignment
-                    }
-                    
-                    # Add melodic info for _add_pitch_to_events to use
-                    if instrument in ['chords', 'lead', 'pad', 'arp', 'melody']:
-                        event['degree'] = current_degree
-                        event['is_chord'] = (instrument in ['chords', 'pad'])
-                        event['is_arp'] = (instrument == 'arp')
-                        
-                    events.append(event)
-                    
-                    # 7. Add Ghost Notes (Complexity) - Drums Only
-                    if instrument in ['snare', 'hat'] and dna.complexity > 0.6:
-                        if random.random() < (dna.complexity - 0.5):
-                            events.append({
-                                'time': raw_time + 0.125,  # Straight + 1/32
-                                'velocity': int(velocity * 0.4),  # Quiet
-                                'duration': 0.0625,
-                                'probability': 0.5,
-                                'instrument_type': instrument
-                            })
-                            
-        # Apply Groove locally for single instrument if not part of a kit
-        # NOTE: If we are here, we are likely a single instrument OR a leaf in the recursion.
-        # But wait, if we are a leaf called by full_kit, full_kit WILL apply groove again on the combined list.
-        # We should NOT apply groove here if we are part of a full_kit generation to avoid "Double Swing".
-        # But this function doesn't know if it was called recursively.
-        # However, `full_kit` logic expects *ungrooved* events to composite.
-        # So we should RETURN raw events here.
-        # But what if I call this function for just 'snare'? I want groove.
-        # Solution: The caller (`IntegratedMidiGenerator`) uses this for 'full_kit' mostly?
-        # Or does it call for single instruments?
-        # IntegratedMidiGenerator calls `generate_pattern_with_dna` for `instrument`.
-        # If instrument is 'full_kit', the recursion handles it.
-        # If instrument is 'snare', we reach here.
-        # To support single instrument groove, we SHOULD apply groove here.
-        # To avoid double groove for full_kit:
-        # We can pass `apply_groove=False` in recursive calls?
-        # Let's add that to signature? No, simpler:
-        # `full_kit` logic applies groove. We can make `full_kit` logic NOT apply groove, and rely on this?
-        # But then cross-channel groove (e.g. kick influencing hi-hat perception) isn't possible (though my engine is channel-independent currently).
-        # Actually, simpler: Use `phrase_offset` as a flag? No.
-        # Let's add `apply_output_groove` arg.
-        
+        n_steps = bars * pattern_length
+        positions = np.arange(n_steps)
+        step_in_pattern = positions % pattern_length
+
+        # 1. Base patterns from the compiled style tables (same grids as StylePatterns.get_pattern)
+        base_patterns = kit_engine.kit_patterns(style, voices)
+        # SAFETY FIX: If pattern is missing (all zeros), default to quarter notes
+        empty = ~base_patterns.any(axis=1)
+        if empty.any():
+            base_patterns = base_patterns.copy()
+            base_patterns[empty] = QUARTER_NOTES
+        base = base_patterns[:, step_in_pattern].astype(np.float64)  # (voices, steps)
+
+        # 2. Hit probability (density / evolution logic) for every voice and step
+        probability = self._hit_probability_grid(base, dna.density, positions, dna.evolution)
+
+        # [Dan Update] Syncopation Logic: Force rests on strong beats (1 and 3) for Jazz
+        if style in ['jazz', 'neo_soul']:
+            loosen = np.array([voice not in ['kick'] for voice in voices])
+            downbeats = np.isin(step_in_pattern, [0, 8])
+            probability[np.ix_(loosen, downbeats)] *= 0.3
+
+        # Melodic coherence: low density melody sticks to the grid
+        if dna.density < 0.5:
+            melodic = np.array([voice not in DRUM_COMPONENTS for voice in voices])
+            probability[melodic] = (base[melodic] > 0).astype(np.float64)
+
+        # 3. Roll every step at once
+        hits = np_rng.random(probability.shape) < probability
+        voice_index, position = np.nonzero(hits)
+        hit_probability = probability[voice_index, position]
+
+        # 4. Velocities for all hits
+        velocity = self._velocity_grid(position, dna.velocity_curve, dna.complexity, np_rng)
+
+        # 5. Durations per voice (Straight Grid first), Phrase Start Offset applied - all in ticks
+        durations = voice_durations(voices, ppq)
+        time = position * int(STEP_BEATS * ppq) + round(phrase_offset * ppq)
+
+        # 6. Ghost notes (Complexity) - snare/hat only, 1/32 after the hit
+        ghost = np.zeros(len(position), dtype=bool)
+        if dna.complexity > 0.6:
+            can_ghost = np.array([voice in ['snare', 'hat'] for voice in voices])[voice_index]
+            if can_ghost.any():
+                ghost = can_ghost & (np_rng.random(len(position)) < (dna.complexity - 0.5))
+        ghosts = np.zeros_like(hits)
+        ghosts[voice_index[ghost], position[ghost]] = True
+
+        # 7. Read the grid back in time order, gathering per-hit values
+        order = kit_engine.time_order(hits, ghosts)
+        hit = order.hit
+        is_ghost = order.ghost
+        return {
+            'voice': order.voice,
+            'position': order.position,
+            'time': time[hit] + is_ghost * int(GHOST_OFFSET_BEATS * ppq),
+            'velocity': np.where(is_ghost, (velocity[hit] * 0.4).astype(np.int64), velocity[hit]),  # Quiet
+            'duration': np.where(is_ghost, int(GHOST_DURATION_BEATS * ppq), durations[order.voice]),
+            'probability': np.where(is_ghost, 0.5, hit_probability[hit]),
+            'ghost': is_ghost,
+        }
+
+    def _grid_to_events(self, grid: Dict[str, np.ndarray], voices: Tuple[str, ...],
+                        ppq: int = DEFAULT_PPQ) -> List[Dict]:
+        """Columns from _render_grid -> the legacy list of event dicts (times in beats)."""
+        events = []
+        for voice_index, position, time, velocity, duration, probability, ghost in zip(
+                grid['voice'].tolist(), grid['position'].tolist(), ticks_to_beats(grid['time'], ppq).tolist(),
+                grid['velocity'].tolist(), ticks_to_beats(grid['duration'], ppq).tolist(),
+                grid['probability'].tolist(),
+                grid['ghost'].tolist()):
+            instrument = voices[voice_index]
+            event = {
+                'time': time,
+                'velocity': velocity,
+                'duration': duration,
+                'probability': probability,
+                'instrument_type': instrument # Tag for pitch assignment
+            }
+            # Add melodic info for _add_pitch_to_events to use
+            if not ghost and instrument in MELODIC_COMPONENTS:
+                # [FIX] Placeholder degrees for standalone compatibility;
+                # IntegratedMidiGenerator handles the real progression.
+                event['degree'] = PLACEHOLDER_PROGRESSION[(position // 16) % len(PLACEHOLDER_PROGRESSION)]
+                event['is_chord'] = (instrument in ['chords', 'pad'])
+                event['is_arp'] = (instrument == 'arp')
+            events.append(event)
         return events
-    
-    def _calculate_hit_probability(self, base_value, density, position, evolution):
+
+    def _hit_probability_grid(self, base: np.ndarray, density: float, positions: np.ndarray,
+                              evolution: float) -> np.ndarray:
         """
-        Calculate hit probability based on DNA parameters.
-        Same algorithm as v1 but cleaner.
+        Calculate hit probability based on DNA parameters, for a whole
+        (voices x steps) grid of base values. Same algorithm as v1.
         """
-        prob = float(base_value)
-
         if density < 0.3:
             # Low density: only keep strong beats
-            is_strong_beat = (position % 4 == 0)
-            prob *= (0.7 + density * 0.3) if is_strong_beat else (density * 2)
+            is_strong_beat = (positions % 4 == 0)
+            prob = base * np.where(is_strong_beat, 0.7 + density * 0.3, density * 2)
         elif density < 0.7:
             # Medium: mostly faithful
-            prob *= (0.5 + density * 0.7)
+            prob = base * (0.5 + density * 0.7)
         else:
-            # High: add fills
-            prob *= (0.8 + density * 0.2)
-            if position % 2 == 1 and base_value == 0:
-                # Add notes in empty spaces
-                prob += (density - 0.7) * 0.5
+            # High: add fills in empty off-beat spaces
+            prob = base * (0.8 + density * 0.2)
+            prob += ((positions % 2 == 1) & (base == 0)) * ((density - 0.7) * 0.5)
 
         # Evolution
         if evolution > 0:
-            time_factor = (position / 64)
+            time_factor = positions / 64
             prob += evolution * 0.2 * np.sin(time_factor * np.pi * 2)
 
         return np.clip(prob, 0, 1)
-    
-    def _calculate_velocity(self, position, curve_type, complexity):
-        # Use GrooveEngine or local logic for base velocity
-        base_velocity = 100
+
+    def _velocity_grid(self, positions: np.ndarray, curve_type: str, complexity: float,
+                       np_rng: np.random.Generator) -> np.ndarray:
+        """Velocities for all hits at `positions` (array version of the v1 per-step logic)."""
+        step = positions % 16
         if curve_type == 'accent':
-            base_velocity = 120 if (position % 16) in [0, 8] else 90
+            base_velocity = np.where((step == 0) | (step == 8), 120, 90)
         elif curve_type == 'exponential':
-            base_velocity = 60 + (position % 16) * 3
+            base_velocity = 60 + step * 3
         elif curve_type == 'random':
-            base_velocity = random.randint(70, 110)
-            
-        # Add humanization via GrooveEngine helper logic
-        # We manually apply random variation here as in v1
-        humanization = random.randint(-int(10 * complexity + 1), int(10 * complexity + 1))
-        return int(np.clip(base_velocity + humanization, 1, 127))
\ No newline at end of file
+            base_velocity = np_rng.integers(70, 111, size=len(positions))
+        else:
+            base_velocity = np.full(len(positions), 100)
+
+        # Humanization: uniform integer variation scaled by complexity (as in v1)
+        spread = int(10 * complexity + 1)
+        humanization = np_rng.integers(-spread, spread + 1, size=len(positions))
+        return np.clip(base_velocity + humanization, 1, 127).astype(np.int64)
@@ -1,14 +1,222 @@
+import io
 import mido
 import logging
-from typing import List, Dict, Optional
+import os
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, BinaryIO, List, Dict, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from services.event_buffer import DEFAULT_PPQ, check_ppq
+from services.generation_context import GenerationContext
+from services.generator_registry import generator_registry
 from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.midi_splice import TimedEvent, TrackEncoder, clip_notes, empty_notes, offset_notes, splice_track
+from services.smf_writer import (
+    META_MARKER, META_SET_TEMPO, META_TRACK_NAME, SmfStreamWriter, encode_file, meta_message, read_midi_file,
+    split_file
+)
+from utils.metrics import metrics
+from utils.stage_timer import StageTimer, collect_stages, export_stages, record_stages
 
 logger = logging.getLogger(__name__)
 
+# (Instrument Category, SubOption/Role, Channel, Track Name)
+TRACKS_CONFIG = [
+    ('drums', 'full_kit', 9, 'Drums'),   # Ch 10
+    ('bass', 'groove_bass', 0, 'Bass'),  # Ch 1
+    ('melody', 'chords', 1, 'Chords'),   # Ch 2
+    ('melody', 'lead', 2, 'Melody')      # Ch 3
+]
+
+TICKS_PER_BEAT = DEFAULT_PPQ  # unless the service (or its generator) is configured otherwise
+TICKS_PER_BAR = TICKS_PER_BEAT * 4
+
+# block['intensity'] -> complexity for AdvancedPatternGenerator math
+COMPLEXITY_MAP = {'low': 0.3, 'medium': 0.6, 'high': 0.9}
+
+
+def derive_seed(*entropy: int) -> int:
+    """Independent, reproducible 32-bit seed for a (parent seed, index...) path."""
+    return int(np.random.SeedSequence([int(e) for e in entropy]).generate_state(1)[0])
+
+
+class Cell(NamedTuple):
+    """One (block, track) render: everything it depends on besides the song-level params."""
+    track_index: int
+    block_type: str
+    bars: int
+    intensity: str
+    seed: int
+
+
+def cell_params(cell: Cell, style: str, key: str, scale: str, bpm: int,
+                ppq: int = TICKS_PER_BEAT) -> Dict[str, Any]:
+    """IntegratedMidiGenerator.generate kwargs for a cell (notes at `ppq` ticks per beat)."""
+    inst_cat, inst_sub, _, track_name = TRACKS_CONFIG[cell.track_index]
+
+    # Determine precise sub_option
+    # If drums, we might want 'intro' kit vs 'verse' kit etc.
+    # Currently IntegratedMidiGenerator takes `sub_option` as context.
+    # But for 'bass'/'melody', 'sub_option' argument usually defines the ROLE (bass vs chords).
+    # The 'description' helps the DNA logic know it's an 'intro'.
+    # To support 'Chords' vs 'Lead', we must pass that as `sub_option` if logic relies on it.
+    # BUT logic relies on `sub_option` for context too?
+    # Let's verify IntegratedMidiGenerator logic.
+    # It uses sub_option for DNA mapping. 
+    # Ideally we pass 'sub_option' as the ROLE (e.g. 'groove_bass') and rely on description/bars for structure?
+    # OR AdvancedPatternGenerator handles block_type inside?
+    # Actually, `IntegratedMidiGenerator` maps `sub_option` to `dn_type`.
+    # If we pass 'intro', it looks for 'intro' DNA.
+    # If we want Chords, we need 'chords' DNA.
+    # Conflict: We can't pass both 'intro' and 'chords' into one `sub_option` arg.
+    # Solution: We pass `sub_option=inst_sub` (e.g. 'chords') so it generates chords.
+    # And we put `block_type` (intro) into the `description` string, hoping `_detect_style` or internal logic picks it up 
+    # OR we modify generator to accept explicit `fragment_type`?
+    # For now, let's stick to passing `sub_option=inst_sub`. 
+    # The intensity/density is mostly controlled by DNA found for that sub-option.
+    # Intro/Verse differentiation might be weak if DNA doesn't vary by block type.
+    # However, `AdvancedPatternGenerator` does use `sub_option` primarily.
+    # If we want 'intro' drums, we must pass 'intro' as sub_option.
+    # But then we get drums.
+    # What if we want 'intro' chords?
+    # We need to trust the generator interprets `description` or `intensity`.
+    # Let's pass `sub_option=inst_sub` (role) and hope Intensity controls the "Intro-ness" (low intensity).
+
+    return dict(
+        description=f"{style} {cell.block_type} {track_name}",
+        style=style,
+        instrument=inst_cat,       # drums, bass, melody
+        sub_option=inst_sub,       # full_kit, groove_bass, chords, lead
+        bpm=bpm,
+        bars=cell.bars,
+        key=key,
+        scale_type=scale,
+        # Map block intensity directly to complexity for AdvancedPatternGenerator math
+        complexity=COMPLEXITY_MAP.get(cell.intensity, 0.6),
+        humanize=True,
+        seed=cell.seed,
+        ppq=ppq,
+        output='notes'
+    )
+
+
+def render_cell(generator: IntegratedMidiGenerator, params: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Render one cell: (note array, stage seconds measured while rendering it)."""
+    with collect_stages() as timings:
+        notes, _ = generator.generate(**params)
+    return notes, timings.stages
+
+
+def render_cell_task(params: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Process-pool entry point (module level so it pickles): uses the worker's shared generator."""
+    return render_cell(generator_registry.get('integrated'), params)
+
+
+def _init_cell_worker() -> None:
+    generator_registry.get('integrated')
+
+
 class ArrangementService:
-    def __init__(self):
-        self.generator = IntegratedMidiGenerator()
-        
+    """
+    Multi-track arrangements stitched from independently generated blocks.
+
+    Every (block, track) cell is rendered with its own seed, derived from the
+    arrangement seed and the block's (type, bars, intensity) unless the block
+    carries an explicit 'seed'. Repeated sections (verse, chorus, verse,
+    chorus) therefore share their cells: each distinct cell is rendered once,
+    on a worker pool when `workers` > 1, and the song is assembled in structure
+    order, so the output does not depend on which worker finished first. The
+    same structure + seed always gives the same file, and a single block can be
+    re-rolled (regenerate_block) by rendering only its cells and splicing them
+    into the stored file.
+
+    Blocks sit at their nominal bar offsets in tick space: a cell keeps the
+    notes that start inside its block (they may ring into the next one), and a
+    marker closes every block. Cells come back from the generator as note
+    arrays (generate(output='notes'), nothing encoded or parsed per block) and
+    every track is concatenated from them in tick space and encoded once
+    (services.midi_splice), so no mido messages are built unless a
+    mido.MidiFile is asked for.
+
+    Rendered cells are also kept in a small LRU (`cache_size` cells), so
+    re-rendering an arrangement after one block was edited only renders that
+    block.
+
+    Songs are written at `ppq` ticks per beat (default: the generator's);
+    regenerate_block renders at the resolution of the file it edits.
+
+    Configuration (environment, see from_env):
+        ARRANGEMENT_WORKERS      cell render pool size (default: min(4, cpu count); <= 1 renders inline)
+        ARRANGEMENT_EXECUTOR     'thread' (default) or 'process'
+
+    The service runs inside generation_executor workers, whose slots the
+    admission controller budgets. Cells therefore render on threads of the
+    calling worker by default. 'process' starts a nested process pool per
+    executor worker, so only opt into it when that CPU is actually spare.
+        ARRANGEMENT_CELL_CACHE   cached cells (default: 256, 0 disables)
+    """
+
+    def __init__(self, generator: Optional[IntegratedMidiGenerator] = None, workers: int = 0,
+                 kind: str = 'thread', cache_size: int = 256, spool_bytes: int = 256 * 1024,
+                 ppq: Optional[int] = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind '{kind}' (expected 'thread' or 'process')")
+        # Pass the shared generator from generator_registry to skip rebuilding every engine
+        self.generator = generator or IntegratedMidiGenerator()
+        self.ppq = check_ppq(ppq) if ppq is not None else self.generator.ppq
+        self.workers = workers
+        self.kind = kind
+        self.cache_size = max(0, cache_size)
+        self.spool_bytes = spool_bytes  # per track chunk kept in memory by write_arrangement
+        self._cells: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, generator: Optional[IntegratedMidiGenerator] = None) -> 'ArrangementService':
+        return cls(
+            generator=generator,
+            workers=int(os.getenv("ARRANGEMENT_WORKERS", min(4, os.cpu_count() or 1))),
+            kind=os.getenv("ARRANGEMENT_EXECUTOR", "thread").lower(),
+            cache_size=int(os.getenv("ARRANGEMENT_CELL_CACHE", 256)),
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def block_offsets(structure: List[Dict], ticks_per_beat: int = TICKS_PER_BEAT) -> List[int]:
+        """Start tick of every block (plus the end of the song as last entry)."""
+        offsets = [0]
+        for block in structure:
+            offsets.append(offsets[-1] + block.get('bars', 4) * 4 * ticks_per_beat)
+        return offsets
+
+    @staticmethod
+    def block_seed(seed: int, structure: List[Dict], index: int) -> int:
+        """Explicit block seed, else one shared by every block of the same type, bars and intensity."""
+        block = structure[index]
+        if block.get('seed') is not None:
+            return int(block['seed'])
+        signature = f"{block.get('type')}|{block.get('bars', 4)}|{block.get('intensity', 'medium')}"
+        return derive_seed(seed, zlib.crc32(signature.encode('utf-8')))
+
+    @staticmethod
+    def block_cells(block: Dict, block_seed: int) -> List[Cell]:
+        """The block's cell for every track of TRACKS_CONFIG."""
+        return [
+            Cell(track_index, str(block.get('type')), block.get('bars', 4), block.get('intensity', 'medium'),
+                 derive_seed(block_seed, track_index))
+            for track_index in range(len(TRACKS_CONFIG))
+        ]
+
     def generate_arrangement(
         self,
         structure: List[Dict],
@@ -16,119 +224,224 @@ class ArrangementService:
         key: str = "C",
         scale: str = "minor",
         bpm: int = 120,
-        instrument: str = "full_kit" # Legacy arg, ignored for full arrangement
-    ) -> mido.MidiFile:
+        instrument: str = "full_kit", # Legacy arg, ignored for full arrangement
+        seed: Optional[int] = None,
+        output: str = 'midi' # 'midi' -> mido.MidiFile, 'bytes' -> encoded .mid
+    ) -> Union[mido.MidiFile, bytes]:
         """
         Generates a Multi-Track MIDI Arrangement (Type 1).
         Tracks: Drums, Bass, Chords, Melody.
+        See write_arrangement, which streams it to a file instead.
         """
-        
-        # 1. Container (Type 1)
-        final_mid = mido.MidiFile(type=1, ticks_per_beat=480)
-        
-        # 2. Tracks Configuration
-        # (Instrument Category, SubOption/Role, Channel, Track Name)
-        tracks_config = [
-            ('drums', 'full_kit', 9, 'Drums'),   # Ch 10
-            ('bass', 'groove_bass', 0, 'Bass'),  # Ch 1
-            ('melody', 'chords', 1, 'Chords'),   # Ch 2
-            ('melody', 'lead', 2, 'Melody')      # Ch 3
-        ]
-        
-        ticks_per_beat = 480
-        ticks_per_bar = ticks_per_beat * 4
-
-        # 3. Iterate Instruments/Tracks
-        for inst_cat, inst_sub, channel, track_name in tracks_config:
-            track = mido.MidiTrack()
-            final_mid.tracks.append(track)
-            
-            # Track Header
-            track.append(mido.MetaMessage('track_name', name=track_name, time=0))
-            if track_name == 'Drums': # Tempo typically on track 0 (or all)
-                track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(bpm), time=0))
-            
-            current_track_ticks = 0
-            
-            # 4. Stitch Blocks
-            for block in structure:
-                block_type = block.get('type') # intro, verse...
-                bars = block.get('bars', 4)
-                
-                # Determine precise sub_option
-                # If drums, we might want 'intro' kit vs 'verse' kit etc.
-                # Currently IntegratedMidiGenerator takes `sub_option` as context.
-                # But for 'bass'/'melody', 'sub_option' argument usually defines the ROLE (bass vs chords).
-                # The 'description' helps the DNA logic know it's an 'intro'.
-                # To support 'Chords' vs 'Lead', we must pass that as `sub_option` if logic relies on it.
-                # BUT logic relies on `sub_option` for context too?
-                # Let's verify IntegratedMidiGenerator logic.
-                # It uses sub_option for DNA mapping. 
-                # Ideally we pass 'sub_option' as the ROLE (e.g. 'groove_bass') and rely on description/bars for structure?
-                # OR AdvancedPatternGenerator handles block_type inside?
-                # Actually, `IntegratedMidiGenerator` maps `sub_option` to `dn_type`.
-                # If we pass 'intro', it looks for 'intro' DNA.
-                # If we want Chords, we need 'chords' DNA.
-                # Conflict: We can't pass both 'intro' and 'chords' into one `sub_option` arg.
-                # Solution: We pass `sub_option=inst_sub` (e.g. 'chords') so it generates chords.
-                # And we put `block_type` (intro) into the `description` string, hoping `_detect_style` or internal logic picks it up 
-                # OR we modify generator to accept explicit `fragment_type`?
-                # For now, let's stick to passing `sub_option=inst_sub`. 
-                # The intensity/density is mostly controlled by DNA found for that sub-option.
-                # Intro/Verse differentiation might be weak if DNA doesn't vary by block type.
-                # However, `AdvancedPatternGenerator` does use `sub_option` primarily.
-                # If we want 'intro' drums, we must pass 'intro' as sub_option.
-                # But then we get drums.
-                # What if we want 'intro' chords?
-                # We need to trust the generator interprets `description` or `intensity`.
-                # Let's pass `sub_option=inst_sub` (role) and hope Intensity controls the "Intro-ness" (low intensity).
-                
-                # Intensity Mapping
-                # block['intensity'] -> 'low', 'medium', 'high'
-                # Map directly to float for AdvancedPatternGenerator math
-                block_intensity = block.get('intensity', 'medium')
-                complexity_map = {'low': 0.3, 'medium': 0.6, 'high': 0.9}
-                complexity = complexity_map.get(block_intensity, 0.6)
-                
-                # Generate
-                block_mid, _ = self.generator.generate(
-                    description=f"{style} {block_type} {track_name}",
-                    style=style,
-                    instrument=inst_cat,       # drums, bass, melody
-                    sub_option=inst_sub,       # full_kit, groove_bass, chords, lead
-                    bpm=bpm,
-                    bars=bars,
-                    key=key,
-                    scale_type=scale,
-                    complexity=complexity,     # Use block intensity for dynamics
-                    humanize=True
-                )
-                
-                # Extract events
-                source_track = block_mid.tracks[0]
-                block_ticks = 0
-                
-                for msg in source_track:
-                    if msg.type in ['set_tempo', 'end_of_track', 'track_name']: continue
-                    
-                    new_msg = msg.copy()
-                    
-                    # Force Channel
-                    if hasattr(new_msg, 'channel'):
-                        new_msg.channel = channel
-                        
-                    track.append(new_msg)
-                    block_ticks += new_msg.time
-                    
-                # Pad
-                expected_ticks = bars * ticks_per_bar
-                if block_ticks < expected_ticks:
-                    gap = expected_ticks - block_ticks
-                    # Use a meta event to bridge the gap in delta time
-                    # But we need an event to carry the delta time.
-                    # Text/Marker is safe.
-                    track.append(mido.MetaMessage('marker', text=f"End {block_type}", time=int(gap)))
-                elif block_ticks > expected_ticks:
-                    logger.warning(f"{track_name} Block {block_type} overflow.")
-                    
-        return final_mid
+        if output not in ('midi', 'bytes'):
+            raise ValueError(f"Unknown output '{output}' (expected 'midi' or 'bytes')")
+        buffer = io.BytesIO()
+        self.write_arrangement(buffer, structure, style, key, scale, bpm, instrument, seed)
+        data = buffer.getvalue()
+        return data if output == 'bytes' else read_midi_file(data)
+
+    def write_arrangement(
+        self,
+        out: BinaryIO,
+        structure: List[Dict],
+        style: str,
+        key: str = "C",
+        scale: str = "minor",
+        bpm: int = 120,
+        instrument: str = "full_kit",
+        seed: Optional[int] = None
+    ) -> int:
+        """
+        Stream the arrangement (as generate_arrangement) into the binary file `out`;
+        returns the number of bytes written.
+
+        The song is produced block by block across all tracks: a window of
+        blocks (one per pool worker) is rendered, appended to every track chunk
+        (smf_writer.SmfStreamWriter, spilled to disk when large) and dropped, so
+        memory depends on the longest block, not on the length of the song.
+        Cells of repeated sections are kept until their last occurrence.
+        Cell rendering (each cell also times its own pipeline stages) and
+        stitching are timed into generation_stage_seconds as
+        'arrangement_block' / 'stitch'.
+        """
+        if seed is None:
+            seed = GenerationContext().seed
+        offsets = self.block_offsets(structure, self.ppq)
+
+        # Repeated sections share their cells: each distinct cell is rendered once
+        # and kept (in `live`) until the last block that uses it
+        block_seeds = [self.block_seed(seed, structure, index) for index in range(len(structure))]
+        block_keys = [(str(block.get('type')), block.get('bars', 4), block.get('intensity', 'medium'), block_seed)
+                      for block, block_seed in zip(structure, block_seeds)]
+        uses = Counter(block_keys)
+        metrics.counter("arrangement_cells_total", source="deduplicated").inc(
+            len(TRACKS_CONFIG) * (len(structure) - len(uses)))
+        live: Dict[Cell, np.ndarray] = {}
+
+        timer = StageTimer()
+        with SmfStreamWriter(out, ticks_per_beat=self.ppq, spool_bytes=self.spool_bytes) as writer:
+            tracks = [TrackEncoder(writer.track().write) for _ in TRACKS_CONFIG]
+            for track_index, encoder in enumerate(tracks):
+                encoder.add(empty_notes(), self._track_meta(track_index, bpm))
+
+            window = max(1, self.workers)
+            for first in range(0, len(structure), window):
+                blocks = range(first, min(first + window, len(structure)))
+                cells = {index: self.block_cells(structure[index], block_seeds[index]) for index in blocks}
+                needed = [cell for index in blocks for cell in cells[index] if cell not in live]
+                live.update(self._render_cells(needed, style, key, scale, bpm, self.ppq))
+                timer.reset()
+
+                # Stitch: every track gets the blocks at their bar offsets, in structure order
+                for index in blocks:
+                    end = offsets[index + 1]
+                    marker = f"End {structure[index].get('type')}".encode('latin-1', errors='replace')
+                    for encoder, cell in zip(tracks, cells[index]):
+                        encoder.add(offset_notes(live[cell], offsets[index]), [(end, meta_message(META_MARKER, marker))])
+                        encoder.flush(until=end)
+                    uses[block_keys[index]] -= 1
+                    if not uses[block_keys[index]]:
+                        del uses[block_keys[index]]
+                        for cell in cells[index]:
+                            live.pop(cell, None)
+                timer.lap('stitch')
+
+            for encoder in tracks:
+                encoder.flush()
+        return writer.bytes_written
+
+    def regenerate_block(
+        self,
+        base: bytes,
+        structure: List[Dict],
+        block_index: int,
+        style: str,
+        key: str = "C",
+        scale: str = "minor",
+        bpm: int = 120,
+        instrument: str = "full_kit",
+        seed: Optional[int] = None,
+        block_seed: Optional[int] = None
+    ) -> Tuple[bytes, int]:
+        """
+        Re-roll one block of an arrangement generated from (structure, seed).
+
+        Only that block's cells are rendered (one per track), with `block_seed`
+        (random when None); their notes replace the block's notes in `base` (the
+        encoded .mid), every other block is kept as is. Returns (data, block_seed): with
+        structure[block_index]['seed'] = block_seed, generate_arrangement(structure,
+        seed=seed) reproduces the result. `seed` (the arrangement seed) is not
+        needed for that and only accepted so stored parameters can be passed as is.
+        """
+        if not 0 <= block_index < len(structure):
+            raise ValueError(f"Block index must be in 0..{len(structure) - 1}, got {block_index}")
+        midi_type, ticks_per_beat, bodies = split_file(base)
+        if len(bodies) != len(TRACKS_CONFIG):
+            raise ValueError(f"Expected a {len(TRACKS_CONFIG)}-track arrangement, got {len(bodies)} tracks")
+
+        if block_seed is None:
+            block_seed = GenerationContext().seed
+
+        offsets = self.block_offsets(structure, ticks_per_beat)
+        offset = offsets[block_index]
+        region = [(offset, offsets[block_index + 1])]
+        cells = self.block_cells(structure[block_index], block_seed)
+        rendered = self._render_cells(cells, style, key, scale, bpm, ticks_per_beat)
+
+        timer = StageTimer()
+        spliced = []
+        for body, cell in zip(bodies, cells):
+            spliced.append(splice_track(body, offset_notes(rendered[cell], offset), region))
+            timer.lap('stitch')
+        return encode_file(spliced, ticks_per_beat, midi_type), block_seed
+
+    def _render_cells(self, cells: List[Cell], style: str, key: str, scale: str,
+                      bpm: int, ppq: int) -> Dict[Cell, np.ndarray]:
+        """
+        Notes (ticks at `ppq` relative to the block start, on the track channel,
+        read-only) of every distinct cell: cached ones are reused, the others
+        rendered inline or on the pool.
+        """
+        song = (style, key, scale, bpm, ppq)
+        rendered: Dict[Cell, np.ndarray] = {}
+        missing: List[Cell] = []
+        for cell in dict.fromkeys(cells):
+            cached = self._cached(song + cell)
+            if cached is not None:
+                rendered[cell] = cached
+            else:
+                missing.append(cell)
+        metrics.counter("arrangement_cells_total", source="cached").inc(len(rendered))
+        metrics.counter("arrangement_cells_total", source="rendered").inc(len(missing))
+
+        timer = StageTimer()
+        pool = self._get_pool() if len(missing) > 1 else None
+        if pool is None:
+            results = ((cell, render_cell(self.generator, cell_params(cell, *song))) for cell in missing)
+        else:
+            task = render_cell_task if self.kind == 'process' else self._render_with_own_generator
+            futures = {pool.submit(task, cell_params(cell, *song)): cell for cell in missing}
+            results = ((futures[future], future.result()) for future in as_completed(futures))
+
+        # Laps taken in worker processes are only exported there
+        remote = pool is not None and self.kind == 'process'
+        for cell, (notes, stages) in results:
+            # Each render collects its own stages (it may run on another worker): add them to the request's
+            record_stages(stages)
+            if remote:
+                export_stages(stages)
+            rendered[cell] = self._cell_notes(cell, notes, ppq)
+            self._remember(song + cell, rendered[cell])
+            timer.lap('arrangement_block')
+        return rendered
+
+    def _render_with_own_generator(self, params: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, float]]:
+        return render_cell(self.generator, params)
+
+    def _get_pool(self) -> Optional[Executor]:
+        if self.workers <= 1:
+            return None
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == 'process':
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_cell_worker)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="arrangement")
+        return self._pool
+
+    def _cached(self, key: Tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            notes = self._cells.get(key)
+            if notes is not None:
+                self._cells.move_to_end(key)
+            return notes
+
+    def _remember(self, key: Tuple, notes: np.ndarray) -> None:
+        if not self.cache_size:
+            return
+        with self._lock:
+            self._cells[key] = notes
+            self._cells.move_to_end(key)
+            while len(self._cells) > self.cache_size:
+                self._cells.popitem(last=False)
+
+    def _track_meta(self, track_index: int, bpm: int) -> List[TimedEvent]:
+        """Track name (+ tempo on the drums track); every block adds its closing marker."""
+        track_name = TRACKS_CONFIG[track_index][3]
+        meta = [(0, meta_message(META_TRACK_NAME, track_name.encode('latin-1')))]
+        if track_name == 'Drums': # Tempo typically on track 0 (or all)
+            tempo = mido.bpm2tempo(bpm).to_bytes(3, 'big')
+            meta.append((0, meta_message(META_SET_TEMPO, tempo)))
+        return meta
+
+    @staticmethod
+    def _cell_notes(cell: Cell, notes: np.ndarray, ppq: int) -> np.ndarray:
+        """Notes of a rendered cell that start inside the block, moved to the track channel (read-only)."""
+        channel, track_name = TRACKS_CONFIG[cell.track_index][2:]
+        kept = clip_notes(notes, [(0, cell.bars * 4 * ppq)], channel=channel)
+        if len(kept) < len(notes):
+            logger.warning(f"{track_name} Block {cell.block_type} overflow: {len(notes) - len(kept)} notes dropped.")
+        kept.flags.writeable = False  # shared through the cell cache
+        return kept
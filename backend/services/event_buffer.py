@@ -0,0 +1,324 @@
+"""
+Columnar (struct-of-arrays) event storage for the generation pipeline.
+
+Every stage of IntegratedMidiGenerator used to pass a list of dicts around and
+copy each dict on the way. EventBuffer keeps the same information in a handful
+of NumPy columns so stages can read and write whole columns in place.
+`from_dicts` / `to_dicts` are the adapter for legacy dict-based consumers.
+
+Times and durations are integer ticks at the buffer's `ppq` (ticks per quarter
+note, written to the MIDI file as ticks_per_beat): grid positions are exact
+(a 16th is ppq // 4 ticks), so stages compare and index them without float
+tolerances and the encoder uses them as they are. Legacy dicts keep float
+beats; the adapters convert at the boundary.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Sentinel for events that have not been assigned a pitch yet
+NO_PITCH = -1
+
+# Timeline resolution (ticks per quarter note) unless a generator is configured otherwise
+DEFAULT_PPQ = 480
+# The finest value the engines place notes on is a 64th note (ppq // 16 ticks)
+PPQ_STEP = 16
+MAX_PPQ = 0x7FFF  # 15-bit ticks_per_beat in the MIDI header
+
+# Bit flags (replace the ad-hoc 'type', 'is_chord', 'articulation' dict keys)
+FLAG_GHOST = 1 << 0
+FLAG_CHORD = 1 << 1
+FLAG_ARP = 1 << 2
+FLAG_PASSING = 1 << 3
+FLAG_ACCENT = 1 << 4
+FLAG_STACCATO = 1 << 5
+FLAG_PUNCH = 1 << 6
+
+_ARTICULATION_FLAGS = {
+    'accent': FLAG_ACCENT,
+    'staccato': FLAG_STACCATO,
+    'punch': FLAG_PUNCH,
+}
+_TYPE_FLAGS = {
+    'ghost': FLAG_GHOST,
+    'passing': FLAG_PASSING,
+}
+
+# Instrument vocabulary. Code 0 means "unknown / not tagged".
+# Unknown names are interned on first use so codes stay stable for the process.
+INSTRUMENT_NAMES: List[str] = [
+    '',
+    # Drum voices
+    'kick', 'snare', 'hat', 'perc', 'shake', 'crash', 'ride', 'tom', 'clap', 'rim',
+    # Aggregate drum instruments
+    'drums', 'drum', 'full_kit', 'full_drums', 'percussion', 'hats', 'hihat',
+    # Melodic
+    'bass', 'sub', '808', 'groove_bass', 'melody', 'lead', 'synth', 'keys', 'piano',
+    'pad', 'chords', 'strings', 'arp',
+]
+_INSTRUMENT_CODES: Dict[str, int] = {name: code for code, name in enumerate(INSTRUMENT_NAMES)}
+_intern_lock = threading.Lock()
+
+
+def instrument_code(name: Optional[str]) -> int:
+    """Return the integer code for an instrument name (interning unknown names)."""
+    if not name:
+        return 0
+    code = _INSTRUMENT_CODES.get(name)
+    if code is not None:
+        return code
+    with _intern_lock:
+        code = _INSTRUMENT_CODES.get(name)
+        if code is None:
+            if len(INSTRUMENT_NAMES) > np.iinfo(np.uint8).max:
+                return 0
+            code = len(INSTRUMENT_NAMES)
+            INSTRUMENT_NAMES.append(name)
+            _INSTRUMENT_CODES[name] = code
+        return code
+
+
+def instrument_name(code: int) -> str:
+    """Inverse of instrument_code."""
+    return INSTRUMENT_NAMES[code] if 0 <= code < len(INSTRUMENT_NAMES) else ''
+
+
+def check_ppq(ppq: int) -> int:
+    """Validated PPQ: a multiple of PPQ_STEP (so every engine grid value is whole ticks) up to MAX_PPQ."""
+    ppq = int(ppq)
+    if not 0 < ppq <= MAX_PPQ or ppq % PPQ_STEP:
+        raise ValueError(f"PPQ must be a multiple of {PPQ_STEP} between {PPQ_STEP} and {MAX_PPQ}, got {ppq}")
+    return ppq
+
+
+def beats_to_ticks(beats, ppq: int = DEFAULT_PPQ) -> np.ndarray:
+    """Float beat times (quarter notes) -> int64 ticks, rounded to the nearest tick."""
+    return np.rint(np.asarray(beats, dtype=np.float64) * ppq).astype(np.int64)
+
+
+def ticks_to_beats(ticks, ppq: int = DEFAULT_PPQ) -> np.ndarray:
+    """Inverse of beats_to_ticks (float64 beats)."""
+    return np.asarray(ticks, dtype=np.float64) / ppq
+
+
+def _tick_column(values) -> np.ndarray:
+    column = np.asarray(values)
+    if column.dtype.kind == 'f' and not np.array_equal(column, np.trunc(column)):
+        raise ValueError("EventBuffer times and durations are integer ticks (see beats_to_ticks)")
+    return column.astype(np.int64)
+
+
+class EventBuffer:
+    """
+    Struct-of-arrays container for note events.
+
+    Columns (all of equal length):
+        time       int64    start in ticks (`ppq` per quarter note)
+        duration   int64    length in ticks
+        pitch      int16    MIDI note, NO_PITCH if not assigned yet
+        velocity   int16    MIDI velocity
+        channel    int8     MIDI channel (0-15)
+        instrument uint8    instrument code (see instrument_code)
+        flags      uint16   FLAG_* bitmask
+
+    Stages mutate the columns directly (e.g. `buf.velocity[mask] += 10`).
+    Operations that change the row count (take/keep/concatenate) return or
+    install fresh column arrays. Derived buffers keep the resolution (`ppq`).
+    """
+
+    __slots__ = ('time', 'duration', 'pitch', 'velocity', 'channel', 'instrument', 'flags', 'ppq')
+
+    COLUMNS = ('time', 'duration', 'pitch', 'velocity', 'channel', 'instrument', 'flags')
+    DTYPES = {
+        'time': np.int64,
+        'duration': np.int64,
+        'pitch': np.int16,
+        'velocity': np.int16,
+        'channel': np.int8,
+        'instrument': np.uint8,
+        'flags': np.uint16,
+    }
+
+    def __init__(self, size: int = 0, ppq: int = DEFAULT_PPQ):
+        self.ppq = ppq
+        self.time = np.zeros(size, dtype=np.int64)
+        self.duration = np.zeros(size, dtype=np.int64)
+        self.pitch = np.full(size, NO_PITCH, dtype=np.int16)
+        self.velocity = np.zeros(size, dtype=np.int16)
+        self.channel = np.zeros(size, dtype=np.int8)
+        self.instrument = np.zeros(size, dtype=np.uint8)
+        self.flags = np.zeros(size, dtype=np.uint16)
+
+    # --- Construction -------------------------------------------------------
+
+    @classmethod
+    def from_columns(cls,
+                     time: Union[Sequence[int], np.ndarray],
+                     duration: Union[int, Sequence[int], np.ndarray] = DEFAULT_PPQ // 4,
+                     velocity: Union[int, Sequence[int], np.ndarray] = 100,
+                     pitch: Union[int, Sequence[int], np.ndarray] = NO_PITCH,
+                     channel: Union[int, Sequence[int], np.ndarray] = 0,
+                     instrument: Union[int, Sequence[int], np.ndarray] = 0,
+                     flags: Union[int, Sequence[int], np.ndarray] = 0,
+                     ppq: int = DEFAULT_PPQ) -> 'EventBuffer':
+        """Build a buffer from column data (times in ticks). Scalars are broadcast to every row."""
+        buf = cls.__new__(cls)
+        buf.ppq = ppq
+        buf.time = _tick_column(time).reshape(-1)
+        size = buf.time.shape[0]
+        for name, value in (('duration', _tick_column(duration)), ('velocity', velocity), ('pitch', pitch),
+                            ('channel', channel), ('instrument', instrument), ('flags', flags)):
+            column = np.empty(size, dtype=cls.DTYPES[name])
+            column[:] = value
+            setattr(buf, name, column)
+        return buf
+
+    @classmethod
+    def from_dicts(cls, events: Iterable[Dict], instrument: Optional[str] = None,
+                   ppq: int = DEFAULT_PPQ) -> 'EventBuffer':
+        """
+        Adapter from the legacy list-of-dicts representation.
+
+        Args:
+            events: Event dicts with at least 'time' (in beats)
+            instrument: Instrument name used when an event has no 'instrument_type'
+            ppq: Resolution of the buffer; times are rounded to the nearest tick
+        """
+        events = list(events)
+        buf = cls(len(events), ppq)
+        default_code = instrument_code(instrument)
+        buf.time[:] = beats_to_ticks([event.get('time', 0.0) for event in events], ppq)
+        buf.duration[:] = beats_to_ticks([event.get('duration', 0.0) for event in events], ppq)
+        for i, event in enumerate(events):
+            pitch = event.get('pitch')
+            if pitch is None and isinstance(event.get('note'), int):
+                pitch = event['note']
+            if isinstance(pitch, (int, np.integer)):
+                buf.pitch[i] = pitch
+            buf.velocity[i] = int(event.get('velocity', 0))
+            buf.channel[i] = event.get('channel', 0)
+            if 'instrument_type' in event:
+                buf.instrument[i] = instrument_code(event['instrument_type'])
+            else:
+                buf.instrument[i] = default_code
+
+            flags = _TYPE_FLAGS.get(event.get('type'), 0)
+            flags |= _ARTICULATION_FLAGS.get(event.get('articulation'), 0)
+            if event.get('is_chord'):
+                flags |= FLAG_CHORD
+            if event.get('is_arp'):
+                flags |= FLAG_ARP
+            buf.flags[i] = flags
+        return buf
+
+    @classmethod
+    def coerce(cls, events: Union['EventBuffer', Iterable[Dict]]) -> 'EventBuffer':
+        """Return `events` as an EventBuffer, converting legacy dict lists."""
+        if isinstance(events, EventBuffer):
+            return events
+        return cls.from_dicts(events)
+
+    @classmethod
+    def concatenate(cls, buffers: Sequence['EventBuffer']) -> 'EventBuffer':
+        """Concatenate buffers row-wise (in the given order); they must share one resolution."""
+        buf = cls.__new__(cls)
+        resolutions = {b.ppq for b in buffers}
+        if len(resolutions) > 1:
+            raise ValueError(f"Cannot concatenate buffers with different PPQ: {sorted(resolutions)}")
+        buf.ppq = resolutions.pop() if resolutions else DEFAULT_PPQ
+        for name in cls.COLUMNS:
+            parts = [getattr(b, name) for b in buffers]
+            if parts:
+                column = np.concatenate(parts)
+            else:
+                column = np.zeros(0, dtype=cls.DTYPES[name])
+            setattr(buf, name, column)
+        return buf
+
+    # --- Export -------------------------------------------------------------
+
+    def to_dicts(self) -> List[Dict]:
+        """Adapter back to the legacy list-of-dicts representation (times in beats)."""
+        events = []
+        columns = [getattr(self, name).tolist() for name in self.COLUMNS]
+        columns[0] = ticks_to_beats(self.time, self.ppq).tolist()
+        columns[1] = ticks_to_beats(self.duration, self.ppq).tolist()
+        for time, duration, pitch, velocity, channel, instrument, flags in zip(*columns):
+            event = {
+                'time': time,
+                'duration': duration,
+                'velocity': velocity,
+                'channel': channel,
+            }
+            if pitch != NO_PITCH:
+                event['pitch'] = pitch
+            if instrument:
+                event['instrument_type'] = instrument_name(instrument)
+            if flags:
+                if flags & FLAG_GHOST:
+                    event['type'] = 'ghost'
+                elif flags & FLAG_PASSING:
+                    event['type'] = 'passing'
+                if flags & FLAG_CHORD:
+                    event['is_chord'] = True
+                if flags & FLAG_ARP:
+                    event['is_arp'] = True
+                for articulation, bit in _ARTICULATION_FLAGS.items():
+                    if flags & bit:
+                        event['articulation'] = articulation
+            events.append(event)
+        return events
+
+    # --- Row operations -----------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.time.shape[0]
+
+    def __repr__(self) -> str:
+        return f"EventBuffer(rows={len(self)}, ppq={self.ppq})"
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    def copy(self) -> 'EventBuffer':
+        buf = EventBuffer.__new__(EventBuffer)
+        buf.ppq = self.ppq
+        for name in self.COLUMNS:
+            setattr(buf, name, getattr(self, name).copy())
+        return buf
+
+    def take(self, index: np.ndarray) -> 'EventBuffer':
+        """Return a new buffer with the rows selected by an index array or boolean mask."""
+        buf = EventBuffer.__new__(EventBuffer)
+        buf.ppq = self.ppq
+        for name in self.COLUMNS:
+            setattr(buf, name, getattr(self, name)[index])
+        return buf
+
+    def keep(self, mask: np.ndarray) -> 'EventBuffer':
+        """Drop the rows where `mask` is False (in place). Returns self for chaining."""
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[mask])
+        return self
+
+    def reorder(self, index: np.ndarray) -> 'EventBuffer':
+        """Permute/repeat rows by an index array (in place). Returns self for chaining."""
+        return self.keep(index)
+
+    def sort_by_time(self) -> 'EventBuffer':
+        """Stable sort by start time (in place), matching list.sort(key=time)."""
+        if len(self) > 1:
+            order = np.argsort(self.time, kind='stable')
+            self.reorder(order)
+        return self
+
+    def shifted(self, offset: int) -> 'EventBuffer':
+        """Return a copy with every start time moved by `offset` ticks."""
+        buf = self.copy()
+        buf.time += offset
+        return buf
+
+    def has_flag(self, flag: int) -> np.ndarray:
+        return (self.flags & flag) != 0
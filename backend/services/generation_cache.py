@@ -0,0 +1,279 @@
+"""
+Two-tier cache for generation results.
+
+With an explicit seed the generator is deterministic, so a repeated request
+(same description, style, instrument, DNA, key, scale, BPM, bars and seed) can
+return the previously encoded MIDI bytes instead of rerunning the pipeline.
+
+Tier 1: in-memory LRU of GenerationResult objects, bounded by total MIDI bytes.
+Tier 2: on-disk content-addressed store under GENERATION_CACHE_DIR:
+            objects/<sha256 of the .mid bytes>.mid   (identical outputs stored once)
+            refs/<request key>.json                  (-> object hash and every other GenerationResult field)
+        bounded by total object bytes, least recently used objects evicted first.
+Both tiers return the same GenerationResult, timings included.
+
+Requests without a seed are never cached: every call is meant to be new.
+
+The disk tier does file I/O (and, when over its limit, a directory scan), so
+async callers use get_async / put_async: the memory tier is still read and
+filled inline, the disk tier runs on a thread instead of the event loop.
+
+Configuration (environment):
+    GENERATION_CACHE_ENABLED     '1' (default) / '0'
+    GENERATION_CACHE_DIR         default 'storage/cache'
+    GENERATION_CACHE_MEMORY_MB   default 64
+    GENERATION_CACHE_DISK_MB     default 512
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from services.generation_executor import GenerationResult
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever generator output for the same parameters changes,
+# so stale entries from older code are never served.
+CACHE_VERSION = 7
+
+# GenerationResult fields kept in the ref next to the object hash
+_REF_FIELDS = tuple(f.name for f in fields(GenerationResult) if f.name != 'midi_bytes')
+
+
+def canonical_request_key(task: str, params: Dict[str, Any]) -> str:
+    """sha256 of the canonical JSON form of (cache version, task, params)."""
+    payload = json.dumps(
+        {'v': CACHE_VERSION, 'task': task, 'params': params},
+        sort_keys=True, separators=(',', ':'), default=str, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self,
+                 cache_dir: Optional[str] = "storage/cache",
+                 memory_bytes: int = 64 * 1024 * 1024,
+                 disk_bytes: int = 512 * 1024 * 1024,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.memory_limit = memory_bytes
+        self.disk_limit = disk_bytes
+        self._memory: "OrderedDict[str, GenerationResult]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()  # disk writes and _disk_size; never held by memory lookups
+
+        self.root = Path(cache_dir) if (cache_dir and enabled) else None
+        self._disk_size = 0
+        if self.root is not None:
+            (self.root / "objects").mkdir(parents=True, exist_ok=True)
+            (self.root / "refs").mkdir(parents=True, exist_ok=True)
+            self._disk_size = sum(entry.stat().st_size for entry in os.scandir(self.root / "objects"))
+            metrics.gauge("generation_cache_disk_bytes").set(self._disk_size)
+
+    @classmethod
+    def from_env(cls) -> 'GenerationCache':
+        return cls(
+            cache_dir=os.getenv("GENERATION_CACHE_DIR", "storage/cache"),
+            memory_bytes=int(float(os.getenv("GENERATION_CACHE_MEMORY_MB", 64)) * 1024 * 1024),
+            disk_bytes=int(float(os.getenv("GENERATION_CACHE_DISK_MB", 512)) * 1024 * 1024),
+            enabled=os.getenv("GENERATION_CACHE_ENABLED", "1") not in ("0", "false", "False"),
+        )
+
+    def key(self, task: str, params: Dict[str, Any]) -> Optional[str]:
+        """Cache key for a request, or None if the request is not cacheable (no seed)."""
+        if not self.enabled or params.get('seed') is None:
+            return None
+        return canonical_request_key(task, params)
+
+    # --- Lookup -----------------------------------------------------------------
+
+    def get(self, key: Optional[str]) -> Optional[GenerationResult]:
+        if key is None:
+            metrics.counter("generation_cache_bypass_total").inc()
+            return None
+        result = self._get_memory(key)
+        if result is not None:
+            return result
+        return self._get_disk(key)
+
+    async def get_async(self, key: Optional[str]) -> Optional[GenerationResult]:
+        """get() for the event loop: a memory hit is returned inline, the disk read runs on a thread."""
+        if key is None:
+            metrics.counter("generation_cache_bypass_total").inc()
+            return None
+        result = self._get_memory(key)
+        if result is not None:
+            return result
+        if self.root is None:
+            return self._get_disk(key)  # no disk tier: only records the miss
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_disk, key)
+
+    def _get_memory(self, key: str) -> Optional[GenerationResult]:
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+        if result is not None:
+            metrics.counter("generation_cache_hits_total", tier="memory").inc()
+        return result
+
+    def _get_disk(self, key: str) -> Optional[GenerationResult]:
+        result = self._read_disk(key)
+        if result is not None:
+            metrics.counter("generation_cache_hits_total", tier="disk").inc()
+            self._remember(key, result)
+            return result
+
+        metrics.counter("generation_cache_misses_total").inc()
+        return None
+
+    def put(self, key: Optional[str], result: GenerationResult) -> None:
+        if key is None:
+            return
+        self._remember(key, result)
+        self._store(key, result)
+
+    async def put_async(self, key: Optional[str], result: GenerationResult) -> None:
+        """put() for the event loop: the memory tier is filled inline, the disk write
+        (and any eviction scan) runs on a thread."""
+        if key is None:
+            return
+        self._remember(key, result)
+        if self.root is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._store, key, result)
+
+    def _store(self, key: str, result: GenerationResult) -> None:
+        try:
+            self._write_disk(key, result)
+        except OSError as e:
+            logger.warning(f"Generation cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_size,
+            'memory_limit': self.memory_limit,
+            'disk_bytes': self._disk_size,
+            'disk_limit': self.disk_limit,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        metrics.gauge("generation_cache_memory_bytes").set(0)
+
+    # --- Memory tier ------------------------------------------------------------
+
+    def _remember(self, key: str, result: GenerationResult) -> None:
+        size = len(result.midi_bytes)
+        if size > self.memory_limit:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= len(previous.midi_bytes)
+            self._memory[key] = result
+            self._memory_size += size
+            while self._memory_size > self.memory_limit:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted.midi_bytes)
+                metrics.counter("generation_cache_evictions_total", tier="memory").inc()
+            metrics.gauge("generation_cache_memory_bytes").set(self._memory_size)
+
+    # --- Disk tier (content addressed) ------------------------------------------
+
+    def _ref_path(self, key: str) -> Path:
+        return self.root / "refs" / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / f"{digest}.mid"
+
+    def _read_disk(self, key: str) -> Optional[GenerationResult]:
+        if self.root is None:
+            return None
+        ref_path = self._ref_path(key)
+        try:
+            ref = json.loads(ref_path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key[:12]}: {e}")
+            ref_path.unlink(missing_ok=True)
+            return None
+
+        try:
+            object_path = self._object_path(ref['object'])
+            data = object_path.read_bytes()
+        except (OSError, KeyError, TypeError) as e:
+            # Object evicted (or ref malformed): the ref is dangling
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Dropping unreadable cache entry {key[:12]}: {e}")
+            ref_path.unlink(missing_ok=True)
+            return None
+
+        if hashlib.sha256(data).hexdigest() != ref['object']:
+            logger.warning(f"Cache object {ref['object'][:12]} is corrupt, dropping it")
+            object_path.unlink(missing_ok=True)
+            ref_path.unlink(missing_ok=True)
+            return None
+
+        # Touch so disk eviction is least-recently-used
+        os.utime(object_path)
+        return GenerationResult(midi_bytes=data, **{name: ref[name] for name in _REF_FIELDS if name in ref})
+
+    def _write_disk(self, key: str, result: GenerationResult) -> None:
+        if self.root is None or len(result.midi_bytes) > self.disk_limit:
+            return
+        digest = hashlib.sha256(result.midi_bytes).hexdigest()
+        object_path = self._object_path(digest)
+        # Writes may run concurrently on executor threads: one at a time keeps _disk_size exact
+        with self._disk_lock:
+            if not object_path.exists():
+                _atomic_write(object_path, result.midi_bytes)
+                self._disk_size += len(result.midi_bytes)
+            else:
+                os.utime(object_path)
+
+            ref = {'object': digest, **{name: getattr(result, name) for name in _REF_FIELDS}}
+            _atomic_write(self._ref_path(key), json.dumps(ref).encode('utf-8'))
+
+            if self._disk_size > self.disk_limit:
+                self._evict_disk()
+            metrics.gauge("generation_cache_disk_bytes").set(self._disk_size)
+
+    def _evict_disk(self) -> None:
+        """Delete least recently used objects until usage is back under 90% of the limit (under _disk_lock)."""
+        target = int(self.disk_limit * 0.9)
+        entries = sorted(os.scandir(self.root / "objects"), key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            if self._disk_size <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+            self._disk_size -= size
+            metrics.counter("generation_cache_evictions_total", tier="disk").inc()
+        # Refs pointing at evicted objects are cleaned up lazily on the next read
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+# Shared cache for all generation routes (configured from the environment)
+generation_cache = GenerationCache.from_env()
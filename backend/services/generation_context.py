@@ -0,0 +1,58 @@
+"""
+Per-request random state for MIDI generation.
+
+Engines used to draw from the process-global `random` module after
+`random.seed(seed)`, so two generations running at the same time in different
+threads interleaved their draws and neither was reproducible. A
+GenerationContext owns a dedicated `random.Random` and `numpy.random.Generator`
+for one request and is passed explicitly through every engine.
+"""
+import random
+from typing import Optional
+
+import numpy as np
+
+MAX_SEED = 2**32 - 1
+
+
+class GenerationContext:
+    """
+    Random state for a single generation request.
+
+    Attributes:
+        seed:   The seed the context was created from (returned to the client)
+        rng:    random.Random for scalar draws (same API as the `random` module)
+        np_rng: numpy.random.Generator for vectorized draws (created lazily)
+    """
+
+    __slots__ = ('seed', 'rng', '_np_rng')
+
+    def __init__(self, seed: Optional[int] = None):
+        if seed is None:
+            seed = random.SystemRandom().randint(0, MAX_SEED)
+        self.seed = int(seed)
+        self.rng = random.Random(self.seed)
+        self._np_rng = None
+
+    @property
+    def np_rng(self) -> np.random.Generator:
+        if self._np_rng is None:
+            self._np_rng = np.random.default_rng(self.seed)
+        return self._np_rng
+
+    @classmethod
+    def from_global(cls) -> 'GenerationContext':
+        """
+        Context for legacy callers that do not pass one.
+        Seeded from the global `random` module, so `random.seed(x)` before the call
+        still makes the result reproducible in single-threaded code.
+        """
+        return cls(random.getrandbits(32))
+
+    def __repr__(self) -> str:
+        return f"GenerationContext(seed={self.seed})"
+
+
+def ensure_context(ctx: Optional[GenerationContext] = None) -> GenerationContext:
+    """Return `ctx`, or a context seeded from the global RNG when it is None."""
+    return ctx if ctx is not None else GenerationContext.from_global()
@@ -0,0 +1,313 @@
+"""
+Runs CPU-bound MIDI generation off the asyncio event loop.
+
+The generation routes are `async def`; calling IntegratedMidiGenerator or
+ArrangementService directly from them blocks every other request on the worker
+(health checks, auth, downloads) until the pattern is rendered. The routes now
+`await generation_executor.run(task, params)` instead, which hands the work to a
+pool of warm workers.
+
+Configuration (environment):
+    GENERATION_EXECUTOR     'thread' (default) or 'process'
+    GENERATION_WORKERS      pool size (default: min(4, cpu count))
+    GENERATION_MAX_IN_FLIGHT  generations running at once (default: pool size)
+    GENERATION_QUEUE_SIZE   max requests waiting for a slot (default: 32)
+    GENERATION_QUEUE_TIMEOUT  seconds a request may wait for a slot (default: 10, 0 = no limit)
+    GENERATION_INTERACTIVE_RESERVE  extra slots only interactive previews may use (default: 1)
+    GENERATION_PRIORITY_WEIGHTS     e.g. 'interactive=8,standard=4,batch=1' (the default)
+    GENERATION_CLASS_LIMITS         per-class caps, e.g. 'batch=1' (default: batch gets half the slots)
+    MIDI_ENCODER            'native' (default, services.smf_writer) or 'mido'
+
+Workers return a GenerationResult with the encoded .mid bytes, so results are
+cheap to pickle across processes and routes only have to write them out. The
+result also carries the worker-measured generation time and its per-stage
+breakdown (utils.stage_timer), which routes store on the history row.
+services.single_flight.cached_generation replaces the time with the request's
+own wait when the result was not generated for it (cached=True).
+
+Every run first takes a slot from the executor's AdmissionController
+(services.admission_control). It bounds in-flight work and the wait for it,
+so overload turns into fast 503s instead of unbounded latency. Slots are
+shared between priority classes (interactive / standard / batch, passed as
+run(..., priority=)), so previews are not stuck behind arrangement renders.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+# GenerationQueueFull is re-exported: routes catch it from here to answer 503
+from services.admission_control import (
+    STANDARD, AdmissionController, GenerationQueueFull, parse_class_settings
+)
+from services.generation_context import GenerationContext
+from services.generator_registry import generator_registry
+from services.smf_writer import midi_file_bytes, track_count
+from utils.metrics import metrics
+from utils.stage_timer import collect_stages, export_stages
+
+logger = logging.getLogger(__name__)
+
+# 'native' encodes note columns straight to .mid bytes; 'mido' builds a MidiFile first
+MIDI_ENCODER = os.getenv("MIDI_ENCODER", "native").lower()
+
+
+@dataclass
+class GenerationResult:
+    """What a worker sends back: the encoded MIDI file plus metadata."""
+    midi_bytes: bytes
+    seed: Optional[int]
+    track_count: int
+    generation_ms: Optional[int] = None                 # server-measured, generate + encode
+    stages_ms: Optional[Dict[str, float]] = None        # per-stage breakdown of the run that made midi_bytes
+    cached: bool = False                                # served without a run of its own (cache, coalesced)
+
+
+# --- Worker side -------------------------------------------------------------
+# Workers share the process-wide generator registry; the pool initializer
+# prewarms it so the first request does not pay the construction cost.
+
+def _init_worker() -> None:
+    generator_registry.prewarm()
+
+
+def _warm_up() -> int:
+    generator_registry.prewarm()
+    return os.getpid()
+
+
+def generate_midi_task(params: Dict[str, Any]) -> GenerationResult:
+    """IntegratedMidiGenerator.generate(**params) on the shared generator."""
+    generator = generator_registry.get('integrated')
+    with collect_stages() as timings:
+        if MIDI_ENCODER == 'native':
+            data, seed = generator.generate(output='bytes', **params)
+            tracks = track_count(data)
+        else:
+            midi, seed = generator.generate(**params)
+            data, tracks = midi_file_bytes(midi), len(midi.tracks)
+    return GenerationResult(data, seed, tracks, timings.total_ms, timings.stages_ms)
+
+
+def generate_arrangement_task(params: Dict[str, Any], path: Optional[str] = None) -> GenerationResult:
+    """
+    ArrangementService.generate_arrangement(**params) on the shared service.
+    Unseeded requests get a fresh seed, returned so the arrangement can be re-rendered.
+    With `path` the file is streamed to a temporary file next to it (write_arrangement,
+    bounded memory for long songs) and moved onto `path` only once complete, so a
+    failed render never truncates the arrangement stored there; the result carries
+    no bytes.
+    """
+    seed = params.get('seed')
+    if seed is None:
+        seed = GenerationContext().seed
+    service = generator_registry.get('arrangement')
+    with collect_stages() as timings:
+        if path is None:
+            data = service.generate_arrangement(**{**params, 'seed': seed}, output='bytes')
+            tracks = track_count(data)
+        else:
+            directory, name = os.path.split(path)
+            tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                with open(tmp_path, 'w+b') as out:
+                    service.write_arrangement(out, **{**params, 'seed': seed})
+                    out.seek(0)
+                    data, tracks = b'', track_count(out.read(14))
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+    return GenerationResult(data, seed, tracks, timings.total_ms, timings.stages_ms)
+
+
+# --- Incremental regeneration ------------------------------------------------
+# The stored parameters of a generation (request params + seed, see the
+# Generation.params column) fully determine its file, so the .mid on disk is
+# only an optimization: when it is missing the base is re-rendered first.
+
+def _pattern_params(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored pattern parameters without the seeds (base seed and bar edits)."""
+    return {k: v for k, v in source.items() if k not in ('seed', 'edits')}
+
+
+def _render_pattern(source: Dict[str, Any]):
+    """Stored pattern parameters -> .mid bytes, replaying earlier bar edits."""
+    generator = generator_registry.get('integrated')
+    params = _pattern_params(source)
+    data, _ = generator.generate(seed=source.get('seed'), output='bytes', **params)
+    for edit in source.get('edits', ()):
+        data, _ = generator.regenerate_bars(data, edit['bars'], seed=edit['seed'], **params)
+    return data
+
+
+def regenerate_bars_task(params: Dict[str, Any]) -> GenerationResult:
+    """
+    Re-roll bars of a stored pattern. params:
+        source  stored generate params (with 'seed' and earlier 'edits')
+        bars    0-based bar indices to regenerate
+        seed    seed for the new bars (None = random)
+        base    stored .mid bytes, or None to re-render from `source`
+    The result's seed is the one used for the new bars.
+    """
+    generator = generator_registry.get('integrated')
+    source = params['source']
+    with collect_stages() as timings:
+        base = params.get('base') or _render_pattern(source)
+        data, seed = generator.regenerate_bars(base, params['bars'], seed=params.get('seed'),
+                                               **_pattern_params(source))
+    return GenerationResult(data, seed, track_count(data), timings.total_ms, timings.stages_ms)
+
+
+def regenerate_block_task(params: Dict[str, Any]) -> GenerationResult:
+    """
+    Re-roll one block of a stored arrangement. params:
+        source       stored arrangement params (structure, style, ..., seed)
+        block_index  block to regenerate
+        seed         seed for the new block (None = random)
+        base         stored .mid bytes, or None to re-render from `source`
+    The result's seed is the new block seed.
+    """
+    service = generator_registry.get('arrangement')
+    source = params['source']
+    with collect_stages() as timings:
+        base = params.get('base') or service.generate_arrangement(**source, output='bytes')
+        data, seed = service.regenerate_block(base, block_index=params['block_index'],
+                                              block_seed=params.get('seed'), **source)
+    return GenerationResult(data, seed, track_count(data), timings.total_ms, timings.stages_ms)
+
+
+def _timed_call(fn: Callable, *args):
+    # time.time() (not perf_counter) so the wait can be measured across processes
+    started_at = time.time()
+    result = fn(*args)
+    return started_at, time.time(), result
+
+
+# --- Event loop side ---------------------------------------------------------
+
+class GenerationExecutor:
+    """
+    Bounded, instrumented pool for generation tasks.
+
+    At most `max_in_flight` tasks (default: one per worker) run at once and at
+    most `queue_size` more wait for a slot, each for at most `queue_timeout`
+    seconds. Anything beyond that is rejected with GenerationQueueFull instead
+    of piling up behind a saturated CPU. Interactive requests may also use
+    `interactive_reserve` extra slots; the pool gets a worker for each of them.
+    """
+
+    def __init__(self, kind: str = 'thread', workers: int = 2, queue_size: int = 32,
+                 max_in_flight: Optional[int] = None, queue_timeout: Optional[float] = 10.0,
+                 interactive_reserve: int = 1, weights: Optional[Dict[str, float]] = None,
+                 class_limits: Optional[Dict[str, int]] = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind '{kind}' (expected 'thread' or 'process')")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.admission = AdmissionController(max_in_flight or self.workers, self.queue_size, queue_timeout,
+                                             interactive_reserve, weights, class_limits)
+        self.pool_size = max(self.workers, self.admission.max_total)
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'GenerationExecutor':
+        return cls(
+            kind=os.getenv("GENERATION_EXECUTOR", "thread").lower(),
+            workers=int(os.getenv("GENERATION_WORKERS", min(4, os.cpu_count() or 1))),
+            queue_size=int(os.getenv("GENERATION_QUEUE_SIZE", 32)),
+            max_in_flight=int(os.getenv("GENERATION_MAX_IN_FLIGHT", 0)) or None,
+            queue_timeout=float(os.getenv("GENERATION_QUEUE_TIMEOUT", 10)),
+            interactive_reserve=int(os.getenv("GENERATION_INTERACTIVE_RESERVE", 1)),
+            weights=parse_class_settings(os.getenv("GENERATION_PRIORITY_WEIGHTS")),
+            class_limits={name: int(limit) for name, limit in
+                          parse_class_settings(os.getenv("GENERATION_CLASS_LIMITS")).items()},
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.admission.capacity
+
+    @property
+    def pending(self) -> int:
+        return self.admission.pending
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == 'process':
+                        self._pool = ProcessPoolExecutor(max_workers=self.pool_size, initializer=_init_worker)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.pool_size, initializer=_init_worker,
+                                                        thread_name_prefix="generation")
+        return self._pool
+
+    def start(self) -> None:
+        """Create the pool and make every worker prewarm the generator registry now."""
+        pool = self._get_pool()
+        started = time.perf_counter()
+        # Pools spawn workers lazily; one warm-up task per worker forces them all up
+        futures = [pool.submit(_warm_up) for _ in range(self.pool_size)]
+        for future in futures:
+            future.result()
+        logger.info(f"Generation executor ready: {self.pool_size} {self.kind} workers, "
+                    f"queue size {self.queue_size} ({(time.perf_counter() - started) * 1000:.0f} ms warm-up)")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _release(self, priority: str, future=None) -> None:
+        run_seconds = None
+        if future is not None and not future.cancelled() and future.exception() is None:
+            started_at, finished_at, _ = future.result()
+            run_seconds = finished_at - started_at
+        self.admission.release(priority, run_seconds)
+
+    async def run(self, fn: Callable[..., Any], *args, task: Optional[str] = None,
+                  priority: str = STANDARD) -> Any:
+        """
+        Run `fn(*args)` on the pool and await the result.
+        `fn` must be a module-level function (picklable) when kind == 'process'.
+        `priority` is the scheduling class: 'interactive', 'standard' or 'batch'.
+        """
+        task = task or fn.__name__.replace('_task', '')
+        submitted_at = time.time()
+        await self.admission.acquire(task, priority)
+        try:
+            future = self._get_pool().submit(_timed_call, fn, *args)
+        except Exception:
+            self._release(priority)
+            raise
+        # Released when the worker finishes, even if the awaiting request was cancelled
+        future.add_done_callback(functools.partial(self._release, priority))
+
+        try:
+            started_at, finished_at, result = await asyncio.wrap_future(future)
+        except Exception:
+            metrics.counter("generation_failed_total", task=task).inc()
+            raise
+
+        if self.kind == 'process' and isinstance(result, GenerationResult) and result.stages_ms:
+            # The worker's laps went to its own registry: export them here, where /api/metrics reads
+            export_stages({stage: ms / 1000 for stage, ms in result.stages_ms.items()})
+        metrics.counter("generation_completed_total", task=task).inc()
+        metrics.histogram("generation_queue_wait_seconds", task=task).observe(max(0.0, started_at - submitted_at))
+        metrics.histogram("generation_run_seconds", task=task).observe(finished_at - started_at)
+        metrics.histogram("generation_total_seconds", task=task).observe(time.time() - submitted_at)
+        return result
+
+
+# Shared executor for all generation routes (configured from the environment)
+generation_executor = GenerationExecutor.from_env()
@@ -0,0 +1,128 @@
+"""
+Process-wide registry of warm generator instances.
+
+Building an IntegratedMidiGenerator constructs a MidiGenerator (with its own
+AdvancedPatternGenerator), an AdvancedPatternGenerator, MusicTheoryService,
+MusicTheoryEngine and five more engines. Routes used to pay that on every
+request; now they ask the registry, which builds each generator once per
+process and hands the same instance to every caller.
+
+Sharing is safe because generators keep no per-request state: all randomness
+lives in the GenerationContext passed to each call.
+
+    from services.generator_registry import generator_registry
+    midi, seed = generator_registry.get('integrated').generate(...)
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GeneratorRegistry:
+    """Named, lazily built, shared instances (double-checked under a lock)."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._styles_warm = False
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown generator '{name}'. Registered: {sorted(self._factories)}")
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                elapsed = time.perf_counter() - started
+                metrics.histogram("generator_construction_seconds", generator=name).observe(elapsed)
+                logger.debug(f"Built generator '{name}' in {elapsed * 1000:.1f} ms")
+                self._instances[name] = instance
+        return instance
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def prewarm(self, names: Optional[Iterable[str]] = None, styles: bool = True) -> float:
+        """
+        Build the given (default: all) generators and, optionally, run a one-bar
+        pattern per supported style so per-style tables and code paths are hot
+        before the first real request. Returns the elapsed seconds.
+        """
+        started = time.perf_counter()
+        for name in (names or list(self._factories)):
+            self.get(name)
+
+        if styles and 'integrated' in self._factories:
+            with self._lock:
+                if not self._styles_warm:
+                    self._warm_styles(self.get('integrated'))
+                    self._styles_warm = True
+
+        elapsed = time.perf_counter() - started
+        metrics.gauge("generator_prewarm_seconds").set(elapsed)
+        return elapsed
+
+    @staticmethod
+    def _warm_styles(generator) -> None:
+        for style in generator.SUPPORTED_STYLES:
+            try:
+                generator.generate(description=f"{style} drums", style=style,
+                                   instrument='drums', bars=1, seed=0, use_dna=True)
+            except Exception as e:
+                # A broken style must not take the worker down; it fails again at request time
+                logger.debug(f"Prewarm of style '{style}' failed: {e}")
+
+    def reset(self) -> None:
+        """Drop built instances (tests / benchmarks); factories stay registered."""
+        with self._lock:
+            self._instances.clear()
+            self._styles_warm = False
+
+
+def _integrated_generator():
+    from services.integrated_midi_generator import IntegratedMidiGenerator
+    return IntegratedMidiGenerator(enable_humanization=True)
+
+
+def _midi_generator():
+    from services.midi_generator import MidiGenerator
+    return MidiGenerator()
+
+
+def _advanced_generator():
+    from services.advanced_midi_generator import AdvancedPatternGenerator
+    return AdvancedPatternGenerator()
+
+
+def _humanizer():
+    from services.humanization_engine import HumanizationEngine
+    return HumanizationEngine()
+
+
+def _arrangement_service():
+    from services.arrangement_service import ArrangementService
+    return ArrangementService.from_env(generator=generator_registry.get('integrated'))
+
+
+# Shared registry for the whole backend process
+generator_registry = GeneratorRegistry()
+generator_registry.register('integrated', _integrated_generator)
+generator_registry.register('midi', _midi_generator)
+generator_registry.register('advanced', _advanced_generator)
+generator_registry.register('humanizer', _humanizer)
+generator_registry.register('arrangement', _arrangement_service)
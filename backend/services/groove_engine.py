@@ -1,4 +1,29 @@
-import random
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from .event_buffer import DEFAULT_PPQ, EventBuffer, beats_to_ticks, ticks_to_beats
+from .generation_context import GenerationContext, ensure_context
+
+# Swing grid: one slot per 16th inside a beat (on-beat, "e", "and", "a").
+# Only events exactly on a slot (integer ticks) get that slot's offset.
+SWING_SLOTS_PER_BEAT = 4
+# Timing jitter is drawn in thousandths of a beat ("ms-ish")
+JITTER_UNITS_PER_BEAT = 1000
+
+
+@lru_cache(maxsize=256)
+def swing_offset_table(swing_amount: float, ppq: int = DEFAULT_PPQ) -> np.ndarray:
+    """
+    Per-16th swing offsets (in ticks at `ppq`) for a swing amount (0.0 - 1.0):
+    full swing on the off-beat 8th, lighter swing on the off-beat 16ths.
+    Memoized and read-only; custom swing values get their own table on first use.
+    """
+    table = beats_to_ticks([0.0, swing_amount * 0.1, swing_amount * 0.15, swing_amount * 0.1], ppq)
+    table.setflags(write=False)
+    return table
+
 
 class GrooveEngine:
     """Add human feel to patterns"""
@@ -12,9 +37,8 @@ class GrooveEngine:
         'robotic': {'swing': 0, 'humanize': 0}
     }
 
-    def apply_groove(self, events, style: str, complexity: float, custom_swing: float = None):
-        """Aplică swing și humanization evenimentelor MIDI"""
-        
+    def _resolve_settings(self, style: str, custom_swing: float = None):
+        """Returnează (swing_amount, humanize_amount) pentru stil"""
         # Alegem template-ul bazat pe stil
         groove_type = 'straight'
         if style in ['jazz', 'blues']:
@@ -33,49 +57,68 @@ class GrooveEngine:
         if custom_swing is not None:
              swing_amount = custom_swing
              
-        humanize_amount = settings['humanize']
-        
-        processed_events = []
-        
-        for event in events:
-            # 1. Humanize Timing (Micșorăm precizia)
-            # Adăugăm un mic decalaj aleatoriu (+/- câțiva tickși)
-            timing_jitter = random.randint(-humanize_amount, humanize_amount) if humanize_amount > 0 else 0
-            
-            # 2. Apply Swing (Groove logic)
-            # Check for off-beats (both 8ths and 16ths can be swung depending on style)
-            # Typically:
-            # - 8th Swing: Delays 0.5, 1.5, 2.5, 3.5
-            # - 16th Swing: Delays 0.25, 0.75, 1.25...
-            
-            pos_in_beat = event['time'] % 1.0
-            swing_offset = 0
-            
-            # Simple combined swing logic:
-            # If we are on an "and" (0.5) OR "e/a" (0.25/0.75), we apply swing.
-            # But usually Jazz swings 8ths significantly.
-            
-            is_off_beat_8th = abs(pos_in_beat - 0.5) < 0.01
-            is_off_beat_16th = abs(pos_in_beat - 0.25) < 0.01 or abs(pos_in_beat - 0.75) < 0.01
-            
-            if swing_amount > 0:
-                if is_off_beat_8th:
-                    # Apply full swing to 8th notes
-                    swing_offset = swing_amount * 0.15 # Stronger effect for 8ths
-                elif is_off_beat_16th:
-                    # Apply lighter swing to 16ths
-                    swing_offset = swing_amount * 0.1
-            
-            new_time = max(0, event['time'] + swing_offset + (timing_jitter / 1000.0))
-            
-            # 3. Humanize Velocity (Nu lovim toba la fel de tare de fiecare dată)
-            velo_jitter = random.randint(-humanize_amount, humanize_amount)
-            new_velocity = max(1, min(127, event['velocity'] + velo_jitter))
-            
-            # Reconstruim evenimentul
-            processed_event = event.copy()
-            processed_event['time'] = new_time
-            processed_event['velocity'] = new_velocity
-            processed_events.append(processed_event)
-            
-        return processed_events
+        return swing_amount, settings['humanize']
+
+    def swing_offsets(self, times: np.ndarray, swing_amount: float, ppq: int = DEFAULT_PPQ) -> np.ndarray:
+        """
+        Swing offset (ticks) for every event time (ticks at `ppq`), looked up in the
+        swing table of `swing_amount`.
+        """
+        if swing_amount <= 0:
+            return np.zeros(len(times), dtype=np.int64)
+        # 16th slot by integer division; off-grid times (triplets, pushed notes) get no swing
+        slot, remainder = np.divmod(times, ppq // SWING_SLOTS_PER_BEAT)
+        offsets = swing_offset_table(float(swing_amount), ppq)[slot % SWING_SLOTS_PER_BEAT]
+        return np.where(remainder == 0, offsets, 0)
+
+    def _groove_columns(self, times: np.ndarray, velocities: np.ndarray, style: str,
+                        custom_swing: float, np_rng: np.random.Generator, ppq: int):
+        """
+        Swing + timing/velocity jitter for whole columns (times in ticks at `ppq`).
+        Returns (new_times, new_velocities).
+        """
+        swing_amount, humanize_amount = self._resolve_settings(style, custom_swing)
+        n = len(times)
+
+        # 1. Humanize Timing + 3. Velocity: uniform +/- humanize_amount (ms-ish ticks / velocity units)
+        if humanize_amount > 0:
+            timing_jitter, velo_jitter = np_rng.integers(-humanize_amount, humanize_amount + 1, size=(2, n))
+        else:
+            timing_jitter = velo_jitter = np.zeros(n, dtype=np.int64)
+
+        # 2. Apply Swing (Groove logic): delays off-beat 8ths (0.5) and 16ths (0.25 / 0.75)
+        # (jitter in ticks, truncated toward zero so it stays symmetric)
+        jitter_ticks = (timing_jitter * ppq / JITTER_UNITS_PER_BEAT).astype(np.int64)
+        new_times = np.maximum(times + self.swing_offsets(times, swing_amount, ppq) + jitter_ticks, 0)
+        new_velocities = np.clip(velocities + velo_jitter, 1, 127)
+        return new_times, new_velocities
+
+    def apply_groove(self, events, style: str, complexity: float, custom_swing: float = None,
+                     ctx: Optional[GenerationContext] = None):
+        """Aplică swing și humanization evenimentelor MIDI"""
+        np_rng = ensure_context(ctx).np_rng
+        if isinstance(events, EventBuffer):
+            return self._apply_groove_buffer(events, style, custom_swing, np_rng)
+
+        if not events:
+            return []
+        # Dict times are beats: grooved on the default tick grid, handed back in beats
+        new_times, new_velocities = self._groove_columns(
+            beats_to_ticks([event['time'] for event in events]),
+            np.array([event['velocity'] for event in events], dtype=np.int64),
+            style, custom_swing, np_rng, DEFAULT_PPQ,
+        )
+        # Reconstruim evenimentele (input dicts are left untouched)
+        return [
+            {**event, 'time': time, 'velocity': velocity}
+            for event, time, velocity in zip(events, ticks_to_beats(new_times).tolist(), new_velocities.tolist())
+        ]
+
+    def _apply_groove_buffer(self, events: EventBuffer, style: str, custom_swing: float,
+                             np_rng: np.random.Generator) -> EventBuffer:
+        """Same groove as apply_groove, applied in place on the time/velocity columns."""
+        if len(events) == 0:
+            return events
+        events.time[:], events.velocity[:] = self._groove_columns(
+            events.time, events.velocity, style, custom_swing, np_rng, events.ppq)
+        return events
@@ -1,6 +1,10 @@
 import random
 from typing import List, Dict, Any
 
+import numpy as np
+
+from .event_buffer import EventBuffer, NO_PITCH, FLAG_PASSING
+
 class HarmonicEngine:
     """Sophisticated harmonic generation"""
     
@@ -32,6 +36,9 @@ class HarmonicEngine:
     
     def add_passing_tones(self, melody_events: List[Dict], harmony: List[Dict] = None) -> List[Dict]:
         """Add chromatic passing tones for realism"""
+        if isinstance(melody_events, EventBuffer):
+            return self._add_passing_tones_buffer(melody_events)
+
         enhanced = []
         if not melody_events:
             return []
@@ -74,6 +81,40 @@ class HarmonicEngine:
                 
         return enhanced
 
+    def _add_passing_tones_buffer(self, melody: EventBuffer) -> EventBuffer:
+        """Buffer version of add_passing_tones: passing rows are inserted after their source note."""
+        n = len(melody)
+        if n < 2:
+            return melody
+
+        melody.sort_by_time()
+        pitch = melody.pitch.astype(np.int64)
+        interval = pitch[1:] - pitch[:-1]
+        time_diff = melody.time[1:] - melody.time[:-1]
+        has_pitch = (pitch[:-1] != NO_PITCH) & (pitch[1:] != NO_PITCH)
+
+        # If large leap (> 2 semitones) and enough time, add passing tone
+        needs_passing = np.zeros(n, dtype=bool)
+        needs_passing[:-1] = has_pitch & (np.abs(interval) > 2) & (time_diff >= melody.ppq // 4)
+        if not needs_passing.any():
+            return melody
+
+        source = np.flatnonzero(needs_passing)
+        passing_pitch = (pitch[source] + interval[source] / 2).astype(np.int64)
+        passing_time = melody.time[source] + time_diff[source] // 2
+
+        index = np.repeat(np.arange(n), 1 + needs_passing)
+        is_passing = np.zeros(len(index), dtype=bool)
+        is_passing[1:] = index[1:] == index[:-1]
+
+        melody.reorder(index)
+        melody.time[is_passing] = passing_time
+        melody.pitch[is_passing] = passing_pitch
+        melody.duration[is_passing] = melody.ppq // 8
+        melody.velocity[is_passing] = (melody.velocity[is_passing] * 0.7).astype(np.int16) # Softer
+        melody.flags[is_passing] |= FLAG_PASSING
+        return melody
+
     def _move_voice(self, voice_type, current_chord, next_chord, max_leap=4):
         # Placeholder for strict voice leading rules
         pass
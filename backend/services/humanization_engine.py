@@ -1,5 +1,9 @@
-from typing import List, Dict
-import random
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+
+from .event_buffer import DEFAULT_PPQ, EventBuffer
+from .generation_context import GenerationContext, ensure_context
 
 class HumanizationEngine:
     """
@@ -8,28 +12,50 @@ class HumanizationEngine:
     def __init__(self):
         pass
 
-    def humanize_midi(self, midi_events: List[Dict]) -> List[Dict]:
+    def humanize_midi(self, midi_events: Union[List[Dict], EventBuffer],
+                      ctx: Optional[GenerationContext] = None) -> Union[List[Dict], EventBuffer]:
         """
         Apply timing and velocity humanization to a sequence of events.
+        EventBuffer input is humanized in place and returned.
         """
+        np_rng = ensure_context(ctx).np_rng
+        if isinstance(midi_events, EventBuffer):
+            return self._humanize_buffer(midi_events, np_rng)
+
+        # Dict times are beats: jittered on the default tick grid, handed back in beats
+        fluctuation, offset = self._draw_jitter(len(midi_events), np_rng, DEFAULT_PPQ)
         humanized = []
-        for event in midi_events:
+        for event, velocity_delta, time_delta in zip(midi_events, fluctuation.tolist(), offset.tolist()):
             # Create a copy to avoid modifying the original dictionary
             e = event.copy()
             
             # 1. Velocity Humanization
             if 'velocity' in e:
-                # Random fluctuation +/- 5
-                fluctuation = random.randint(-5, 5)
-                e['velocity'] = max(1, min(127, e['velocity'] + fluctuation))
+                e['velocity'] = max(1, min(127, e['velocity'] + velocity_delta))
             
             # 2. Timing Humanization (Micro-timing)
             if 'time' in e:
-                # Random offset +/- 0.01 beats (approx 5-10ms depending on BPM)
-                # This creates a "loose" feel without breaking the rhythm
-                offset = random.uniform(-0.01, 0.01)
-                e['time'] = max(0, e['time'] + offset)
+                e['time'] = max(0, round(e['time'] * DEFAULT_PPQ) + time_delta) / DEFAULT_PPQ
                 
             humanized.append(e)
             
-        return humanized
\ No newline at end of file
+        return humanized
+
+    def _draw_jitter(self, n: int, np_rng: np.random.Generator, ppq: int):
+        """
+        Velocity fluctuation (+/- 5) and timing offset (+/- 0.01 beats, approx 5-10ms
+        depending on BPM; in ticks at `ppq`, truncated toward zero) for n events,
+        drawn in bulk. This creates a "loose" feel without breaking the rhythm.
+        """
+        fluctuation = np_rng.integers(-5, 6, size=n)
+        offset = (np_rng.uniform(-0.01, 0.01, size=n) * ppq).astype(np.int64)
+        return fluctuation, offset
+
+    def _humanize_buffer(self, events: EventBuffer, np_rng: np.random.Generator) -> EventBuffer:
+        n = len(events)
+        if n == 0:
+            return events
+        fluctuation, offset = self._draw_jitter(n, np_rng, events.ppq)
+        events.velocity[:] = np.clip(events.velocity + fluctuation, 1, 127)
+        np.maximum(events.time + offset, 0, out=events.time)
+        return events
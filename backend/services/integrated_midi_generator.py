@@ -1,9 +1,9 @@
 from .midi_generator import MidiGenerator
-from .advanced_midi_generator import AdvancedPatternGenerator, PatternDNA, MUSIC_STYLES
-from .style_patterns import StylePatterns
+from .advanced_midi_generator import AdvancedPatternGenerator, PatternDNA
+from . import kit_engine, style_tables
 from .humanization_engine import HumanizationEngine
 from .music_theory import MusicTheoryService
-from .music_theory_engine import MusicTheoryEngine
+from .music_theory_engine import MusicTheoryEngine, Progression
 from .groove_engine import GrooveEngine
 # New Engines
 from .pattern_intelligence import PatternIntelligence
@@ -11,10 +11,18 @@ from .harmonic_engine import HarmonicEngine
 from .rhythm_engine import RhythmEngine
 from .production_engine import ProductionEngine
 
+from .event_buffer import DEFAULT_PPQ, EventBuffer, NO_PITCH, check_ppq, instrument_code, instrument_name
+from .generation_context import GenerationContext, ensure_context
+from .midi_splice import END, START, bar_range, clip_notes, concat_notes, empty_notes, splice_track, track_notes
+from .smf_writer import (
+    NOTE_OFF, NOTE_ON, encode_channel_events, encode_file, midi_file_bytes, split_file, tempo_event
+)
+from utils.stage_timer import StageTimer
+
 import mido
 import logging
-import random
-from typing import Optional, Dict, Any, List, Tuple
+import numpy as np
+from typing import Optional, Dict, Any, List, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -45,13 +53,16 @@ class IntegratedMidiGenerator:
         'dubstep', 'ambient', 'gospel' # Added last batch
     }
 
-    def __init__(self, enable_humanization: bool = True):
+    def __init__(self, enable_humanization: bool = True, ppq: int = DEFAULT_PPQ):
         """
         Initialize the integrated MIDI generator.
 
         Args:
             enable_humanization: Whether to apply humanization by default
+            ppq: Default timeline resolution (ticks per quarter note, the file's
+                 ticks_per_beat); generate(ppq=...) overrides it per call
         """
+        self.ppq = check_ppq(ppq)
         self.basic_generator = MidiGenerator()
         self.advanced_generator = AdvancedPatternGenerator()
         self.humanizer = HumanizationEngine()
@@ -73,15 +84,20 @@ class IntegratedMidiGenerator:
                  humanize: bool = None,
                  seed: int = None,
                  forced_context: list = None, # 1. Update Signature
-                 **kwargs) -> Tuple[mido.MidiFile, int]:
+                 output: str = 'midi', # 'midi' -> mido.MidiFile, 'bytes' -> encoded .mid, 'notes' -> note array
+                 **kwargs) -> Tuple[Union[mido.MidiFile, bytes, np.ndarray], int]:
         # ... (generate method validation logic remains) ...
         # Copied context for safety
         try:
-            # Handle seeding
-            if seed is None:
-                seed = random.randint(0, 2**32 - 1)
-            
-            random.seed(seed)
+            # Handle seeding: all randomness for this request comes from ctx,
+            # so concurrent generations never share RNG state
+            ctx = GenerationContext(seed)
+            seed = ctx.seed
+
+            if output not in ('midi', 'bytes', 'notes'):
+                raise ValueError(f"Unknown output '{output}' (expected 'midi', 'bytes' or 'notes')")
+            # Every stage works in integer ticks at this resolution
+            kwargs['ppq'] = check_ppq(kwargs.get('ppq', self.ppq))
             
             # Validate and normalize parameters
             style = kwargs.get('style', self._detect_style(description))
@@ -98,7 +114,7 @@ class IntegratedMidiGenerator:
             # Auto-detect DNA usage if not specified
             if use_dna is None:
                 # Use DNA for supported styles, regardless of complexity
-                use_dna = style in self.advanced_generator.style_patterns.PATTERNS
+                use_dna = style_tables.has_patterns(style)
                 logger.info(f"Auto-detected use_dna={use_dna} for style={style}")
 
             # Determine MIDI channel based on instrument type
@@ -109,7 +125,7 @@ class IntegratedMidiGenerator:
                        f"use_dna={use_dna}, humanize={should_humanize}, channel={channel}")
 
             # Route to appropriate generator
-            is_advanced_style = style in self.advanced_generator.style_patterns.PATTERNS
+            is_advanced_style = style_tables.has_patterns(style)
             
             if use_dna or is_advanced_style:
                 # Remove style and instrument from kwargs to avoid duplicate arguments
@@ -120,18 +136,27 @@ class IntegratedMidiGenerator:
                     style=style,
                     instrument=instrument,
                     humanize=should_humanize,
+                    ctx=ctx,
+                    output=output,
                     **dna_kwargs
                 )
             else:
                 logger.info(f"Using basic generator (use_dna={use_dna}, "
                            f"style_supported={is_advanced_style})")
-                # Remove duplicate arguments
-                basic_kwargs = {k: v for k, v in kwargs.items() if k not in ['instrument']}
+                # Remove duplicate arguments (the basic generator always writes 480 PPQ files)
+                basic_kwargs = {k: v for k, v in kwargs.items() if k not in ['instrument', 'ppq']}
                 midi_file = self.basic_generator.generate_track(
                     description=description,
                     instrument=instrument,
+                    ctx=ctx,
                     **basic_kwargs
                 )
+                if output == 'bytes':
+                    midi_file = midi_file_bytes(midi_file)
+                elif output == 'notes':
+                    _, ticks_per_beat, bodies = split_file(midi_file_bytes(midi_file))
+                    midi_file = concat_notes(track_notes(body)[0] for body in bodies)
+                    midi_file[:, START:END + 1] = midi_file[:, START:END + 1] * kwargs['ppq'] // ticks_per_beat
             
             return midi_file, seed
 
@@ -140,6 +165,32 @@ class IntegratedMidiGenerator:
             raise ValueError(f"Failed to generate MIDI: {str(e)}") from e
 
 
+    def regenerate_bars(self,
+                        base: bytes,
+                        bar_indices: List[int],
+                        seed: int = None,
+                        **params) -> Tuple[bytes, int]:
+        """
+        Re-roll some bars (0-based `bar_indices`) of a pattern previously generated from `params`.
+
+        A fresh variation of the pattern is rendered with `seed` and only the notes
+        starting in those bars are spliced into `base` (the encoded .mid); every other
+        bar is kept exactly as it is. Returns (data, seed) - the seed reproduces this edit.
+        """
+        total_bars = params.get('bars', 4)
+        invalid = sorted({bar for bar in bar_indices if not 0 <= bar < total_bars})
+        if not bar_indices or invalid:
+            raise ValueError(f"Bars to regenerate must be in 0..{total_bars - 1}, got {list(bar_indices)}")
+
+        # The variation is rendered at the stored file's resolution
+        midi_type, ticks_per_beat, bodies = split_file(base)
+        params = {k: v for k, v in params.items() if k not in ('seed', 'output', 'ppq')}
+        notes, seed = self.generate(seed=seed, output='notes', ppq=ticks_per_beat, **params)
+
+        ranges = [bar_range(bar, ticks_per_beat) for bar in sorted(set(bar_indices))]
+        bodies[0] = splice_track(bodies[0], clip_notes(notes, ranges), ranges)
+        return encode_file(bodies, ticks_per_beat, midi_type), seed
+
     def save_file(self, midi_file: mido.MidiFile, filename: str) -> None:
         """Helper method to save a MIDI object to disk."""
         try:
@@ -150,19 +201,8 @@ class IntegratedMidiGenerator:
             raise
 
     def quantize_to_scale(self, note_value: int, scale_type: str, root_note: str) -> int:
-        """Quantize a MIDI notes."""
-        # Get all valid notes for this scale across meaningful octaves (0-8)
-        valid_notes = []
-        for octave in range(9):
-            notes = self.music_theory.get_scale_notes(root_note, scale_type, octave)
-            valid_notes.extend(notes)
-            
-        # Find nearest valid note
-        try:
-            quantized_note = min(valid_notes, key=lambda x: abs(x - note_value))
-            return quantized_note
-        except ValueError:
-            return note_value
+        """Quantize a MIDI note to the nearest note of the scale (octaves 0-8)."""
+        return int(self.music_theory.quantize(note_value, root_note, scale_type))
 
     def _generate_with_dna(self,
                            description: str,
@@ -170,12 +210,18 @@ class IntegratedMidiGenerator:
                            instrument: str,
                            humanize: bool,
                            forced_context: list = None,
-                           **kwargs) -> mido.MidiFile:
+                           ctx: Optional[GenerationContext] = None,
+                           output: str = 'midi',
+                           **kwargs) -> Union[mido.MidiFile, bytes, np.ndarray]:
         """
         Generează pattern-ul (4 Măsuri), aplică logica de note și scrie fișierul MIDI.
         Enhanced with PatternIntelligence, HarmonicEngine, RhythmEngine, ProductionEngine.
+        Every stage is timed into generation_stage_seconds (utils.stage_timer).
         """
-        import time 
+        timer = StageTimer()
+        ctx = ensure_context(ctx)
+        rng = ctx.rng
+        ppq = kwargs.get('ppq', self.ppq)  # ticks per beat of every event time below
 
         # Create DNA from parameters
         dna = PatternDNA(
@@ -211,62 +257,52 @@ class IntegratedMidiGenerator:
         # 1. Generează Ritmul de Bază (1 Bar / 16 Steps)
         if instrument in ['drums', 'full_kit', 'full_drums']:
              # STRICT COMPONENT GENERATION (User Request)
-             # Iterate explicitly to ensure Kick, Snare, and Hats get their specific patterns.
-             base_events = []
-             components = ['kick', 'snare', 'hat']
+             # Every kit voice gets its specific style pattern; all voices are
+             # rendered in one pass over a shared step grid (kit_engine).
+             components = kit_engine.kit_voices(kwargs.get('kit'))
+             hits = kit_engine.kit_patterns(style, components).astype(bool)
              
+             # DROP MODE OVERRIDE: "Force 1/16th note fills or maximum syncopation"
+             # If strict pattern is used, we get the style's pattern; drop forces
+             # 1/16th rolls on snare/hats on top of it.
+             if section_mod == 'drop':
+                 hits[[comp in ['snare', 'hat'] for comp in components]] = True
              
-             # DROP MODE OVERRIDE: If Drop, maybe we want fills?
-             # For now, if drop, we stick to pattern but maybe add extra notes?
-             # Actually user 'drop' request: "Force 1/16th note fills or maximum syncopation"
-             # If strict pattern is used, we get the style's pattern.
-             # We can add fills on top if section_mod == 'drop'.
+             # Strong base velocity per hit, drawn component by component
+             velocities = np.array([rng.randint(90, 110) for _ in range(np.count_nonzero(hits))])
              
-             for comp in components:
-                 # Get strict pattern
-                 pattern = StylePatterns.get_pattern(style, comp)
-                 
-                 # DROP LOGIC: Override pattern for snare/hats to be denser?
-                 if section_mod == 'drop' and comp in ['snare', 'hat']:
-                     # Force 1/16th rolls
-                     pattern = [1] * 16 
-                 
-                 if not pattern: 
-                      # Fallback to advanced generator (random) if really missing
-                      comp_events = self.advanced_generator.generate_pattern_with_dna(style, comp, dna, bars=1)
-                      base_events.extend(comp_events)
-                      continue
-                      
-                 # Generate events from pattern
-                 for i, is_hit in enumerate(pattern):
-                     if is_hit:
-                         base_events.append({
-                             'time': i * 0.25,
-                             'duration': 0.25,
-                             'velocity': random.randint(90, 110), # Strong base
-                             'instrument_type': comp,
-                             'channel': 9
-                         })
-                         
-             # Sort merged events
-             base_events.sort(key=lambda x: x['time'])
+             # Grid readback is already time-ordered (kit order on ties): no sort
+             order = kit_engine.time_order(hits)
+             codes = np.array([instrument_code(comp) for comp in components])
+             base_events = EventBuffer.from_columns(
+                 time=order.position * (ppq // 4),  # 16th steps
+                 duration=ppq // 4,
+                 velocity=velocities[order.hit],
+                 channel=9,
+                 instrument=codes[order.voice],
+                 ppq=ppq
+             )
              
         else:
             # Melodic / Single Instrument
-            base_events = self.advanced_generator.generate_pattern_with_dna(
+            base_events = self.advanced_generator.generate_pattern_buffer(
                 style=style,
                 instrument=instrument,
                 dna=dna,
-                bars=1 
+                bars=1,
+                ctx=ctx,
+                ppq=ppq
             )
+        timer.lap('base_rhythm')
         
         # [NEW] Apply Rhythm Engine (Ghost notes)
         # Check explicit flag first, default to True if not present (backward compat compatibility)
         use_ghost_notes = kwargs.get('ghost_notes', True)
         if use_ghost_notes and instrument in self.DRUM_INSTRUMENTS:
-            base_events = self.rhythm_engine.add_ghost_notes(base_events, style)
+            base_events = self.rhythm_engine.add_ghost_notes(base_events, style, ctx=ctx)
             if len(base_events) > 16: # Assuming 16 steps basic
                  logger.info(f"👻 Ghost Notes Applied: {len(base_events)} events total")
+            timer.lap('ghost_notes')
 
         # 2. EXTINDERE TIMP & PHRASING: Pattern Intelligence
         # Use full phrase structure instead of simple copy
@@ -280,8 +316,9 @@ class IntegratedMidiGenerator:
         }
         
         # This replaces the simple loop loop logic
-        full_events = self.pattern_intelligence.generate_intelligent_pattern(base_events, context)
+        full_events = self.pattern_intelligence.generate_intelligent_pattern(base_events, context, ctx=ctx)
         logger.info(f"🏗️ Structure Used: {req_structure} (Pattern expanded to {len(full_events)} events)")
+        timer.lap('phrasing')
 
         # 3. Adaugă Notele (Melody Walker / Smart Bass)
         key = kwargs.get('key', 'C')
@@ -290,12 +327,12 @@ class IntegratedMidiGenerator:
         
         # [NEW] Phase 7: Context Overrides
         # Support both explicit param and kwargs (for backward compat/API flexibility)
-        ctx = forced_context or kwargs.get('context_chords')
+        context_chords = forced_context or kwargs.get('context_chords')
         
-        if ctx:
+        if context_chords:
              # 2. Override Harmonic Logic
              # 4. Handle Length Mismatch (handled inside helper)
-             master_progression = self._parse_context_to_progression(ctx, total_bars=NUM_BARS)
+             master_progression = self._parse_context_to_progression(context_chords, total_bars=NUM_BARS)
              logger.info(f"🔒 Context Locked: Using {len(master_progression)} user-defined chords (Target Bars: {NUM_BARS})")
              
         else:
@@ -306,7 +343,7 @@ class IntegratedMidiGenerator:
             except:
                  root_key_midi = 60 
                  
-            master_progression = self.music_theory_engine.generate_progression(style, root_key_midi, scale)
+            master_progression = self.music_theory_engine.generate_progression(style, root_key_midi, scale, ctx=ctx)
             logger.info(f"🎹 Generated Progression ({style}): {[c['name'] for c in master_progression]}")
         
         events_with_pitch = self._add_pitch_to_events(
@@ -318,8 +355,10 @@ class IntegratedMidiGenerator:
             scale, 
             style,
             kwargs.get('complexity', 0.5), # Pass complexity
-            master_progression # [NEW] Pass progression
+            master_progression, # [NEW] Pass progression
+            ctx=ctx
         )
+        timer.lap('pitch')
         
         # [NEW] Harmonic Engine (Passing tones)
         use_passing_tones = kwargs.get('passing_tones', False)
@@ -332,78 +371,84 @@ class IntegratedMidiGenerator:
              except Exception as e:
                  logger.warning(f"Harmonic Engine failed to add passing tones: {e}, using original definition")
                  pass
+             timer.lap('passing_tones')
         
         # Presort by time
-        events_with_pitch.sort(key=lambda x: x['time'])
+        events_with_pitch.sort_by_time()
 
         # 4. Aplică Groove-ul (Humanize)
         complexity = kwargs.get('complexity', 0.5)
         
-        # [NEW] Retrieve swing from style definition
-        # Use MUSIC_STYLES dictionary directly
-        style_meta = MUSIC_STYLES.get(style, {'swing': 0.0}) 
-        style_swing = style_meta.get('swing', 0.0)
+        # [NEW] Retrieve swing from style definition (MUSIC_STYLES, via the compiled tables)
+        style_swing = style_tables.style_swing(style)
         
-        final_events = self.groove_engine.apply_groove(events_with_pitch, style, complexity, custom_swing=style_swing)
+        final_events = self.groove_engine.apply_groove(events_with_pitch, style, complexity, custom_swing=style_swing, ctx=ctx)
+        timer.lap('groove')
 
         # 5. Production Engine (Velocity & Articulation)
         # Apply velocity curve
-        final_events = self.production_engine.velocity.apply_velocity_curve(final_events, curve_type=dna.velocity_curve)
-        final_events = self.production_engine.articulation.add_articulations(final_events, style)
+        final_events = self.production_engine.velocity.apply_velocity_curve(final_events, curve_type=dna.velocity_curve, ctx=ctx)
+        final_events = self.production_engine.articulation.add_articulations(final_events, style, ctx=ctx)
+        timer.lap('production')
 
         # --- SECTION POST-PROCESSING ---
-        if section_mod == 'chorus' and instrument in self.DRUM_INSTRUMENTS:
+        if instrument in self.DRUM_INSTRUMENTS:
+            final_events = self._apply_section_mod(final_events, section_mod, rng)
+            timer.lap('section_post')
+
+        # 6. Additional Humanization (Jitter)
+        if humanize:
+            final_events = self.humanizer.humanize_midi(final_events, ctx=ctx)
+            timer.lap('humanize')
+            
+        final_events = EventBuffer.coerce(final_events).sort_by_time()
+
+        # 7. Convert to MIDI file (or encode straight to .mid bytes, or hand over the notes)
+        if output == 'bytes':
+            midi = self._events_to_smf(final_events, kwargs.get('bpm', 120), ctx=ctx)
+        elif output == 'notes':
+            midi = self._note_array(final_events, rng)
+            midi = empty_notes() if midi is None else midi[np.argsort(midi[:, 0], kind='stable')]
+        else:
+            midi = self._events_to_midi(final_events, kwargs.get('bpm', 120), ctx=ctx)
+        timer.lap('encode')
+        return midi
+
+    def _apply_section_mod(self, events: EventBuffer, section_mod: str, rng) -> EventBuffer:
+        """Section post-processing for drum parts (chorus/verse/intro), in place."""
+        if section_mod == 'chorus':
             # Force Open Hats & Crash
-            has_crash = False
-            for evt in final_events:
-                # Boost Dynamics (User: +15%)
-                vel = evt.get('velocity', 90)
-                evt['velocity'] = min(127, int(vel * 1.15))
-                
-                # Swap Closed Hat (42) to Open Hat (46)
-                if evt.get('pitch') == 42:
-                    evt['pitch'] = 46
-                    
-                # Crash check (Time 0)
-                if evt['time'] == 0.0 and evt.get('pitch') == 49:
-                    has_crash = True
+            # Boost Dynamics (User: +15%)
+            events.velocity[:] = np.minimum(127, np.trunc(events.velocity * 1.15))
             
+            # Swap Closed Hat (42) to Open Hat (46)
+            events.pitch[events.pitch == 42] = 46
+                
+            # Crash check (Time 0)
+            has_crash = bool(np.any((events.time == 0) & (events.pitch == 49)))
             if not has_crash:
-                final_events.append({
-                    'time': 0.0, 'duration': 1.0, 'velocity': 110, 
-                    'pitch': 49, 'channel': 9, 'instrument_type': 'crash'
-                })
+                events = EventBuffer.concatenate([events, EventBuffer.from_columns(
+                    time=[0], duration=events.ppq, velocity=110,
+                    pitch=49, channel=9, instrument=instrument_code('crash'), ppq=events.ppq
+                )])
                 
-        elif section_mod == 'verse' and instrument in self.DRUM_INSTRUMENTS:
+        elif section_mod == 'verse':
             # Force Closed Hats & Remove Ghost Kicks
-            filtered_events = []
-            for evt in final_events:
-                # Flatten Dynamics (Medium 80-90)
-                evt['velocity'] = random.randint(80, 90)
-
-                # Lock Open Hat to Closed
-                if evt.get('pitch') == 46:
-                    evt['pitch'] = 42
-                
-                # Filter Ghost Kicks (Velocity < 60)
-                if evt.get('instrument_type') == 'kick' and evt.get('velocity', 90) < 60:
-                    continue 
-                
-                filtered_events.append(evt)
-            final_events = filtered_events
-
-        elif section_mod == 'intro' and instrument in self.DRUM_INSTRUMENTS:
-            # Filter Snare & Hats (Keep Kick/Atmosphere)
-            final_events = [e for e in final_events if e.get('pitch') not in [38, 40, 42, 46]]
+            # Flatten Dynamics (Medium 80-90)
+            events.velocity[:] = [rng.randint(80, 90) for _ in range(len(events))]
 
-        # 6. Additional Humanization (Jitter)
-        if humanize:
-            final_events = self.humanizer.humanize_midi(final_events)
+            # Lock Open Hat to Closed
+            events.pitch[events.pitch == 46] = 42
             
-        final_events.sort(key=lambda x: x['time'])
+            # Filter Ghost Kicks (Velocity < 60)
+            ghost_kicks = (events.instrument == instrument_code('kick')) & (events.velocity < 60)
+            events.keep(~ghost_kicks)
+
+        elif section_mod == 'intro':
+            # Filter Snare & Hats (Keep Kick/Atmosphere)
+            events.keep(~np.isin(events.pitch, [38, 40, 42, 46]))
 
-        # 7. Convert to MIDI file
-        return self._events_to_midi(final_events, kwargs.get('bpm', 120))
+        return events
 
     def _validate_generation_params(self, style: str, instrument: str):
         """
@@ -490,7 +535,8 @@ class IntegratedMidiGenerator:
                              scale_type: str = 'minor',
                              style: str = 'techno',
                              complexity: float = 0.5,
-                             progression: List[Dict] = None) -> List[Dict]:
+                             progression: List[Dict] = None,
+                             ctx: Optional[GenerationContext] = None) -> List[Dict]:
         """
         Adaugă note muzicale (Pitch) peste ritm.
         Acum cu logică de 'Melody Walk' si 'Chord Progression'.
@@ -499,6 +545,12 @@ class IntegratedMidiGenerator:
         Adaugă note muzicale (Pitch) peste ritm.
         Acum cu logică de 'Melody Walk' pentru Lead-uri!
         """
+        rng = ensure_context(ctx).rng
+        progression = Progression.coerce(progression)
+        if isinstance(events, EventBuffer):
+            return self._add_pitch_to_buffer(events, instrument, sub_option, channel, key,
+                                             scale_type, style, complexity, progression, rng)
+
         if not events:
             return []
 
@@ -518,11 +570,10 @@ class IntegratedMidiGenerator:
         
         # Convertim notele gamei în numere MIDI pentru octava aleasă
         # We need note NAMES first. Accessing private method as requested/required by logic
-        scale_note_names = self.music_theory._get_scale_notes(key, scale_type)
-        scale_midi_notes = [self.music_theory._note_to_midi(n, octave) for n in scale_note_names]
+        scale_midi_notes = self.music_theory.get_scale_notes(key, scale_type, octave)
 
         # [NEW] Phase 6: Use Master Progression Logic if key melodic instrument
-        use_progression = (progression is not None) and (len(progression) > 0)
+        use_progression = len(progression) > 0
         
         # --- ARPEGGIO OVERRIDE LOGIC ---
         if sub_option == 'arp':
@@ -544,7 +595,7 @@ class IntegratedMidiGenerator:
                  evt = {
                      'time': current_time,
                      'duration': 0.25, # Short staccato
-                     'velocity': random.randint(70, 95),
+                     'velocity': rng.randint(70, 95),
                      'instrument_type': instrument,
                      'channel': 0 
                  }
@@ -552,10 +603,8 @@ class IntegratedMidiGenerator:
                  # PITCH SELECTION
                  # v2: Use Progression if available
                  if use_progression:
-                     # Determine bar index
-                     bar_idx = int(current_time / 4) % len(progression) 
-                     current_chord = progression[bar_idx]
-                     chord_tones = self.music_theory_engine.get_chord_tones(current_chord)
+                     # Chord tones of the current bar (precomputed per chord)
+                     chord_tones = progression.chord_tones(int(current_time / 4) % len(progression))
                  else:
                      # v1 (Fallback)
                      current_chord_degree = 0 # Root
@@ -589,8 +638,10 @@ class IntegratedMidiGenerator:
         current_note_index = 0 # Plecăm de la rădăcină (C)
         
         enhanced_events = []
+        # Chord index of every event's bar, computed once for the whole list
+        bar_chords = progression.bar_index([e['time'] for e in events]).tolist() if use_progression else None
         
-        for event in events:
+        for event_idx, event in enumerate(events):
              # Use specific instrument from event if available
             evt_instrument = event.get('instrument_type', instrument)
             
@@ -620,8 +671,7 @@ class IntegratedMidiGenerator:
             if evt_instrument in ['bass', 'sub', '808']:
                 if use_progression:
                     # Use Root of current chord
-                    bar_idx = int(event['time'] / 4) % len(progression)
-                    current_chord = progression[bar_idx]
+                    current_chord = progression[bar_chords[event_idx]]
                     
                     # Bass plays Root (index 0 of intervals? No, 'root' field is MIDI note)
                     # We need to shift it to Bass Octave (e.g. 36-48)
@@ -630,7 +680,7 @@ class IntegratedMidiGenerator:
                     bass_pitch = current_chord['root'] - 24
                     
                     # Expert Mode: Sometimes play 5th or Octave?
-                    if complexity >= 0.9 and random.random() < 0.3:
+                    if complexity >= 0.9 and rng.random() < 0.3:
                          # 5th is +7 semitones
                          bass_pitch += 7
                          
@@ -648,13 +698,13 @@ class IntegratedMidiGenerator:
                     
                     # [Old Logic Reimplanted as Fallback]
                     if complexity >= 0.9:
-                         roll = random.random()
+                         roll = rng.random()
                          if roll < 0.5: note_idx = 0 
                          elif roll < 0.8: note_idx = 4 
                          else: note_idx = 7 
                     else:
-                        if random.random() < 0.7: note_idx = 0 
-                        else: note_idx = random.choice([0, 4])
+                        if rng.random() < 0.7: note_idx = 0 
+                        else: note_idx = rng.choice([0, 4])
                     
                     if scale_midi_notes:
                         final_midi = scale_midi_notes[note_idx % len(scale_midi_notes)]
@@ -668,11 +718,7 @@ class IntegratedMidiGenerator:
             elif sub_option == 'chords' or evt_instrument in ['chords', 'pad']:
                  if use_progression:
                       # Play the full chord from progression
-                      bar_idx = int(event['time'] / 4) % len(progression)
-                      current_chord = progression[bar_idx]
-                      
-                      # Get notes
-                      chord_notes = current_chord['absolute_notes']
+                      chord_notes = progression.chord_tones(bar_chords[event_idx])
                       # Shift to octaves? Usually mid-range is fine (60s).
                       
                       event['duration'] = 1.0 # Sustain
@@ -685,7 +731,7 @@ class IntegratedMidiGenerator:
                       continue
                  else:
                      # Fallback Logic
-                     root_idx = random.choice([0, 3, 4, 5])
+                     root_idx = rng.choice([0, 3, 4, 5])
                      if scale_midi_notes:
                         root_midi = scale_midi_notes[root_idx % len(scale_midi_notes)]
                         chord_notes = [root_midi, root_midi + 3, root_midi + 7]
@@ -699,7 +745,7 @@ class IntegratedMidiGenerator:
                         event['pitch'] = 60
             # C. Logica pentru LEAD / MELODY (Random Walk)
             else:
-                step = random.choice([-1, 0, 1, 1, 2, -2])
+                step = rng.choice([-1, 0, 1, 1, 2, -2])
                 current_note_index += step
                 
                 # Bounds check
@@ -711,12 +757,185 @@ class IntegratedMidiGenerator:
                     event['pitch'] = 60
                 
                 # Variem durata
-                event['duration'] = random.choice([0.25, 0.25, 0.5])
+                event['duration'] = rng.choice([0.25, 0.25, 0.5])
 
             enhanced_events.append(event)
 
         return enhanced_events
 
+    def _add_pitch_to_buffer(self,
+                             events: EventBuffer,
+                             instrument: str,
+                             sub_option: str,
+                             channel: int,
+                             key: str = 'C',
+                             scale_type: str = 'minor',
+                             style: str = 'techno',
+                             complexity: float = 0.5,
+                             progression: Optional[Progression] = None,
+                             rng=None) -> EventBuffer:
+        """
+        EventBuffer version of _add_pitch_to_events.
+        Drum rows are resolved per instrument code in bulk; melodic rows keep the
+        sequential Melody Walker logic but write straight into the columns.
+        """
+        rng = rng or ensure_context().rng
+        if len(events) == 0:
+            return events
+
+        drum_map = self.basic_generator.drum_map
+        octave = 2 if instrument in ['bass', 'sub', '808'] else 4
+        scale_midi_notes = self.music_theory.get_scale_notes(key, scale_type, octave)
+        progression = Progression.coerce(progression)
+        use_progression = len(progression) > 0
+
+        # --- ARPEGGIO OVERRIDE LOGIC ---
+        if sub_option == 'arp':
+            ppq = events.ppq
+            last_tick = int(np.max(events.time + events.duration))
+            # Round up to nearest bar (assuming 4 beats/bar)
+            total_bars = -(-last_tick // (4 * ppq))
+            num_steps = total_bars * 16 # Steady 1/16th stream
+
+            velocities = [rng.randint(70, 95) for _ in range(num_steps)]
+            step = np.arange(num_steps)
+            if use_progression:
+                # Chord tones per bar straight from the progression tables
+                tones, counts = progression.tone_table(default=(60, 64, 67, 72)) # Safety
+                rows = progression.bar_index(step, ticks_per_beat=4)  # steps are 16ths
+            else:
+                # I / V alternating per bar, from the memoized scale chord tables
+                tones = np.array([self.music_theory.chord_tones(key, scale_type, degree, octave) for degree in (0, 4)])
+                counts = np.full(2, tones.shape[1])
+                rows = (step // 16) % 2
+
+            length = counts[rows]
+            if complexity < 0.6: # Up pattern
+                tone_idx = step % length
+            else: # Up-Down pattern
+                cycle_len = np.maximum(1, length * 2 - 2)
+                idx_in_cycle = step % cycle_len
+                tone_idx = np.where(idx_in_cycle < length, idx_in_cycle, cycle_len - idx_in_cycle)
+            pitches = tones[rows, tone_idx]
+
+            return EventBuffer.from_columns(
+                time=step * (ppq // 4),
+                duration=ppq // 4,
+                velocity=velocities,
+                pitch=pitches,
+                channel=0,
+                instrument=instrument_code(instrument),
+                ppq=ppq
+            )
+
+        n = len(events)
+        codes = events.instrument
+
+        # Channel + drum pitch are a pure function of the instrument, resolve once per code
+        for code in np.unique(codes).tolist():
+            evt_instrument = instrument_name(code) or instrument
+            rows = codes == code
+            evt_channel = self._get_channel_for_instrument(evt_instrument)
+            events.channel[rows] = evt_channel
+            if evt_channel == 9:
+                if evt_instrument in drum_map:
+                    drum_pitch = drum_map[evt_instrument]
+                elif evt_instrument in self.DRUM_INSTRUMENTS:
+                    drum_pitch = drum_map.get('kick', 36)
+                else:
+                    drum_pitch = 36
+                events.pitch[rows & (events.pitch == NO_PITCH)] = drum_pitch
+
+        melodic_rows = np.flatnonzero((events.channel != 9) & (events.pitch == NO_PITCH))
+        if len(melodic_rows) == 0:
+            return events
+
+        # MELODIC LOGIC: sequential because of the random walk state
+        # Chord index per event (bar lookup) and chord roots, computed once
+        if use_progression:
+            bar_chords = progression.bar_index(events.time, events.ppq).tolist()
+            chord_roots = progression.roots.tolist()
+        beat = events.ppq  # note lengths in ticks
+        pitch_rows, pitch_values = [], []
+        duration_rows, duration_values = [], []
+        chord_notes_by_row = {}
+        current_note_index = 0
+
+        for i in melodic_rows.tolist():
+            evt_instrument = instrument_name(int(codes[i])) or instrument
+
+            # A. Logica pentru BASS
+            if evt_instrument in ['bass', 'sub', '808']:
+                if use_progression:
+                    bass_pitch = chord_roots[bar_chords[i]] - 24
+                    if complexity >= 0.9 and rng.random() < 0.3:
+                         bass_pitch += 7
+                else:
+                    if complexity >= 0.9:
+                         roll = rng.random()
+                         if roll < 0.5: note_idx = 0 
+                         elif roll < 0.8: note_idx = 4 
+                         else: note_idx = 7 
+                    else:
+                        if rng.random() < 0.7: note_idx = 0 
+                        else: note_idx = rng.choice([0, 4])
+
+                    if scale_midi_notes:
+                        bass_pitch = scale_midi_notes[note_idx % len(scale_midi_notes)]
+                        if note_idx >= len(scale_midi_notes): bass_pitch += 12
+                    else:
+                        bass_pitch = 36
+                pitch_rows.append(i)
+                pitch_values.append(bass_pitch)
+                duration_rows.append(i)
+                duration_values.append(beat // 2)
+
+            # B. Logica pentru CHORDS
+            elif sub_option == 'chords' or evt_instrument in ['chords', 'pad']:
+                if use_progression:
+                    chord_notes_by_row[i] = progression.chord_tones(bar_chords[i])
+                    duration_rows.append(i)
+                    duration_values.append(beat) # Sustain
+                elif scale_midi_notes:
+                    root_idx = rng.choice([0, 3, 4, 5])
+                    root_midi = scale_midi_notes[root_idx % len(scale_midi_notes)]
+                    chord_notes_by_row[i] = [root_midi, root_midi + 3, root_midi + 7]
+                    duration_rows.append(i)
+                    duration_values.append(beat)
+                else:
+                    rng.choice([0, 3, 4, 5])
+                    pitch_rows.append(i)
+                    pitch_values.append(60)
+
+            # C. Logica pentru LEAD / MELODY (Random Walk)
+            else:
+                current_note_index += rng.choice([-1, 0, 1, 1, 2, -2])
+                if scale_midi_notes:
+                    current_note_index = max(0, min(len(scale_midi_notes) - 1, current_note_index))
+                    pitch_values.append(scale_midi_notes[current_note_index])
+                else:
+                    pitch_values.append(60)
+                pitch_rows.append(i)
+                duration_rows.append(i)
+                duration_values.append(rng.choice([beat // 4, beat // 4, beat // 2]))
+
+        events.pitch[pitch_rows] = pitch_values
+        events.duration[duration_rows] = duration_values
+
+        if chord_notes_by_row:
+            # Emit one row per chord tone, in place of the source row
+            counts = np.ones(n, dtype=np.int64)
+            chord_rows = list(chord_notes_by_row)
+            counts[chord_rows] = [len(chord_notes_by_row[r]) for r in chord_rows]
+            starts = np.cumsum(counts) - counts
+            events.reorder(np.repeat(np.arange(n), counts))
+            for row in chord_rows:
+                notes = chord_notes_by_row[row]
+                start = int(starts[row])
+                events.pitch[start:start + len(notes)] = notes
+
+        return events
+
     def _midi_to_note_name(self, midi_val: int) -> str:
         """Convert MIDI number to note name (e.g. 60 -> C)"""
         notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
@@ -747,34 +966,39 @@ class IntegratedMidiGenerator:
         idx = (degree - 1) % len(scale_notes)
         return scale_notes[idx]
 
-    def _events_to_midi(self, events: List[Dict], bpm: int) -> mido.MidiFile:
+    def _events_to_midi(self, events: Union[List[Dict], EventBuffer], bpm: int,
+                        ctx: Optional[GenerationContext] = None) -> mido.MidiFile:
         """
         Orchestrator for creating a MIDI file from events.
         """
-        mid, track = self._create_track(bpm)
-        self._add_notes(track, events)
+        ppq = events.ppq if isinstance(events, EventBuffer) else DEFAULT_PPQ
+        mid, track = self._create_track(bpm, ppq)
+        self._add_notes(track, events, ensure_context(ctx).rng)
         
         logger.info(f"Generated MIDI file: {len(events)} events, {bpm} BPM")
         return mid
 
-    def _create_track(self, bpm: int) -> tuple[mido.MidiFile, mido.MidiTrack]:
+    def _create_track(self, bpm: int, ppq: int = DEFAULT_PPQ) -> tuple[mido.MidiFile, mido.MidiTrack]:
         """
-        Initialize MIDI file and track with tempo.
+        Initialize MIDI file (at `ppq` ticks per beat) and track with tempo.
         """
-        mid = mido.MidiFile()
+        mid = mido.MidiFile(ticks_per_beat=ppq)
         track = mido.MidiTrack()
         mid.tracks.append(track)
         track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(bpm)))
         return mid, track
 
-    def _add_notes(self, track: mido.MidiTrack, events: List[Dict]) -> None:
+    def _add_notes(self, track: mido.MidiTrack, events: Union[List[Dict], EventBuffer], rng) -> None:
         """
         Convert events to MIDI messages and add them to the track.
         Handles note_on/note_off pairing, sorting, and delta time calculation.
         Applies Gaussian humanization to velocity.
         """
+        if isinstance(events, EventBuffer):
+            return self._add_buffer_notes(track, events, rng)
+
         messages = []
-        ticks_per_beat = 480  # MIDI standard
+        ticks_per_beat = DEFAULT_PPQ  # dict times are beats
         
         # Standard deviation for velocity humanization
         velocity_sigma = 5.0
@@ -795,7 +1019,7 @@ class IntegratedMidiGenerator:
             
             # We calculate a 'humanized' velocity using a Gaussian distribution
             # centered on the original velocity.
-            humanized_velocity = int(random.gauss(original_velocity, velocity_sigma))
+            humanized_velocity = int(rng.gauss(original_velocity, velocity_sigma))
             
             # Clamp value to be safe MIDI velocity (1-127, avoiding 0 which is note-off)
             final_velocity = max(1, min(127, humanized_velocity))
@@ -840,14 +1064,104 @@ class IntegratedMidiGenerator:
 
             last_tick = msg['tick']
 
+    def _add_buffer_notes(self, track: mido.MidiTrack, events: EventBuffer, rng) -> None:
+        """
+        EventBuffer version of _add_notes: ticks, pairing and ordering are computed on
+        whole columns; only the final mido.Message objects are created per note.
+        """
+        columns = self._note_columns(events, rng)
+        if columns is None:
+            return
+        is_off, notes, velocities, channels, deltas = (column.tolist() for column in columns)
+        for off, note, velocity, channel, delta in zip(is_off, notes, velocities, channels, deltas):
+            track.append(mido.Message(
+                'note_off' if off else 'note_on',
+                note=note,
+                velocity=velocity,
+                time=delta,
+                channel=channel
+            ))
+
+    def _note_array(self, events: EventBuffer, rng) -> Optional[np.ndarray]:
+        """
+        Notes of a buffer, one row per event in buffer order (services.midi_splice
+        columns: start, end, channel, pitch, velocity; the buffer's ticks as they
+        are), or None if empty. Velocities get their Gaussian humanization here.
+        """
+        velocity_sigma = 5.0
+
+        has_pitch = events.pitch != NO_PITCH
+        if not has_pitch.all():
+            logger.warning(f"Skipping {int((~has_pitch).sum())} incomplete events (no pitch)")
+            events = events.take(has_pitch)
+
+        n = len(events)
+        if n == 0:
+            return None
+
+        # Gaussian velocity humanization, clamped to 1-127 (0 would be a note-off)
+        humanized = [int(rng.gauss(v, velocity_sigma)) for v in events.velocity.tolist()]
+
+        notes = np.empty((n, 5), dtype=np.int64)
+        notes[:, 0] = events.time
+        notes[:, 1] = events.time + events.duration
+        notes[:, 2] = events.channel
+        notes[:, 3] = events.pitch
+        notes[:, 4] = np.clip(humanized, 1, 127)
+        return notes
+
+    def _note_columns(self, events: EventBuffer, rng):
+        """
+        Note on/off rows for a buffer, in file order:
+        (is_off, note, velocity, channel, delta_ticks) arrays, or None if empty.
+        """
+        notes = self._note_array(events, rng)
+        if notes is None:
+            return None
+        n = len(notes)
+
+        # Interleave note_on/note_off rows: [on0, off0, on1, off1, ...]
+        ticks = np.empty(2 * n, dtype=np.int64)
+        ticks[0::2] = notes[:, 0]
+        ticks[1::2] = notes[:, 1]
+        is_off = np.zeros(2 * n, dtype=bool)
+        is_off[1::2] = True
+        velocities = np.zeros(2 * n, dtype=np.int64)
+        velocities[0::2] = notes[:, 4]
+
+        # note_off sorts after note_on at same tick (lexsort is stable)
+        order = np.lexsort((is_off, ticks))
+        deltas = np.diff(ticks[order], prepend=0)
+        np.maximum(deltas, 0, out=deltas)
+
+        return (is_off[order], np.repeat(notes[:, 3], 2)[order], velocities[order],
+                np.repeat(notes[:, 2], 2)[order], deltas)
+
+    def _events_to_smf(self, events: Union[List[Dict], EventBuffer], bpm: int,
+                       ctx: Optional[GenerationContext] = None) -> bytes:
+        """
+        Same file as _events_to_midi(...) + MidiFile.save(), encoded directly to
+        bytes by smf_writer without creating mido messages.
+        """
+        events = EventBuffer.coerce(events)
+        body = tempo_event(mido.bpm2tempo(bpm))
+        columns = self._note_columns(events, ensure_context(ctx).rng)
+        if columns is not None:
+            is_off, notes, velocities, channels, deltas = columns
+            status = np.where(is_off, NOTE_OFF, NOTE_ON) | channels
+            body += encode_channel_events(deltas, status, notes, velocities)
+
+        logger.info(f"Generated MIDI file: {len(events)} events, {bpm} BPM")
+        return encode_file([body], ticks_per_beat=events.ppq, midi_type=1)
+
     def _parse_context_to_progression(self, context_chords: List[Dict], total_bars: int = 4) -> List[Dict]:
         """
         Parses user-provided context chords into the internal progression format.
         Handles length mismatch by looping context.
         """
-        master_progression = []
+        master_progression = Progression()
         if not context_chords:
-            return []
+            return master_progression
             
         # Determine context length
         context_len = len(context_chords)
@@ -0,0 +1,73 @@
+"""
+Single-pass drum kit rendering.
+
+A kit is rendered as one (voices x steps) grid instead of one call per
+component followed by concatenate + sort. Hits (and optional ghost notes, which
+sit half a step after their hit) are laid out on a shared half-step slot grid;
+reading it back slot by slot yields events already in time order, kit voices in
+kit order on ties - the same order a stable sort of the per-voice lists gave,
+for O(slots x voices) work and no sort.
+
+    patterns = kit_patterns('techno', KITS['standard'])       # (voices, 16)
+    hits = ...                                                # (voices, steps) bool
+    order = time_order(hits, ghosts)
+    time = order.position * (ppq // 4) + order.ghost * (ppq // 8)  # ticks
+    velocity = hit_velocity[order.hit]                        # values drawn per hit
+"""
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services import style_tables
+
+STEPS_PER_BAR = style_tables.STEPS_PER_BAR
+
+KITS: Dict[str, Tuple[str, ...]] = {
+    'standard': ('kick', 'snare', 'hat'),
+    'extended': ('kick', 'snare', 'hat', 'perc', 'shake', 'tom', 'crash', 'ride'),
+}
+DEFAULT_KIT = 'standard'
+
+
+class KitOrder(NamedTuple):
+    """Time-ordered view of a hit grid. All arrays have one entry per output event."""
+    voice: np.ndarray     # row of the grid (index into the kit voices)
+    position: np.ndarray  # step index
+    ghost: np.ndarray     # True for ghost notes (half a step after `hit`)
+    hit: np.ndarray       # rank of the parent hit in voice-major order (hits[hits])
+
+
+def kit_voices(kit: Optional[str] = None) -> Tuple[str, ...]:
+    """Voices of a named kit; unknown or missing names give the standard kit."""
+    return KITS.get(kit or DEFAULT_KIT, KITS[DEFAULT_KIT])
+
+
+def kit_patterns(style: str, voices: Sequence[str]) -> np.ndarray:
+    """(voices x 16) uint8 step patterns for a kit, straight from the style tables."""
+    return style_tables.PATTERNS[
+        style_tables.pattern_style_code(style),
+        [style_tables.voice_code(voice) for voice in voices],
+    ]
+
+
+def time_order(hits: np.ndarray, ghosts: Optional[np.ndarray] = None) -> KitOrder:
+    """
+    Order the hits of a (voices x steps) grid by time without sorting.
+
+    `ghosts` (same shape, subset of `hits`) marks hits followed by a ghost note.
+    Per-hit values generated in voice-major order (e.g. one RNG draw per hit,
+    as np.nonzero(hits) enumerates them) are gathered with `order.hit`.
+    """
+    n_voices, n_steps = hits.shape
+    rank = np.zeros(hits.shape, dtype=np.int64)
+    rank[hits] = np.arange(np.count_nonzero(hits))
+
+    # Slot 2p is step p, slot 2p+1 the ghost note half a step later
+    slots = np.zeros((2 * n_steps, n_voices), dtype=bool)
+    slots[0::2] = hits.T
+    if ghosts is not None:
+        slots[1::2] = ghosts.T
+
+    slot, voice = np.nonzero(slots)
+    position = slot >> 1
+    return KitOrder(voice=voice, position=position, ghost=(slot & 1).astype(bool), hit=rank[voice, position])
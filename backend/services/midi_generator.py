@@ -2,9 +2,9 @@
 
 import mido
 from mido import MidiFile, MidiTrack, Message, MetaMessage
-import random
 from typing import Dict, List, Optional, Any
 from .advanced_midi_generator import AdvancedPatternGenerator, PatternDNA
+from .generation_context import GenerationContext, ensure_context
 
 class MidiGenerator:
     def __init__(self):
@@ -71,10 +71,12 @@ class MidiGenerator:
                       instrument_mode: str = None,
                       bpm: Optional[int] = None,
                       bars: int = 4,
+                      ctx: Optional[GenerationContext] = None,
                       **kwargs) -> MidiFile:
         """
         Main generation method with proper defaults and error handling
         """
+        ctx = ensure_context(ctx)
         mid = MidiFile()
         track = MidiTrack()
         mid.tracks.append(track)
@@ -94,18 +96,18 @@ class MidiGenerator:
         
         # Generate based on instrument type
         if target_instrument in ['drums', 'drum', 'full_drums', 'percussion']:
-            self._generate_drums(track, style, bars)
+            self._generate_drums(track, style, bars, ctx)
         elif target_instrument in ['bass', 'sub', '808']:
-            self._generate_bass(track, musical_key, musical_scale, style, bars)
+            self._generate_bass(track, musical_key, musical_scale, style, bars, ctx.rng)
         elif target_instrument in ['melody', 'lead', 'synth']:
-            self._generate_melody(track, musical_key, musical_scale, style, bars)
+            self._generate_melody(track, musical_key, musical_scale, style, bars, ctx.rng)
         elif target_instrument == 'kick':
-            self._generate_kick_only(track, style, bars)
+            self._generate_kick_only(track, style, bars, ctx.rng)
         elif target_instrument in ['hat', 'hats', 'hihat']:
-            self._generate_hats_only(track, style, bars)
+            self._generate_hats_only(track, style, bars, ctx.rng)
         else:
             # Generate full arrangement
-            self._generate_full_pattern(track, musical_key, musical_scale, style, bars)
+            self._generate_full_pattern(track, musical_key, musical_scale, style, bars, ctx)
         
         return mid
 
@@ -148,14 +150,15 @@ class MidiGenerator:
         
         return 'drums'  # Default
 
-    def _generate_drums(self, track: MidiTrack, style: str, bars: int):
+    def _generate_drums(self, track: MidiTrack, style: str, bars: int, ctx: GenerationContext):
         """Generate complete drum pattern"""
         # Use advanced generator for supported styles
         if style in self.advanced.pattern_templates:
-            self._generate_advanced_drums(track, style, bars)
+            self._generate_advanced_drums(track, style, bars, ctx)
             return
 
         # Fallback to legacy generation for other styles
+        rng = ctx.rng
         pattern = self.style_patterns.get(style, self.style_patterns['techno'])
         ticks_per_step = 120  # 16th note resolution
         total_steps = 16 * bars
@@ -165,7 +168,7 @@ class MidiGenerator:
             
             # Kick pattern
             if step_in_bar in pattern.get('kick_pattern', [0, 4, 8, 12]):
-                velocity = 100 + random.randint(-5, 5)  # Humanization
+                velocity = 100 + rng.randint(-5, 5)  # Humanization
                 track.append(Message('note_on', note=self.drum_map['kick'], 
                                    velocity=velocity, time=0, channel=9))
                 track.append(Message('note_off', note=self.drum_map['kick'], 
@@ -174,7 +177,7 @@ class MidiGenerator:
             # Snare/Clap pattern
             elif step_in_bar in pattern.get('snare_pattern', [4, 12]):
                 note = self.drum_map['snare'] if style != 'trap' else self.drum_map['clap']
-                velocity = 90 + random.randint(-5, 5)
+                velocity = 90 + rng.randint(-5, 5)
                 track.append(Message('note_on', note=note, 
                                    velocity=velocity, time=0, channel=9))
                 track.append(Message('note_off', note=note, 
@@ -183,16 +186,16 @@ class MidiGenerator:
             # Hi-hat pattern
             elif step_in_bar in pattern.get('hat_pattern', []):
                 # Add hat rolls for trap
-                if style == 'trap' and random.random() < 0.3:
+                if style == 'trap' and rng.random() < 0.3:
                     # Triplet roll
                     for i in range(3):
-                        velocity = 60 + random.randint(0, 20)
+                        velocity = 60 + rng.randint(0, 20)
                         track.append(Message('note_on', note=self.drum_map['hat_closed'],
                                            velocity=velocity, time=ticks_per_step//3, channel=9))
                         track.append(Message('note_off', note=self.drum_map['hat_closed'],
                                            velocity=0, time=0, channel=9))
                 else:
-                    velocity = 70 + random.randint(-10, 10)
+                    velocity = 70 + rng.randint(-10, 10)
                     track.append(Message('note_on', note=self.drum_map['hat_closed'],
                                        velocity=velocity, time=0, channel=9))
                     track.append(Message('note_off', note=self.drum_map['hat_closed'],
@@ -201,7 +204,7 @@ class MidiGenerator:
                 # Empty step
                 track.append(Message('note_off', note=0, velocity=0, time=ticks_per_step, channel=9))
 
-    def _generate_advanced_drums(self, track: MidiTrack, style: str, bars: int):
+    def _generate_advanced_drums(self, track: MidiTrack, style: str, bars: int, ctx: GenerationContext):
         """Generate drums using PatternDNA"""
         # Create DNA based on style
         dna = PatternDNA(
@@ -222,7 +225,7 @@ class MidiGenerator:
         }
 
         for instr_name, midi_note in instruments.items():
-            events = self.advanced.generate_pattern_with_dna(style, instr_name, dna, bars)
+            events = self.advanced.generate_pattern_with_dna(style, instr_name, dna, bars, ctx=ctx)
             for e in events:
                 e['note'] = midi_note
                 all_events.append(e)
@@ -258,7 +261,7 @@ class MidiGenerator:
             track.append(Message(msg['type'], note=msg['note'], velocity=msg['velocity'], time=delta, channel=9))
             last_time = msg['time_ticks']
 
-    def _generate_bass(self, track: MidiTrack, key: str, scale: str, style: str, bars: int):
+    def _generate_bass(self, track: MidiTrack, key: str, scale: str, style: str, bars: int, rng):
         """Generate bassline"""
         from .music_theory import MusicTheoryService
         theory = MusicTheoryService()
@@ -285,13 +288,13 @@ class MidiGenerator:
                 note_offset = pattern[step % len(pattern)]
                 if note_offset >= 0:
                     note = root_midi + scale_notes[note_offset % len(scale_notes)]
-                    velocity = 80 + random.randint(-5, 5)
+                    velocity = 80 + rng.randint(-5, 5)
                     track.append(Message('note_on', note=note, velocity=velocity, time=0, channel=0))
                     track.append(Message('note_off', note=note, velocity=0, time=ticks_per_step * 4, channel=0))
                 else:
                     track.append(Message('note_off', note=0, velocity=0, time=ticks_per_step * 4, channel=0))
 
-    def _generate_melody(self, track: MidiTrack, key: str, scale: str, style: str, bars: int):
+    def _generate_melody(self, track: MidiTrack, key: str, scale: str, style: str, bars: int, rng):
         """Generate melodic pattern"""
         from .music_theory import MusicTheoryService
         theory = MusicTheoryService()
@@ -305,21 +308,21 @@ class MidiGenerator:
         # Generate melodic phrase
         phrase = []
         for _ in range(8):
-            note_index = random.choice([0, 2, 3, 4, 6])  # Pentatonic-ish
+            note_index = rng.choice([0, 2, 3, 4, 6])  # Pentatonic-ish
             phrase.append(scale_notes[note_index % len(scale_notes)])
         
         for step in range(total_steps):
-            if step % 2 == 0 and random.random() > 0.3:  # Sparse melody
+            if step % 2 == 0 and rng.random() > 0.3:  # Sparse melody
                 note = root_midi + phrase[step % len(phrase)]
-                velocity = 70 + random.randint(-10, 10)
-                duration = ticks_per_step * random.choice([2, 4, 6])  # Variable length
+                velocity = 70 + rng.randint(-10, 10)
+                duration = ticks_per_step * rng.choice([2, 4, 6])  # Variable length
                 
                 track.append(Message('note_on', note=note, velocity=velocity, time=0, channel=0))
                 track.append(Message('note_off', note=note, velocity=0, time=duration, channel=0))
             else:
                 track.append(Message('note_off', note=0, velocity=0, time=ticks_per_step, channel=0))
 
-    def _generate_kick_only(self, track: MidiTrack, style: str, bars: int):
+    def _generate_kick_only(self, track: MidiTrack, style: str, bars: int, rng):
         """Generate only kick drum pattern"""
         pattern = self.style_patterns.get(style, self.style_patterns['techno'])
         ticks_per_step = 120
@@ -328,7 +331,7 @@ class MidiGenerator:
         for step in range(total_steps):
             step_in_bar = step % 16
             if step_in_bar in pattern.get('kick_pattern', [0, 4, 8, 12]):
-                velocity = 100 + random.randint(-5, 5)
+                velocity = 100 + rng.randint(-5, 5)
                 track.append(Message('note_on', note=self.drum_map['kick'], 
                                    velocity=velocity, time=0, channel=9))
                 track.append(Message('note_off', note=self.drum_map['kick'], 
@@ -336,7 +339,7 @@ class MidiGenerator:
             else:
                 track.append(Message('note_off', note=0, velocity=0, time=ticks_per_step, channel=9))
 
-    def _generate_hats_only(self, track: MidiTrack, style: str, bars: int):
+    def _generate_hats_only(self, track: MidiTrack, style: str, bars: int, rng):
         """Generate only hi-hat pattern"""
         pattern = self.style_patterns.get(style, self.style_patterns['techno'])
         ticks_per_step = 120
@@ -346,8 +349,8 @@ class MidiGenerator:
             step_in_bar = step % 16
             if step_in_bar in pattern.get('hat_pattern', list(range(0, 16, 2))):
                 # Vary between closed and open hats
-                hat_type = 'hat_closed' if random.random() > 0.2 else 'hat_open'
-                velocity = 60 + random.randint(0, 30)
+                hat_type = 'hat_closed' if rng.random() > 0.2 else 'hat_open'
+                velocity = 60 + rng.randint(0, 30)
                 
                 track.append(Message('note_on', note=self.drum_map[hat_type],
                                    velocity=velocity, time=0, channel=9))
@@ -356,11 +359,11 @@ class MidiGenerator:
             else:
                 track.append(Message('note_off', note=0, velocity=0, time=ticks_per_step, channel=9))
 
-    def _generate_full_pattern(self, track: MidiTrack, key: str, scale: str, style: str, bars: int):
+    def _generate_full_pattern(self, track: MidiTrack, key: str, scale: str, style: str, bars: int, ctx: GenerationContext):
         """Generate full arrangement with drums and bass"""
         # This would combine drums + bass + melody
         # For simplicity, just generate drums for now
-        self._generate_drums(track, style, bars)
+        self._generate_drums(track, style, bars, ctx)
 
     def save_midi(self, midi_file: MidiFile, filename: str) -> str:
         """Save MIDI file and return path"""
@@ -0,0 +1,225 @@
+"""
+Note-level splicing and stitching of MIDI tracks.
+
+Regenerating one bar of a pattern, or one block of an arrangement, renders just
+that part and splices its notes into the stored file instead of re-rendering
+everything. Tracks are handled as notes at absolute ticks (note_on paired with
+its note_off) plus the other events (meta events, controllers), so a region
+is replaced by note *start*: a note belongs to the bar it starts in, even if it
+rings into the next one.
+
+Notes are one (n, 5) int64 array, a row per note with the columns
+START, END, CHANNEL, PITCH, VELOCITY (ticks / MIDI values). The generator can
+hand them over directly (generate(output='notes')), stored files are read with
+track_notes, and encode_track writes a track body in one pass, so stitching an
+arrangement or editing a long file never builds mido objects:
+
+    midi_type, ticks_per_beat, bodies = split_file(stored_bytes)
+    notes, _ = generator.generate(..., output='notes')
+    bar_2 = [bar_range(2, ticks_per_beat)]
+    bodies[0] = splice_track(bodies[0], clip_notes(notes, bar_2), bar_2)
+    data = encode_file(bodies, ticks_per_beat, midi_type)
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .smf_writer import META, encode_channel_events, encode_vlq, iter_events
+
+BEATS_PER_BAR = 4
+END_OF_TRACK_TYPE = 0x2F
+
+# Note array columns
+START, END, CHANNEL, PITCH, VELOCITY = range(5)
+NOTE_FIELDS = 5
+
+TimedEvent = Tuple[int, bytes]  # (absolute tick, message bytes without delta)
+TickRange = Tuple[int, int]  # [start, end)
+
+
+def empty_notes() -> np.ndarray:
+    return np.empty((0, NOTE_FIELDS), dtype=np.int64)
+
+
+def bar_range(bar: int, ticks_per_beat: int, bars: int = 1) -> TickRange:
+    """[start, end) ticks of `bars` bars starting at bar index `bar` (0-based, 4/4)."""
+    ticks_per_bar = ticks_per_beat * BEATS_PER_BAR
+    return bar * ticks_per_bar, (bar + bars) * ticks_per_bar
+
+
+def track_notes(body: bytes) -> Tuple[np.ndarray, List[TimedEvent]]:
+    """
+    Split an encoded track into notes (in note_on order) and the remaining events,
+    at absolute ticks. Note-offs (or note_on with velocity 0) close the oldest open
+    note of the same channel/pitch; notes never closed end at the last tick of the
+    track. end_of_track is dropped (track_chunk writes it back).
+    """
+    rows: List[List[int]] = []
+    others: List[TimedEvent] = []
+    open_notes = {}
+    tick = 0
+    for tick, message in iter_events(body):
+        kind = message[0] & 0xF0
+        if kind == 0x90 and message[2] > 0:
+            open_notes.setdefault((message[0], message[1]), []).append(len(rows))
+            rows.append([tick, tick, message[0] & 0x0F, message[1], message[2]])
+        elif kind in (0x80, 0x90):
+            pending = open_notes.get((message[0] | 0x10, message[1]))
+            if pending:
+                rows[pending.pop(0)][END] = tick
+        elif not (message[0] == META and message[1] == END_OF_TRACK_TYPE):
+            others.append((tick, message))
+
+    for pending in open_notes.values():
+        for index in pending:
+            rows[index][END] = tick
+    notes = np.array(rows, dtype=np.int64).reshape(len(rows), NOTE_FIELDS)
+    return notes, others
+
+
+class TrackEncoder:
+    """
+    encode_track one window at a time, for tracks too long to hold at once.
+
+    add() notes and events as they are produced, flush(until) writes every event
+    before tick `until` (in encode_track order) through `write` and keeps the
+    rest - typically note_offs of notes ringing into the next window. Later
+    add() calls may not go back before `until`. Delta times and running status
+    carry over between flushes, so the concatenated output is byte-identical
+    to encode_track over everything that was added.
+    """
+
+    def __init__(self, write: Callable[[bytes], Any]):
+        self._write = write
+        # Pending event rows (others: kind 0, note_ons: 1, note_offs: 2)
+        self._ticks = np.empty(0, dtype=np.int64)
+        self._kinds = np.empty(0, dtype=np.int64)
+        self._index = np.empty(0, dtype=np.int64)
+        self._status = np.empty(0, dtype=np.int64)
+        self._data1 = np.empty(0, dtype=np.int64)
+        self._data2 = np.empty(0, dtype=np.int64)
+        self._payloads: Dict[int, bytes] = {}
+        self._notes_added = 0
+        self._others_added = 0
+        self._last_tick = 0
+        self._running_status = 0
+        self._flushed_until = 0
+
+    def add(self, notes: np.ndarray, others: Sequence[TimedEvent] = ()) -> None:
+        notes = np.asarray(notes, dtype=np.int64).reshape(-1, NOTE_FIELDS)
+        n, m = len(notes), len(others)
+        other_ticks = np.array([tick for tick, _ in others], dtype=np.int64)
+        earliest = min(notes[:, START].min(initial=self._flushed_until), other_ticks.min(initial=self._flushed_until))
+        if earliest < self._flushed_until:
+            raise ValueError(f"Event at tick {earliest} added after flushing up to tick {self._flushed_until}")
+
+        first_other = self._others_added
+        for i, (_, payload) in enumerate(others):
+            self._payloads[first_other + i] = payload
+        channel, pitch = notes[:, CHANNEL], notes[:, PITCH]
+        none, silent = np.zeros(m, dtype=np.int64), np.zeros(n, dtype=np.int64)
+        note_index = self._notes_added + np.arange(n)
+
+        self._ticks = np.concatenate([self._ticks, other_ticks, notes[:, START], notes[:, END]])
+        self._kinds = np.concatenate([self._kinds, np.repeat([0, 1, 2], [m, n, n])])
+        self._index = np.concatenate([self._index, first_other + np.arange(m), note_index, note_index])
+        self._status = np.concatenate([self._status, none, 0x90 | channel, 0x80 | channel])
+        self._data1 = np.concatenate([self._data1, none, pitch, pitch])
+        self._data2 = np.concatenate([self._data2, none, notes[:, VELOCITY], silent])
+        self._notes_added += n
+        self._others_added += m
+
+    def flush(self, until: Optional[int] = None) -> None:
+        """Write the pending events before tick `until` (all of them when None)."""
+        if until is None:
+            due = np.ones(len(self._ticks), dtype=bool)
+        else:
+            due = self._ticks < until
+            self._flushed_until = max(self._flushed_until, until)
+        if not due.any():
+            return
+
+        rows = np.flatnonzero(due)
+        rows = rows[np.lexsort((self._index[rows], self._kinds[rows], self._ticks[rows]))]
+        ticks, kinds, status = self._ticks[rows], self._kinds[rows], self._status[rows]
+        data1, data2 = self._data1[rows], self._data2[rows]
+        deltas = np.diff(ticks, prepend=self._last_tick)
+
+        chunks = []
+        run = 0
+        for position in np.flatnonzero(kinds == 0):
+            if position > run:
+                chunks.append(encode_channel_events(deltas[run:position], status[run:position], data1[run:position],
+                                                    data2[run:position], running_status=self._running_status))
+            chunks.append(encode_vlq(int(deltas[position])) + self._payloads.pop(int(self._index[rows[position]])))
+            self._running_status = 0  # meta/sysex events cancel running status
+            run = position + 1
+        if run < len(rows):
+            chunks.append(encode_channel_events(deltas[run:], status[run:], data1[run:], data2[run:],
+                                                running_status=self._running_status))
+            self._running_status = int(status[-1])
+        self._last_tick = int(ticks[-1])
+        self._write(b''.join(chunks))
+
+        keep = ~due
+        self._ticks, self._kinds, self._index = self._ticks[keep], self._kinds[keep], self._index[keep]
+        self._status, self._data1, self._data2 = self._status[keep], self._data1[keep], self._data2[keep]
+
+
+def encode_track(notes: np.ndarray, others: Sequence[TimedEvent] = ()) -> bytes:
+    """
+    Inverse of track_notes: events sorted by tick, then other events, note_ons
+    and note_offs (note_off after note_on at the same tick, as the generator
+    writes them; ties in note row order). Returns the track body without
+    end_of_track.
+
+    Note columns are ordered and encoded with NumPy (smf_writer.encode_channel_events);
+    only the few other events are written one by one, each one closing a run of
+    channel messages (meta/sysex events reset running status).
+    """
+    chunks: List[bytes] = []
+    encoder = TrackEncoder(chunks.append)
+    encoder.add(notes, others)
+    encoder.flush()
+    return b''.join(chunks)
+
+
+def starts_in(notes: np.ndarray, ranges: Sequence[TickRange]) -> np.ndarray:
+    """Mask of the notes starting in any of `ranges`."""
+    mask = np.zeros(len(notes), dtype=bool)
+    for start, end in ranges:
+        mask |= (notes[:, START] >= start) & (notes[:, START] < end)
+    return mask
+
+
+def offset_notes(notes: np.ndarray, offset: int) -> np.ndarray:
+    """Copy of `notes` moved by `offset` ticks."""
+    moved = notes.copy()
+    moved[:, START:END + 1] += offset
+    return moved
+
+
+def clip_notes(notes: np.ndarray, ranges: Sequence[TickRange], offset: int = 0,
+               channel: Optional[int] = None) -> np.ndarray:
+    """Notes starting in any of `ranges`, shifted by `offset` ticks (and moved to `channel`)."""
+    clipped = offset_notes(notes[starts_in(notes, ranges)], offset)
+    if channel is not None:
+        clipped[:, CHANNEL] = channel
+    return clipped
+
+
+def splice_track(body: bytes, replacement: np.ndarray, ranges: Sequence[TickRange]) -> bytes:
+    """
+    Replace the notes of an encoded track that start in any of `ranges` with
+    `replacement` (already at their absolute ticks); everything else is kept.
+    """
+    notes, others = track_notes(body)
+    kept = notes[~starts_in(notes, ranges)]
+    return encode_track(np.concatenate([kept, np.asarray(replacement, dtype=np.int64).reshape(-1, NOTE_FIELDS)]),
+                        others)
+
+
+def concat_notes(parts: Iterable[np.ndarray]) -> np.ndarray:
+    """One note array from several (e.g. an arrangement track from its blocks)."""
+    parts = list(parts)
+    return np.concatenate(parts) if parts else empty_notes()
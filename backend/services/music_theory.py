@@ -1,8 +1,111 @@
 import random
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+NOTE_NAMES = ('C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B')
+
+# Step pattern (semitones between consecutive degrees) of each scale.
+# Unknown scale types fall back to natural minor, as they always have.
+SCALE_STEPS = {
+    'major': (2, 2, 1, 2, 2, 2, 1),
+    'minor': (2, 1, 2, 2, 1, 2, 2),
+    'ionian': (2, 2, 1, 2, 2, 2, 1),
+    'dorian': (2, 1, 2, 2, 2, 1, 2),
+    'phrygian': (1, 2, 2, 2, 1, 2, 2),
+    'lydian': (2, 2, 2, 1, 2, 2, 1),
+    'mixolydian': (2, 2, 1, 2, 2, 1, 2),
+    'aeolian': (2, 1, 2, 2, 1, 2, 2),
+    'locrian': (1, 2, 2, 1, 2, 2, 2),
+    'harmonic_minor': (2, 1, 2, 2, 1, 3, 1),
+    'melodic_minor': (2, 1, 2, 2, 2, 2, 1),
+}
+DEFAULT_SCALE = 'minor'
+
+QUANTIZE_OCTAVES = range(9)  # quantize_to_scale snaps to scale notes in octaves 0-8
+
+
+class ScaleTable(NamedTuple):
+    """Immutable lookup tables for one (root, scale) pair."""
+    names: Tuple[str, ...]       # note names in degree order, e.g. ('A', 'B', 'C', ...)
+    pitch_classes: Tuple[int, ...]
+    in_scale: np.ndarray         # (128,) bool, MIDI note belongs to the scale
+    nearest: np.ndarray          # (128,) int16, nearest scale note (quantize_to_scale)
+    chords: np.ndarray           # (degrees, 4) int16 triad + octave per degree, at octave -1
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=None)
+def note_index(note: str) -> int:
+    """Pitch class (0-11) of a note name; sharps on unknown spellings, unknown -> C."""
+    note = note.upper().replace('VB', 'B')
+    if note not in NOTE_NAMES and '#' in note:
+         # Logică simplă pentru diez
+         base = note[0]
+         if base in NOTE_NAMES:
+             return (NOTE_NAMES.index(base) + 1) % 12
+    return NOTE_NAMES.index(note) if note in NOTE_NAMES else 0
+
+
+def note_to_midi(note: str, octave: int) -> int:
+    return (octave + 1) * 12 + note_index(note)
+
+
+@lru_cache(maxsize=None)
+def scale_pitch_classes(root: str, scale_type: str) -> Tuple[int, ...]:
+    """Pitch classes of the scale in degree order, starting at the root."""
+    steps = SCALE_STEPS.get(scale_type, SCALE_STEPS[DEFAULT_SCALE])
+    current_idx = note_index(root)
+    pitch_classes = [current_idx]
+    for interval in steps[:-1]: # Putem sări peste ultima
+        current_idx = (current_idx + interval) % 12
+        pitch_classes.append(current_idx)
+    return tuple(pitch_classes)
+
+
+@lru_cache(maxsize=None)
+def scale_table(root: str, scale_type: str) -> ScaleTable:
+    """Memoized tables for (root, scale_type); built once per pair per process."""
+    pitch_classes = scale_pitch_classes(root, scale_type)
+
+    # Same candidate order as the old per-call list (octave by octave, degree order),
+    # so ties resolve to the same note as min(..., key=distance)
+    candidates = np.array([(octave + 1) * 12 + pc for octave in QUANTIZE_OCTAVES for pc in pitch_classes])
+    distance = np.abs(np.arange(128)[:, None] - candidates[None, :])
+    nearest = candidates[np.argmin(distance, axis=1)].astype(np.int16)
+
+    in_scale = np.isin(np.arange(128) % 12, pitch_classes)
+
+    # Diatonic triads stacked in thirds (+ octave), wrapping degrees into the next octave
+    base = np.array(pitch_classes)  # octave -1: (octave + 1) * 12 == 0
+    n = len(base)
+    def degree_note(idx):
+        return base[idx % n] + 12 * (idx // n)
+    chords = np.array([[degree_note(d), degree_note(d + 2), degree_note(d + 4), degree_note(d) + 12]
+                       for d in range(n)], dtype=np.int16)
+
+    return ScaleTable(
+        names=tuple(NOTE_NAMES[pc] for pc in pitch_classes),
+        pitch_classes=pitch_classes,
+        in_scale=_readonly(in_scale),
+        nearest=_readonly(nearest),
+        chords=_readonly(chords),
+    )
+
 
 class MusicTheoryService:
+    SCALE_STEPS = SCALE_STEPS
+
     def __init__(self):
-        self.NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        self.NOTES = list(NOTE_NAMES)
+
+        # Semitone offsets from the root for each scale (basic generator bass/melody)
+        self.SCALES = {name: [0] + list(np.cumsum(steps[:-1]).tolist()) for name, steps in SCALE_STEPS.items()}
         
         # DEFINIȚII ACORDURI (Intervale)
         self.CHORD_INTERVALS = {
@@ -73,33 +176,26 @@ class MusicTheoryService:
         Public method to get MIDI notes for a scale.
         Used by IntegratedMidiGenerator.
         """
-        note_names = self._get_scale_notes(root, scale_type)
-        midi_notes = []
-        for n in note_names:
-            midi_notes.append(self._note_to_midi(n, octave))
-        return midi_notes
+        offset = (octave + 1) * 12
+        return [offset + pc for pc in scale_pitch_classes(root, scale_type)]
+
+    def scale_table(self, root: str, scale_type: str) -> ScaleTable:
+        return scale_table(root, scale_type)
+
+    def quantize(self, pitches, root: str, scale_type: str) -> np.ndarray:
+        """Snap a whole array of MIDI notes to the nearest scale note (one table lookup)."""
+        return scale_table(root, scale_type).nearest[np.clip(np.asarray(pitches), 0, 127)]
+
+    def chord_tones(self, root: str, scale_type: str, degree: int, octave: int = 3) -> list:
+        """Diatonic triad + octave on a 0-indexed scale degree."""
+        chords = scale_table(root, scale_type).chords
+        return (chords[degree % len(chords)] + (octave + 1) * 12).tolist()
 
     # --- HELPERS ---
 
     def _get_scale_notes(self, root: str, scale_type: str):
         """Generează toate notele dintr-o gamă"""
-        start_idx = self._note_to_index(root)
-        
-        # Intervale (Major vs Minor)
-        if scale_type == 'major':
-            intervals = [2, 2, 1, 2, 2, 2, 1]
-        else: # minor
-            intervals = [2, 1, 2, 2, 1, 2, 2]
-            
-        notes = []
-        current_idx = start_idx
-        notes.append(self.NOTES[current_idx])
-        
-        for interval in intervals[:-1]: # Putem sări peste ultima
-            current_idx = (current_idx + interval) % 12
-            notes.append(self.NOTES[current_idx])
-            
-        return notes
+        return list(scale_table(root, scale_type).names)
 
     def _roman_to_chord(self, roman: str, scale_notes: list):
         """Convertește 'vi' în 'Amin' (dacă suntem în C Major)"""
@@ -122,14 +218,7 @@ class MusicTheoryService:
         return f"{root}{quality}"
 
     def _note_to_midi(self, note: str, octave: int) -> int:
-        idx = self._note_to_index(note)
-        return (octave + 1) * 12 + idx
+        return note_to_midi(note, octave)
 
     def _note_to_index(self, note: str):
-        note = note.upper().replace('VB', 'B')
-        if note not in self.NOTES and '#' in note:
-             # Logică simplă pentru diez
-             base = note[0]
-             if base in self.NOTES:
-                 return (self.NOTES.index(base) + 1) % 12
-        return self.NOTES.index(note) if note in self.NOTES else 0
\ No newline at end of file
+        return note_index(note)
@@ -1,4 +1,79 @@
-import random
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .generation_context import GenerationContext, ensure_context
+
+BEATS_PER_BAR = 4
+
+
+class ParsedChord(NamedTuple):
+    name: str
+    root: int
+    intervals: Tuple[int, ...]
+    absolute_notes: Tuple[int, ...]
+
+
+class Progression(list):
+    """
+    A chord progression for one request: the legacy list of chord dicts
+    ({'name', 'root', 'intervals', 'absolute_notes'}), plus lookup tables built
+    once on first use - roots, chord tones padded to a (chords x max_tones)
+    array, and bar -> chord indexing - so pitch assignment is array indexing
+    instead of per-event dict lookups. Treat it as read-only once built.
+    """
+
+    def __init__(self, chords: Iterable[Dict] = ()):
+        super().__init__(chords)
+        self._tables = None
+
+    @classmethod
+    def coerce(cls, progression: Optional[Iterable[Dict]]) -> 'Progression':
+        if isinstance(progression, cls):
+            return progression
+        return cls(progression or ())
+
+    def _build(self):
+        counts = np.array([len(chord['absolute_notes']) for chord in self], dtype=np.int64)
+        tones = np.zeros((len(self), max(1, int(counts.max(initial=0)))), dtype=np.int64)
+        for row, chord in enumerate(self):
+            tones[row, :counts[row]] = chord['absolute_notes']
+        roots = np.array([chord['root'] for chord in self], dtype=np.int64)
+        self._tables = (roots, tones, counts, [tuple(chord['absolute_notes']) for chord in self])
+        return self._tables
+
+    @property
+    def tables(self):
+        """(roots, tones, tone_counts, tone_tuples), built on first access."""
+        return self._tables or self._build()
+
+    @property
+    def roots(self) -> np.ndarray:
+        return self.tables[0]
+
+    def bar_index(self, times, ticks_per_beat: int = 1) -> np.ndarray:
+        """
+        Chord index for each event time: bar % len(progression), for whole arrays.
+        Times are ticks at `ticks_per_beat` (EventBuffer.time with its ppq), or beats by default.
+        """
+        bars = (np.asarray(times) // (BEATS_PER_BAR * ticks_per_beat)).astype(np.int64)
+        return bars % len(self)
+
+    def chord_tones(self, index: int) -> Tuple[int, ...]:
+        return self.tables[3][index]
+
+    def tone_table(self, default: Tuple[int, ...] = ()) -> Tuple[np.ndarray, np.ndarray]:
+        """(tones, counts) with chords that have no notes replaced by `default`."""
+        _, tones, counts, _ = self.tables
+        empty = counts == 0
+        if not default or not empty.any():
+            return tones, counts
+        width = max(tones.shape[1], len(default))
+        table = np.zeros((len(self), width), dtype=np.int64)
+        table[:, :tones.shape[1]] = tones
+        table[empty, :len(default)] = default
+        return table, np.where(empty, len(default), counts)
 
 class MusicTheoryEngine:
     """
@@ -69,7 +144,8 @@ class MusicTheoryEngine:
         'dom13': [0, 4, 7, 10, 14, 21]
     }
 
-    def generate_progression(self, style: str, root_key_midi: int, scale_type: str = 'major'):
+    def generate_progression(self, style: str, root_key_midi: int, scale_type: str = 'major',
+                             ctx: Optional[GenerationContext] = None):
         """
         Returns a list of chord objects: [{'root': 60, 'intervals': [0, 4, 7], 'type': 'I'}, ...]
         """
@@ -96,30 +172,24 @@ class MusicTheoryEngine:
         
         search_style = style_map.get(style.lower(), style.lower())
         templates = self.PROGRESSIONS.get(search_style, self.PROGRESSIONS['generic'])
-        selected_progression = random.choice(templates)
+        selected_progression = ensure_context(ctx).rng.choice(templates)
         
-        full_progression = []
-
-        # 2. Translate Roman Numerals to MIDI
+        # 2. Translate Roman Numerals to MIDI (parsed chords are cached across requests)
+        full_progression = Progression()
         for roman in selected_progression:
-            # Parse Roman Numeral
-            degree_offset, chord_type = self._parse_roman(roman)
-            
-            # Calculate actual root note
-            chord_root = root_key_midi + degree_offset
-            
-            # Get intervals
-            intervals = self.CHORD_INTERVALS.get(chord_type, [0, 4, 7])
-            
+            chord = parse_chord(roman, root_key_midi, scale_type)
             full_progression.append({
-                'root': chord_root,
-                'intervals': intervals,
+                'root': chord.root,
+                'intervals': list(chord.intervals),
                 'name': roman,
-                'absolute_notes': [chord_root + interval for interval in intervals]
+                'absolute_notes': list(chord.absolute_notes)
             })
             
         return full_progression
 
+    def parse_chord(self, roman: str, root_key_midi: int, scale_type: str = 'major') -> ParsedChord:
+        return parse_chord(roman, root_key_midi, scale_type)
+
     def get_chord_tones(self, chord_obj):
         """Helper to extract playable notes for Arpeggiators/Melodies"""
         return chord_obj['absolute_notes']
@@ -129,4 +199,21 @@ class MusicTheoryEngine:
         if roman in self.ROMAN_MAP:
             return self.ROMAN_MAP[roman]
         # Default fallback if unknown
-        return (0, 'maj')
\ No newline at end of file
+        return (0, 'maj')
+
+@lru_cache(maxsize=1024)
+def parse_chord(roman: str, root_key_midi: int, scale_type: str = 'major') -> ParsedChord:
+    """
+    Roman numeral -> concrete chord in a key. Bounded cache keyed by
+    (roman, root, scale); the scale is part of the key so scale-aware
+    numerals can be added without invalidating anything.
+    """
+    # Parse Roman Numeral
+    degree_offset, chord_type = MusicTheoryEngine.ROMAN_MAP.get(roman, (0, 'maj'))
+
+    # Calculate actual root note
+    chord_root = root_key_midi + degree_offset
+
+    # Get intervals
+    intervals = tuple(MusicTheoryEngine.CHORD_INTERVALS.get(chord_type, [0, 4, 7]))
+    return ParsedChord(roman, chord_root, intervals, tuple(chord_root + interval for interval in intervals))
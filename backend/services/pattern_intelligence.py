@@ -1,5 +1,57 @@
-import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .event_buffer import DEFAULT_PPQ, EventBuffer
+from .generation_context import GenerationContext, ensure_context
+
+class PhraseLayout:
+    """
+    A phrase as unique section templates plus the section + time offset of each bar
+    (bars are beats_per_bar * ppq ticks long).
+
+    Repeated sections (every 'A' of AABA...) reference the same template buffer;
+    nothing is copied until materialize(), which gathers all bars in one indexed
+    take instead of one copy per bar.
+    """
+
+    __slots__ = ('sections', 'bar_sections', 'beats_per_bar')
+
+    def __init__(self, sections: List[EventBuffer], bar_sections: np.ndarray, beats_per_bar: int = 4):
+        self.sections = sections
+        self.bar_sections = np.asarray(bar_sections, dtype=np.int64)
+        self.beats_per_bar = beats_per_bar
+
+    @property
+    def bars(self) -> int:
+        return len(self.bar_sections)
+
+    def __len__(self) -> int:
+        sizes = np.array([len(section) for section in self.sections], dtype=np.int64)
+        return int(sizes[self.bar_sections].sum()) if self.bars else 0
+
+    def __repr__(self) -> str:
+        return f"PhraseLayout(bars={self.bars}, sections={len(self.sections)})"
+
+    def materialize(self) -> EventBuffer:
+        """Concrete events for the whole phrase, bar by bar (each bar in section order)."""
+        if not self.sections or self.bars == 0:
+            return EventBuffer(ppq=self.sections[0].ppq if self.sections else DEFAULT_PPQ)
+        templates = EventBuffer.concatenate(self.sections)
+        sizes = np.array([len(section) for section in self.sections], dtype=np.int64)
+        starts = np.cumsum(sizes) - sizes
+
+        # Row index into `templates` for every output event, plus its bar
+        bar_sizes = sizes[self.bar_sections]
+        total = int(bar_sizes.sum())
+        bar_of_row = np.repeat(np.arange(self.bars), bar_sizes)
+        row_in_bar = np.arange(total) - np.repeat(np.cumsum(bar_sizes) - bar_sizes, bar_sizes)
+        index = starts[self.bar_sections][bar_of_row] + row_in_bar
+
+        events = templates.take(index)
+        events.time += bar_of_row * (self.beats_per_bar * templates.ppq)
+        return events
+
 
 class PhraseStructure:
     """Create musical sentences, not just patterns"""
@@ -10,77 +62,72 @@ class PhraseStructure:
         'ABAC': [0, 1, 0, 2],  # Through-composed
         'AAAB': [0, 0, 0, 1],  # Build tension
     }
+    BEATS_PER_BAR = 4
+
+    def bar_sections(self, structure: str, bars: Optional[int] = None) -> np.ndarray:
+        """Section index per bar: the form, repeated (and cut) to `bars` bars if given."""
+        form = self.STRUCTURES.get(structure, [0, 0, 0, 0])
+        return np.resize(np.array(form, dtype=np.int64), len(form) if bars is None else bars)
     
-    def apply_structure(self, base_pattern: List[Dict], structure: str = 'AABA', variation_engine=None) -> List[Dict]:
+    def apply_structure(self, base_pattern: List[Dict], structure: str = 'AABA', variation_engine=None,
+                        ctx: Optional[GenerationContext] = None, bars: Optional[int] = None) -> List[Dict]:
         """Apply musical form to patterns.
         
         Args:
             base_pattern: The initial 1-bar pattern (Section A)
             structure_type: The form to use (AABA, etc.)
             variation_engine: Instance of PatternIntelligence to create variations
+            ctx: Per-request random state
+            bars: Length in bars; the form repeats to fill it (default: one pass of the form)
             
         Returns:
             List[Dict]: Combined events for the entire structure
         """
-        structure_indices = self.STRUCTURES.get(structure, [0, 0, 0, 0])
-        full_structure_events = []
-        beats_per_bar = 4
-        
-        # Cache generated sections to ensure 'A' is always 'A', 'B' is always 'B'
-        sections_cache = {}
+        ctx = ensure_context(ctx)
+        if isinstance(base_pattern, EventBuffer):
+            return self.layout_structure(base_pattern, structure, variation_engine, ctx, bars).materialize()
 
-        for bar_idx, section_id in enumerate(structure_indices):
-            # Generate or retrieve section content
-            if section_id not in sections_cache:
-                if section_id == 0:
-                    # Section A - Base Pattern
-                    sections_cache[section_id] = [e.copy() for e in base_pattern]
-                else:
-                    # Section B/C - Variations
-                    # If variation engine provided, use it, otherwise simple mutation
-                    if variation_engine:
-                        sections_cache[section_id] = variation_engine.generate_variation(base_pattern, intensity=0.3 * section_id)
-                    else:
-                        sections_cache[section_id] = [e.copy() for e in base_pattern] # Fallback
-            
-            # Add time offset for this bar
-            bar_events = [e.copy() for e in sections_cache[section_id]]
-            time_offset = bar_idx * beats_per_bar
-            
-            for event in bar_events:
-                event['time'] += time_offset
-                full_structure_events.extend(bar_events)
-                
-        # Remove duplicates if any (though logic above shouldn't create them per event object)
-        # Note: full_structure_events.extend adds the list elements, so we are good.
-        # Wait, inside the loop: for event in bar_events -> event['time']+=... -> extend.
-        # Logic error in my thought above: I shouldn't loop inside the append loop.
-        
-        # Corrected Logic:
+        # Cache generated sections to ensure 'A' is always 'A', 'B' is always 'B'
+        sections_cache = {0: base_pattern}
         final_events = []
-        for bar_idx, section_id in enumerate(structure_indices):
+        for bar_idx, section_id in enumerate(self.bar_sections(structure, bars).tolist()):
             if section_id not in sections_cache:
-                if section_id == 0:
-                    sections_cache[section_id] = [e.copy() for e in base_pattern]
+                # Section B/C - Variations (plain repeat of A without a variation engine)
+                if variation_engine:
+                    sections_cache[section_id] = variation_engine.generate_variation(base_pattern, intensity=0.3 * section_id, ctx=ctx)
                 else:
-                    if variation_engine:
-                        sections_cache[section_id] = variation_engine.generate_variation(base_pattern, intensity=0.3 * section_id)
-                    else:
-                         # Simple fallback variation: Shift time slightly or drop events
-                        fallback_var = [e.copy() for e in base_pattern if random.random() > 0.2]
-                        sections_cache[section_id] = fallback_var
-
-            bar_events = [e.copy() for e in sections_cache[section_id]]
-            time_offset = bar_idx * beats_per_bar
-            
-            for event in bar_events:
-                event['time'] = event['time'] + time_offset # Reset time to relative bar start + offset
-                # Note: event['time'] in sections_cache should be 0-4.
-                
-            final_events.extend(bar_events)
+                    sections_cache[section_id] = base_pattern
+
+            # One copy per output event: section time (0-4) + bar offset
+            time_offset = bar_idx * self.BEATS_PER_BAR
+            final_events.extend({**e, 'time': e['time'] + time_offset} for e in sections_cache[section_id])
             
         return final_events
 
+    def layout_structure(self, base_pattern: EventBuffer, structure: str = 'AABA', variation_engine=None,
+                         ctx: Optional[GenerationContext] = None, bars: Optional[int] = None) -> PhraseLayout:
+        """
+        Form as a PhraseLayout: each distinct section is built once (A is the base
+        pattern itself, B/C variations of it), bars only reference them. Without a
+        variation engine B/C are plain repeats of A, as in the dict path.
+        """
+        ctx = ensure_context(ctx)
+        bar_sections = self.bar_sections(structure, bars)
+
+        # Cache generated sections to ensure 'A' is always 'A', 'B' is always 'B'
+        slots = {0: 0}
+        sections = [base_pattern]
+        for section_id in dict.fromkeys(bar_sections.tolist()):
+            if section_id in slots:
+                continue
+            if not variation_engine:
+                slots[section_id] = 0
+                continue
+            slots[section_id] = len(sections)
+            sections.append(variation_engine.generate_variation(base_pattern, intensity=0.3 * section_id, ctx=ctx))
+
+        return PhraseLayout(sections, np.array([slots[s] for s in bar_sections.tolist()]), self.BEATS_PER_BAR)
+
 
 class PatternIntelligence:
     """Advanced pattern generation with musical intelligence"""
@@ -89,19 +136,24 @@ class PatternIntelligence:
         self.pattern_memory = {}  # Remember what was generated
         self.phrase_structure = PhraseStructure()
         
-    def generate_variation(self, pattern: List[Dict], intensity: float = 0.2) -> List[Dict]:
+    def generate_variation(self, pattern: List[Dict], intensity: float = 0.2,
+                           ctx: Optional[GenerationContext] = None) -> List[Dict]:
         """Generate a variation of the given pattern."""
+        rng = ensure_context(ctx).rng
+        if isinstance(pattern, EventBuffer):
+            return self._generate_variation_buffer(pattern, intensity, rng)
+
         variation = []
         for event in pattern:
             new_event = event.copy()
             
             # 1. Pruning (Remove events)
-            if random.random() < (intensity * 0.5):
+            if rng.random() < (intensity * 0.5):
                 continue
                 
             # 2. Shift (Timing variation)
-            if random.random() < (intensity * 0.3):
-                shift = random.choice([-0.125, 0.125])
+            if rng.random() < (intensity * 0.3):
+                shift = rng.choice([-0.125, 0.125])
                 new_event['time'] = max(0, new_event['time'] + shift)
                 
             variation.append(new_event)
@@ -110,14 +162,36 @@ class PatternIntelligence:
         # (Simple implementation for now)
         return variation
 
-    def generate_intelligent_pattern(self, base_pattern: List[Dict], context: Dict[str, Any]) -> List[Dict]:
+    def _generate_variation_buffer(self, pattern: EventBuffer, intensity: float, rng) -> EventBuffer:
+        n = len(pattern)
+        keep = np.ones(n, dtype=bool)
+        shift = np.zeros(n, dtype=np.int64)
+        nudge = pattern.ppq // 8  # a 32nd, in ticks
+        for i in range(n):
+            # 1. Pruning (Remove events)
+            if rng.random() < (intensity * 0.5):
+                keep[i] = False
+                continue
+            # 2. Shift (Timing variation)
+            if rng.random() < (intensity * 0.3):
+                shift[i] = rng.choice([-nudge, nudge])
+
+        variation = pattern.take(keep)
+        np.maximum(variation.time + shift[keep], 0, out=variation.time)
+        return variation
+
+    def generate_intelligent_pattern(self, base_pattern: List[Dict], context: Dict[str, Any],
+                                     ctx: Optional[GenerationContext] = None) -> List[Dict]:
         """Generate patterns that relate to each other"""
         
-        # 1. Phrase Structure (Default to 4 bars AABA if bars=4)
+        # 1. Phrase Structure: AABA, repeated to fill the requested length (16/32/64 bars...)
         bars = context.get('bars', 4)
         if bars >= 4:
-            return self.phrase_structure.apply_structure(base_pattern, 'AABA', self)
+            return self.phrase_structure.apply_structure(base_pattern, 'AABA', self, ctx=ctx, bars=bars)
             
+        if isinstance(base_pattern, EventBuffer):
+            return PhraseLayout([base_pattern], np.zeros(bars, dtype=np.int64)).materialize()
+
         # Fallback for short patterns: Simple Loop
         full_events = []
         for i in range(bars):
@@ -1,55 +1,79 @@
-import random
-import math
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from .event_buffer import EventBuffer, FLAG_ACCENT, FLAG_STACCATO, FLAG_PUNCH
+from .generation_context import GenerationContext, ensure_context
+
+ACCENT_STEPS = 16
+# accent_pattern: loud on every beat of a 16-step grid over the normalized time
+ACCENT_TABLE = np.where(np.arange(ACCENT_STEPS) % 4 == 0, 127.0, 80.0)
+ACCENT_TABLE.setflags(write=False)
+
+# Curves take normalized times t (array, 0-1) and the request's numpy Generator,
+# and return one base velocity per event. Noise is drawn for all events at once.
+VELOCITY_CURVES = {
+    'human_drummer': lambda t, rng: 80 + 20 * np.sin(t * np.pi) + rng.integers(-5, 6, size=len(t)), # Added +/- 5 variance
+    'machine_gun': lambda t, rng: np.full(len(t), 127.0),
+    'crescendo': lambda t, rng: 20 + (107 * t),
+    'diminuendo': lambda t, rng: 127 - (107 * t),
+    'accent_pattern': lambda t, rng: ACCENT_TABLE[(t * ACCENT_STEPS).astype(np.int64) % ACCENT_STEPS],
+    'jazz_brush': lambda t, rng: 60 + 10 * np.sin(t * 2 * np.pi) + rng.normal(0, 3, size=len(t)),
+    'natural': lambda t, rng: 90 + rng.normal(0, 5, size=len(t)) # Default
+}
+
 
 class VelocityAutomation:
     """Realistic velocity patterns"""
     
     def __init__(self):
-        self.CURVES = {
-            'human_drummer': lambda t: 80 + 20 * math.sin(t * math.pi) + random.randint(-5, 5), # Added +/- 5 variance
-            'machine_gun': lambda t: 127,
-            'crescendo': lambda t: 20 + (107 * t),
-            'diminuendo': lambda t: 127 - (107 * t),
-            'accent_pattern': lambda t: 127 if int(t * 16) % 4 == 0 else 80,
-            'jazz_brush': lambda t: 60 + 10 * math.sin(t * 2 * math.pi) + random.gauss(0, 3),
-            'natural': lambda t: 90 + random.gauss(0, 5) # Default
-        }
+        self.CURVES = VELOCITY_CURVES
     
-    def apply_velocity_curve(self, events: List[Dict], curve_type: str = 'natural', intensity: float = 1.0) -> List[Dict]:
+    def apply_velocity_curve(self, events: List[Dict], curve_type: str = 'natural', intensity: float = 1.0,
+                             ctx: Optional[GenerationContext] = None) -> List[Dict]:
         """Apply realistic velocity curves"""
-        curve = self.CURVES.get(curve_type, self.CURVES['natural'])
+        np_rng = ensure_context(ctx).np_rng
         
+        if isinstance(events, EventBuffer):
+            if len(events):
+                events.velocity[:] = self.curve_velocities(events.time, curve_type, intensity, np_rng)
+            return events
+
         if not events:
             return []
-            
-        max_time = max((e['time'] for e in events), default=1)
-        if max_time == 0: max_time = 1
-        
-        for event in events:
-            t = event['time'] / max_time  # Normalized time 0-1
-            
-            # Calculate base velocity
-            try:
-                base_velocity = curve(t)
-            except Exception:
-                base_velocity = 90
-                
-            # Apply intensity scaling
-            final_velocity = int(base_velocity * intensity)
-            
-            # Constrain to valid MIDI range (0-127). Note-on usually > 0
-            final_velocity = max(1, min(127, final_velocity))
-            
-            event['velocity'] = final_velocity
+
+        velocities = self.curve_velocities(np.array([e['time'] for e in events], dtype=np.float64),
+                                           curve_type, intensity, np_rng)
+        for event, velocity in zip(events, velocities.tolist()):
+            event['velocity'] = velocity
             
         return events
 
+    def curve_velocities(self, times: np.ndarray, curve_type: str, intensity: float,
+                         np_rng: np.random.Generator) -> np.ndarray:
+        """Velocity for every event time: curve over normalized time, intensity, MIDI range."""
+        curve = self.CURVES.get(curve_type, self.CURVES['natural'])
+
+        max_time = float(times.max())
+        if max_time == 0: max_time = 1
+        t = times / max_time  # Normalized time 0-1
+
+        # Apply intensity scaling; int() truncation toward zero as before
+        final_velocity = np.trunc(curve(t, np_rng) * intensity)
+
+        # Constrain to valid MIDI range (0-127). Note-on usually > 0
+        return np.clip(final_velocity, 1, 127).astype(np.int64)
+
 class ArticulationEngine:
     """Add musical articulations"""
     
-    def add_articulations(self, notes: List[Dict], style: str) -> List[Dict]:
+    def add_articulations(self, notes: List[Dict], style: str,
+                          ctx: Optional[GenerationContext] = None) -> List[Dict]:
         """Add staccato, legato, accents"""
+        rng = ensure_context(ctx).rng
+        if isinstance(notes, EventBuffer):
+            return self._articulate_buffer(notes, style, rng)
+
         articulated = []
         
         for i, note in enumerate(notes):
@@ -60,7 +84,7 @@ class ArticulationEngine:
                     note['velocity'] = min(127, int(note.get('velocity', 90) * 1.2))
                     
             elif style == 'jazz':
-                if random.random() < 0.3:
+                if rng.random() < 0.3:
                     note['articulation'] = 'staccato'
                     note['duration'] = note.get('duration', 0.25) * 0.5
                     
@@ -74,6 +98,28 @@ class ArticulationEngine:
             
         return articulated
 
+    def _articulate_buffer(self, notes: EventBuffer, style: str, rng) -> EventBuffer:
+        n = len(notes)
+        if n == 0:
+            return notes
+
+        if style == 'classical' or style == 'cinematic':
+            accent = (np.arange(n) % 4) == 0
+            notes.flags[accent] |= FLAG_ACCENT
+            boosted = np.trunc(notes.velocity[accent] * 1.2)
+            notes.velocity[accent] = np.minimum(127, boosted)
+
+        elif style == 'jazz':
+            staccato = np.array([rng.random() < 0.3 for _ in range(n)], dtype=bool)
+            notes.flags[staccato] |= FLAG_STACCATO
+            notes.duration[staccato] //= 2
+
+        elif style in ['techno', 'house', 'electronic']:
+            punch = (notes.pitch == 36) | (notes.pitch == 38)
+            notes.flags[punch] |= FLAG_PUNCH
+
+        return notes
+
 class ProductionEngine:
     """Facade for production features"""
     def __init__(self):
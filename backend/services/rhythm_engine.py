@@ -1,5 +1,9 @@
-import random
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from .event_buffer import EventBuffer, FLAG_GHOST
+from .generation_context import GenerationContext, ensure_context
 
 class RhythmEngine:
     """Complex rhythm generation"""
@@ -40,7 +44,8 @@ class RhythmEngine:
         # Real implementation needs to merge intelligentely
         return base_rhythm
     
-    def add_ghost_notes(self, pattern: List[Dict], style: str) -> List[Dict]:
+    def add_ghost_notes(self, pattern: List[Dict], style: str,
+                        ctx: Optional[GenerationContext] = None) -> List[Dict]:
         """Add ghost notes for realism based on style"""
         # Tuned probabilities for better distinctness
         ghost_probability = {
@@ -55,6 +60,10 @@ class RhythmEngine:
             'house': 0.05
         }.get(style, 0.1)
         
+        rng = ensure_context(ctx).rng
+        if isinstance(pattern, EventBuffer):
+            return self._add_ghost_notes_buffer(pattern, ghost_probability, rng)
+
         enhanced = []
         for note in pattern:
             enhanced.append(note)
@@ -66,7 +75,7 @@ class RhythmEngine:
             if note.get('duration', 0) > 0.5:
                 continue
                 
-            if random.random() < ghost_probability:
+            if rng.random() < ghost_probability:
                 ghost_event = note.copy()
                 # Place ghost note slightly after main note (syncopated 1/16th)
                 ghost_event['time'] = note['time'] + 0.125 
@@ -77,3 +86,28 @@ class RhythmEngine:
                 enhanced.append(ghost_event)
                 
         return enhanced
+
+    def _add_ghost_notes_buffer(self, pattern: EventBuffer, ghost_probability: float, rng) -> EventBuffer:
+        """Buffer version of add_ghost_notes: each ghost row directly follows its source note."""
+        n = len(pattern)
+        if n == 0:
+            return pattern
+
+        # Long notes (melody/chords, over half a beat) never get a ghost note and do not consume a roll
+        eligible = np.flatnonzero(pattern.duration <= pattern.ppq // 2)
+        has_ghost = np.zeros(n, dtype=bool)
+        has_ghost[eligible] = [rng.random() < ghost_probability for _ in range(len(eligible))]
+        if not has_ghost.any():
+            return pattern
+
+        # Repeat every source row once, plus once more if it spawns a ghost
+        index = np.repeat(np.arange(n), 1 + has_ghost)
+        is_ghost = np.zeros(len(index), dtype=bool)
+        is_ghost[1:] = index[1:] == index[:-1]
+
+        pattern.reorder(index)
+        pattern.time[is_ghost] += pattern.ppq // 8  # syncopated 1/32 after the note
+        # Velocity reduced to 30% for subtlety (User Request)
+        pattern.velocity[is_ghost] = np.maximum(1, (pattern.velocity[is_ghost] * 0.3).astype(np.int16))
+        pattern.flags[is_ghost] |= FLAG_GHOST
+        return pattern
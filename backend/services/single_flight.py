@@ -0,0 +1,123 @@
+"""
+Single-flight coalescing of identical concurrent generation requests.
+
+The generation cache only helps once a result exists: when a preview is
+clicked repeatedly, or several clients ask for the same seeded pattern at
+the same moment, every one of them misses the cache and renders the same
+bytes on its own worker. SingleFlight keys in-flight work by the canonical
+request hash (services.generation_cache.canonical_request_key), so the first
+request (the leader) starts the computation and identical requests arriving
+before it finishes (followers) await that same computation and share its
+GenerationResult.
+
+Only seeded requests are coalesced: without a seed every call is meant to be
+new. The computation runs as its own task, so a leader whose client
+disconnects does not cancel it for the followers; a failure (including
+GenerationQueueFull) is raised to every waiter.
+
+    result = await cached_generation("generate_midi", generate_midi_task, params)
+"""
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.admission_control import STANDARD
+from services.generation_cache import canonical_request_key, generation_cache
+from services.generation_executor import GenerationResult, generation_executor
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """At most one in-flight computation per key; later callers await the first."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def key(self, task: str, params: Dict[str, Any]) -> Optional[str]:
+        """Coalescing key for a request, or None if it must run on its own (no seed)."""
+        if params.get('seed') is None:
+            return None
+        return canonical_request_key(task, params)
+
+    async def run(self, key: Optional[str], fn: Callable[[], Awaitable[Any]], task: str = 'generate') -> Any:
+        """Await `fn()`, or the identical computation already running under `key`."""
+        if key is None:
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+            metrics.counter("generation_singleflight_total", task=task, role="leader").inc()
+        else:
+            self.coalesced += 1
+            metrics.counter("generation_singleflight_total", task=task, role="coalesced").inc()
+        metrics.gauge("generation_singleflight_in_flight").set(len(self._calls))
+
+        # shield: a cancelled waiter must not cancel the computation for the others
+        return await asyncio.shield(call)
+
+    def _finish(self, key: str, call: asyncio.Task) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        metrics.gauge("generation_singleflight_in_flight").set(len(self._calls))
+        # Retrieve the exception so it is not reported as unhandled when every waiter left
+        if not call.cancelled() and call.exception() is not None:
+            logger.debug(f"Coalesced generation {key[:12]} failed: {call.exception()!r}")
+
+    def stats(self) -> Dict[str, int]:
+        return {'in_flight': self.in_flight, 'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+# Shared by all generation routes of this worker (one event loop)
+generation_flights = SingleFlight()
+
+
+async def cached_generation(task: str, fn: Callable[[Dict[str, Any]], GenerationResult],
+                            params: Dict[str, Any], priority: str = STANDARD) -> GenerationResult:
+    """
+    generation_cache lookup, then at most one executor run of `fn(params)` per
+    distinct seeded request in flight; the leader stores the result in the cache
+    before followers are released, so later repeats are cache hits. The run is
+    scheduled at the leader's `priority`. Cache disk I/O runs off the event loop.
+
+    A result this request did not generate itself (a cache hit, or a follower
+    of another request's run) comes back with cached=True and generation_ms set
+    to this request's own wall time, so history rows never carry the time of
+    an earlier generation.
+    """
+    started = time.perf_counter()
+    cache_key = generation_cache.key(task, params)
+    result = await generation_cache.get_async(cache_key)
+    if result is not None:
+        return _served(result, started)
+
+    led = False
+
+    async def generate() -> GenerationResult:
+        nonlocal led
+        led = True
+        result = await generation_executor.run(fn, params, priority=priority)
+        await generation_cache.put_async(cache_key, result)
+        return result
+
+    result = await generation_flights.run(generation_flights.key(task, params), generate, task=task)
+    return result if led else _served(result, started)
+
+
+def _served(result: GenerationResult, started: float) -> GenerationResult:
+    # A copy: the cached object is shared with other requests
+    return dataclasses.replace(result, cached=True,
+                               generation_ms=int(round((time.perf_counter() - started) * 1000)))
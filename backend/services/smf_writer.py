@@ -0,0 +1,281 @@
+"""
+Direct Standard MIDI File encoder.
+
+Writes SMF bytes straight from note columns (EventBuffer) without building one
+mido.Message per note-on/off. The output is byte-for-byte what mido's
+MidiFile.save() writes for the same messages: variable-length delta times,
+running status for channel messages (reset after meta events), and a single
+end_of_track meta event closing every track chunk.
+
+    body = tempo_event(mido.bpm2tempo(120)) + encode_channel_events(deltas, status, data1, data2)
+    data = encode_file([body], ticks_per_beat=480)
+
+It can also read such files back without mido (split_file + iter_events), for
+code that edits stored files (services.midi_splice), and stream long files to
+disk track by track (SmfStreamWriter).
+"""
+import io
+import shutil
+import struct
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, List, Sequence, Tuple
+
+import mido
+import numpy as np
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+META = 0xFF
+META_TRACK_NAME = 0x03
+META_MARKER = 0x06
+META_SET_TEMPO = 0x51
+META_END_OF_TRACK = 0x2F
+
+MAX_VLQ = 0x0FFFFFFF  # 4 bytes, the SMF limit for delta times
+END_OF_TRACK = bytes([0x00, META, META_END_OF_TRACK, 0x00])
+
+
+def encode_vlq(value: int) -> bytes:
+    """Variable-length quantity: 7 bits per byte, high bit set on all but the last."""
+    if value < 0 or value > MAX_VLQ:
+        raise ValueError(f"variable int must be in range 0..{MAX_VLQ}, got {value}")
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def tempo_event(tempo: int, delta: int = 0) -> bytes:
+    """set_tempo meta event (microseconds per quarter note)."""
+    return encode_vlq(delta) + bytes([META, META_SET_TEMPO, 0x03]) + tempo.to_bytes(3, 'big')
+
+
+def meta_message(meta_type: int, data: bytes) -> bytes:
+    """Meta event without its delta time (FF type length data)."""
+    return bytes([META, meta_type]) + encode_vlq(len(data)) + data
+
+
+def _check_range(name: str, values: np.ndarray, upper: int) -> None:
+    if len(values) and (values.min() < 0 or values.max() > upper):
+        raise ValueError(f"{name} must be in range 0..{upper}")
+
+
+def encode_channel_events(deltas: Sequence[int], status: Sequence[int],
+                          data1: Sequence[int], data2: Sequence[int], running_status: int = 0) -> bytes:
+    """
+    Encode 3-byte channel messages (note on/off, CC...) given column arrays of
+    delta ticks, status bytes (type | channel) and the two data bytes.
+
+    Encoding is done on whole columns: VLQ widths, running-status omission and
+    output offsets are computed with NumPy and scattered into one uint8 array.
+    `running_status` is the status byte of the channel message written just
+    before these (0: none, i.e. at the start of a track or after a meta event).
+    """
+    deltas = np.asarray(deltas, dtype=np.int64)
+    status = np.asarray(status, dtype=np.int64)
+    data1 = np.asarray(data1, dtype=np.int64)
+    data2 = np.asarray(data2, dtype=np.int64)
+    n = len(deltas)
+    if n == 0:
+        return b''
+
+    _check_range('delta time', deltas, MAX_VLQ)
+    _check_range('data byte', data1, 0x7F)
+    _check_range('data byte', data2, 0x7F)
+    if status.min() < 0x80 or status.max() > 0xEF:
+        raise ValueError("status byte must be a channel message (0x80..0xEF)")
+
+    vlq_len = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    send_status = np.ones(n, dtype=bool)
+    send_status[0] = status[0] != running_status
+    send_status[1:] = status[1:] != status[:-1]
+
+    sizes = vlq_len + send_status + 2
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+
+    # Delta time bytes, most significant group first
+    for k in range(4):
+        has_byte = vlq_len > k
+        if not has_byte.any():
+            break
+        shift = 7 * (vlq_len[has_byte] - 1 - k)
+        group = (deltas[has_byte] >> shift) & 0x7F
+        continuation = np.where(k < vlq_len[has_byte] - 1, 0x80, 0)
+        out[starts[has_byte] + k] = group | continuation
+
+    position = starts + vlq_len
+    out[position[send_status]] = status[send_status]
+    position = position + send_status
+    out[position] = data1
+    out[position + 1] = data2
+    return out.tobytes()
+
+
+def track_chunk(body: bytes) -> bytes:
+    """Wrap encoded events in an MTrk chunk, closing it with end_of_track."""
+    return b'MTrk' + struct.pack('>L', len(body) + len(END_OF_TRACK)) + body + END_OF_TRACK
+
+
+def header_chunk(midi_type: int, track_count: int, ticks_per_beat: int) -> bytes:
+    return b'MThd' + struct.pack('>L', 6) + struct.pack('>hhh', midi_type, track_count, ticks_per_beat)
+
+
+def encode_file(track_bodies: Iterable[bytes], ticks_per_beat: int = 480, midi_type: int = 1) -> bytes:
+    """Complete SMF from encoded track bodies (without end_of_track)."""
+    bodies = list(track_bodies)
+    chunks = [header_chunk(midi_type, len(bodies), ticks_per_beat)]
+    chunks.extend(track_chunk(body) for body in bodies)
+    return b''.join(chunks)
+
+
+class SmfStreamWriter:
+    """
+    Writes an SMF without holding it in memory.
+
+    Every track chunk streams into its own temporary file (kept in memory up to
+    `spool_bytes`, on disk beyond that) while it is being produced, so tracks
+    can be filled in any order, e.g. block by block across all tracks. close()
+    writes the header and every chunk, with its length patched in and
+    end_of_track appended, to `out`, copying in fixed-size pieces:
+
+        with SmfStreamWriter(out, ticks_per_beat=480) as writer:
+            drums, bass = writer.track(), writer.track()
+            drums.write(body_bytes)   # any number of times
+    """
+
+    def __init__(self, out: BinaryIO, ticks_per_beat: int = 480, midi_type: int = 1,
+                 spool_bytes: int = 256 * 1024):
+        self.out = out
+        self.ticks_per_beat = ticks_per_beat
+        self.midi_type = midi_type
+        self.spool_bytes = spool_bytes
+        self._chunks: List[tempfile.SpooledTemporaryFile] = []
+        self.bytes_written = 0
+
+    def track(self) -> BinaryIO:
+        """A new track chunk (in file order); write encoded events (no end_of_track) to it."""
+        chunk = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        self._chunks.append(chunk)
+        return chunk
+
+    def close(self) -> int:
+        """Write the file to `out`; returns the number of bytes written."""
+        try:
+            header = header_chunk(self.midi_type, len(self._chunks), self.ticks_per_beat)
+            self.out.write(header)
+            self.bytes_written = len(header)
+            for chunk in self._chunks:
+                size = chunk.tell()
+                self.out.write(b'MTrk' + struct.pack('>L', size + len(END_OF_TRACK)))
+                chunk.seek(0)
+                shutil.copyfileobj(chunk, self.out)
+                self.out.write(END_OF_TRACK)
+                self.bytes_written += 8 + size + len(END_OF_TRACK)
+            return self.bytes_written
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        for chunk in self._chunks:
+            chunk.close()
+        self._chunks = []
+
+    def __enter__(self) -> 'SmfStreamWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def track_count(data: bytes) -> int:
+    """Number of tracks declared in an SMF header."""
+    return struct.unpack('>h', data[10:12])[0]
+
+
+def midi_file_bytes(midi: mido.MidiFile) -> bytes:
+    """Serialize a mido.MidiFile (paths that still build mido objects)."""
+    buffer = io.BytesIO()
+    midi.save(file=buffer)
+    return buffer.getvalue()
+
+
+def read_midi_file(data: bytes) -> mido.MidiFile:
+    """Parse .mid bytes (e.g. a stored generation) into a mido.MidiFile."""
+    return mido.MidiFile(file=io.BytesIO(data))
+
+
+# --- Reading ------------------------------------------------------------------
+
+def read_vlq(data: bytes, position: int) -> Tuple[int, int]:
+    """Decode a variable-length quantity at `position`: (value, next position)."""
+    value = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, position
+
+
+def split_file(data: bytes) -> Tuple[int, int, List[bytes]]:
+    """
+    (midi_type, ticks_per_beat, track bodies) of an SMF. A closing end_of_track
+    at delta 0 is cut off, so the bodies can go back through encode_file as is.
+    """
+    if data[:4] != b'MThd':
+        raise ValueError("Not a Standard MIDI File (missing MThd)")
+    header_size = struct.unpack('>L', data[4:8])[0]
+    midi_type, n_tracks, ticks_per_beat = struct.unpack('>hhh', data[8:14])
+    position = 8 + header_size
+    bodies = []
+    while len(bodies) < n_tracks and position < len(data):
+        chunk_type = data[position:position + 4]
+        size = struct.unpack('>L', data[position + 4:position + 8])[0]
+        if chunk_type == b'MTrk':
+            body = data[position + 8:position + 8 + size]
+            bodies.append(body[:-len(END_OF_TRACK)] if body.endswith(END_OF_TRACK) else body)
+        position += 8 + size
+    return midi_type, ticks_per_beat, bodies
+
+
+def iter_events(body: bytes) -> Iterator[Tuple[int, bytes]]:
+    """
+    (absolute tick, message bytes) for every event of a track body, with
+    running status expanded: channel messages are status + data bytes, meta
+    and sysex events are returned whole (FF type len data / F0 len data).
+    """
+    tick = 0
+    position = 0
+    status = 0
+    size = len(body)
+    while position < size:
+        delta, position = read_vlq(body, position)
+        tick += delta
+        if body[position] & 0x80:
+            status = body[position]
+            position += 1
+        elif status < 0x80:
+            raise ValueError("Running status without a previous status byte")
+        start = position - 1
+
+        if status == META:
+            length, data_start = read_vlq(body, position + 1)
+            position = data_start + length
+            yield tick, body[start:position]
+            status = 0  # meta events cancel running status
+        elif status in (0xF0, 0xF7):
+            length, data_start = read_vlq(body, position)
+            position = data_start + length
+            yield tick, body[start:position]
+            status = 0
+        else:
+            n_data = 1 if status & 0xF0 in (0xC0, 0xD0) else 2
+            yield tick, bytes([status]) + body[position:position + n_data]
+            position += n_data
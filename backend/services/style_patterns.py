@@ -1,6 +1,47 @@
 from typing import Dict, List, Optional
 import random
 
+# Per-style tempo / swing / energy (compiled with PATTERNS into services.style_tables)
+MUSIC_STYLES = {
+    # ELECTRONIC
+    'techno': {'bpm': 130, 'swing': 0.1, 'energy': 'driving'},
+    'house': {'bpm': 125, 'swing': 0.15, 'energy': 'groovy'},
+    'deep_house': {'bpm': 120, 'swing': 0.2, 'energy': 'smooth'},
+    'trap': {'bpm': 140, 'swing': 0.05, 'energy': 'aggressive'},
+    'dnb': {'bpm': 174, 'swing': 0.1, 'energy': 'fast'},
+    'dubstep': {'bpm': 140, 'swing': 0.0, 'energy': 'heavy'},
+    'ambient': {'bpm': 80, 'swing': 0.0, 'energy': 'atmospheric'},
+    
+    # POPULAR/MAINSTREAM
+    'pop': {'bpm': 120, 'swing': 0.1, 'energy': 'bright'},
+    'rock': {'bpm': 120, 'swing': 0.05, 'energy': 'powerful'}, 
+    'indie': {'bpm': 110, 'swing': 0.1, 'energy': 'alternative'},
+    'funk': {'bpm': 110, 'swing': 0.25, 'energy': 'groovy'},
+    'disco': {'bpm': 120, 'swing': 0.15, 'energy': 'danceable'},
+    
+    # URBAN/HIP-HOP
+    'hip_hop': {'bpm': 90, 'swing': 0.2, 'energy': 'laid-back'},
+    'boom_bap': {'bpm': 90, 'swing': 0.15, 'energy': 'classic'},
+    'lofi': {'bpm': 85, 'swing': 0.3, 'energy': 'chill'},
+    'rnb': {'bpm': 95, 'swing': 0.25, 'energy': 'smooth'},
+    
+    # JAZZ/SOUL
+    'jazz': {'bpm': 120, 'swing': 0.35, 'energy': 'sophisticated'}, # Updated per request
+    'soul': {'bpm': 100, 'swing': 0.2, 'energy': 'emotional'},
+    'gospel': {'bpm': 110, 'swing': 0.15, 'energy': 'uplifting'},
+    
+    # LATIN/WORLD
+    'reggaeton': {'bpm': 95, 'swing': 0.0, 'energy': 'rhythmic'},
+    'latin': {'bpm': 100, 'swing': 0.1, 'energy': 'tropical'},
+    'afrobeat': {'bpm': 120, 'swing': 0.2, 'energy': 'percussive'},
+    
+    # HARD
+    'metal': {'bpm': 140, 'swing': 0.0, 'energy': 'aggressive'},
+    'punk': {'bpm': 180, 'swing': 0.0, 'energy': 'raw'},
+    'cinematic': {'bpm': 70, 'swing': 0.0, 'energy': 'atmospheric'}
+}
+
+
 class StylePatterns:
     """
     Central repository for musical style patterns and definitions.
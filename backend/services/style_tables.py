@@ -0,0 +1,136 @@
+"""
+Style tables compiled once at import time.
+
+StylePatterns.PATTERNS and MUSIC_STYLES are nested dicts of Python lists; looking
+them up per component, per request (with get_pattern's string fallbacks) is slow
+and cannot feed array code. This module turns them into dense NumPy arrays
+indexed by integer style / voice codes:
+
+    PATTERNS[style, voice]  uint8 (styles x voices x 16) step grid, get_pattern()
+                            fallbacks already resolved (last voice row = silence)
+    SWING / BPM / ENERGY    per-style metadata from MUSIC_STYLES (parallel arrays)
+
+    code = pattern_style_code('techno')
+    grid = PATTERNS[code, voice_code('kick')]        # same as StylePatterns.get_pattern
+
+All arrays are read-only; names map to codes through memoized lookups.
+"""
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+from services.style_patterns import MUSIC_STYLES, StylePatterns
+
+STEPS_PER_BAR = 16
+FALLBACK_STYLE = 'techno'
+
+# --- Codes --------------------------------------------------------------------
+
+STYLES: Tuple[str, ...] = tuple(dict.fromkeys(list(StylePatterns.PATTERNS) + list(MUSIC_STYLES)))
+STYLE_INDEX: Dict[str, int] = {name: code for code, name in enumerate(STYLES)}
+
+VOICES: Tuple[str, ...] = tuple(dict.fromkeys(
+    voice for style_data in StylePatterns.PATTERNS.values() for voice in style_data
+))
+VOICE_INDEX: Dict[str, int] = {name: code for code, name in enumerate(VOICES)}
+SILENT = len(VOICES)  # extra all-zero row for instruments without any pattern
+
+ENERGY_NAMES: Tuple[str, ...] = ('',) + tuple(sorted({meta.get('energy', '') for meta in MUSIC_STYLES.values()} - {''}))
+_ENERGY_INDEX = {name: code for code, name in enumerate(ENERGY_NAMES)}
+
+
+# --- Compile ------------------------------------------------------------------
+
+def _compile():
+    patterns = np.zeros((len(STYLES), len(VOICES) + 1, STEPS_PER_BAR), dtype=np.uint8)
+    explicit = np.zeros((len(STYLES), len(VOICES)), dtype=bool)
+    swing = np.zeros(len(STYLES), dtype=np.float64)
+    bpm = np.zeros(len(STYLES), dtype=np.int16)
+    energy = np.zeros(len(STYLES), dtype=np.uint8)
+
+    for s, style in enumerate(STYLES):
+        style_data = StylePatterns.PATTERNS.get(style, {})
+        for v, voice in enumerate(VOICES):
+            # get_pattern() is the source of truth, fallbacks included
+            patterns[s, v] = StylePatterns.get_pattern(style, voice)
+            explicit[s, v] = voice in style_data
+
+        meta = MUSIC_STYLES.get(style, StylePatterns.get_style_metadata(style))
+        swing[s] = meta.get('swing', 0.0)
+        bpm[s] = meta.get('bpm', 120)
+        energy[s] = _ENERGY_INDEX.get(meta.get('energy', ''), 0)
+
+    has_patterns = np.array([style in StylePatterns.PATTERNS for style in STYLES], dtype=bool)
+    in_music_styles = np.array([style in MUSIC_STYLES for style in STYLES], dtype=bool)
+
+    tables = (patterns, explicit, has_patterns, in_music_styles, swing, bpm, energy)
+    for table in tables:
+        table.setflags(write=False)
+    return tables
+
+
+PATTERNS, EXPLICIT, HAS_PATTERNS, IN_MUSIC_STYLES, SWING, BPM, ENERGY = _compile()
+
+
+# --- Lookups --------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def style_code(style: str) -> int:
+    """Exact (case-sensitive, like MUSIC_STYLES.get) style code, -1 if unknown."""
+    return STYLE_INDEX.get(style, -1)
+
+
+@lru_cache(maxsize=None)
+def pattern_style_code(style: str) -> int:
+    """Style code for pattern lookups: lower-cased, unknown styles fall back to techno."""
+    key = style.lower()
+    return STYLE_INDEX[key] if key in StylePatterns.PATTERNS else STYLE_INDEX[FALLBACK_STYLE]
+
+
+@lru_cache(maxsize=None)
+def voice_code(instrument: str) -> int:
+    """
+    Row of PATTERNS for an instrument name. Known voices map directly; other
+    names follow get_pattern()'s substring fallbacks (e.g. 'hihat' -> hat,
+    'clap' -> snare); anything else is SILENT.
+    """
+    if instrument in VOICE_INDEX:
+        return VOICE_INDEX[instrument]
+    name = instrument.lower()
+    if 'kick' in name:
+        return VOICE_INDEX['kick']
+    if 'snare' in name or 'clap' in name:
+        return VOICE_INDEX['snare']
+    if 'hat' in name or 'hh' in name:
+        return VOICE_INDEX['hat']
+    if 'ride' in name:
+        return VOICE_INDEX['ride']
+    return SILENT
+
+
+def pattern(style: str, instrument: str) -> np.ndarray:
+    """Read-only 16-step grid; equals StylePatterns.get_pattern(style, instrument)."""
+    return PATTERNS[pattern_style_code(style), voice_code(instrument)]
+
+
+def has_patterns(style: str) -> bool:
+    """Same as `style in StylePatterns.PATTERNS`."""
+    code = style_code(style)
+    return code >= 0 and bool(HAS_PATTERNS[code])
+
+
+def style_swing(style: str, default: float = 0.0) -> float:
+    """MUSIC_STYLES[style]['swing'], or `default` for styles not in MUSIC_STYLES."""
+    code = style_code(style)
+    return float(SWING[code]) if code >= 0 and IN_MUSIC_STYLES[code] else default
+
+
+def style_bpm(style: str, default: int = 120) -> int:
+    code = style_code(style)
+    return int(BPM[code]) if code >= 0 else default
+
+
+def style_energy(style: str) -> str:
+    code = style_code(style)
+    return ENERGY_NAMES[ENERGY[code]] if code >= 0 else ''
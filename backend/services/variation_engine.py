@@ -36,8 +36,8 @@ class VariationEngine:
         Args:
             seed: Random seed for reproducible variations
         """
-        if seed is not None:
-            random.seed(seed)
+        # Own Random instance: seeding must not touch the process-global RNG
+        self.rng = random.Random(seed)
 
     def generate_variation(
         self,
@@ -111,9 +111,9 @@ class VariationEngine:
             )
 
         # Bars: Rarely change, and only for moderate/extreme
-        if strategy in ['moderate', 'extreme'] and random.random() < 0.3:
+        if strategy in ['moderate', 'extreme'] and self.rng.random() < 0.3:
             # Occasionally double or halve bars
-            if original.bars >= 4 and random.random() < 0.5:
+            if original.bars >= 4 and self.rng.random() < 0.5:
                 deltas['bars'] = -original.bars // 2  # Halve
             elif original.bars < 8:
                 deltas['bars'] = original.bars  # Double
@@ -211,10 +211,10 @@ class VariationEngine:
             Delta value (can be positive or negative)
         """
         # Random magnitude within range
-        magnitude = random.uniform(min_change, max_change)
+        magnitude = self.rng.uniform(min_change, max_change)
 
         # Random direction (positive or negative)
-        direction = random.choice([-1, 1])
+        direction = self.rng.choice([-1, 1])
 
         delta = magnitude * direction
 
@@ -0,0 +1,201 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.admission_control import (
+    BATCH, INTERACTIVE, STANDARD, AdmissionController, AdmissionTimeout, GenerationQueueFull
+)
+from services.generation_executor import GenerationExecutor, generate_arrangement_task, generate_midi_task
+from utils.metrics import metrics
+
+_release = threading.Event()
+
+
+def _blocking_task(value):
+    _release.wait(timeout=10)
+    return value
+
+
+def test_queue_is_bounded_in_size_and_time():
+    controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=0.05)
+    timeouts = metrics.counter("generation_admission_timeouts_total", task="admission_test")
+    rejected = metrics.counter("generation_rejected_total", task="admission_test")
+    before = timeouts.value, rejected.value
+
+    async def scenario():
+        await controller.acquire("admission_test")
+        queued = [asyncio.ensure_future(controller.acquire("admission_test")) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert (controller.in_flight, controller.waiting) == (1, 2)
+        assert metrics.gauge("generation_queue_depth").value == 2
+
+        # Queue full: refused at once, no waiting
+        started = time.perf_counter()
+        try:
+            await controller.acquire("admission_test")
+            raise AssertionError("fourth request should have been rejected")
+        except GenerationQueueFull as e:
+            assert not isinstance(e, AdmissionTimeout) and e.retry_after >= 1
+        assert time.perf_counter() - started < 0.01
+
+        # Queued requests give up after the timeout (still a GenerationQueueFull -> 503)
+        outcomes = await asyncio.gather(*queued, return_exceptions=True)
+        assert all(isinstance(outcome, AdmissionTimeout) for outcome in outcomes)
+        assert (controller.in_flight, controller.waiting) == (1, 0)
+        controller.release()
+        assert controller.pending == 0
+
+    asyncio.run(scenario())
+    assert timeouts.value == before[0] + 2 and rejected.value == before[1] + 3
+    print("✅ bounded wait queue: full -> immediate rejection, waited too long -> timeout")
+
+
+def test_slots_handed_over_in_order():
+    controller = AdmissionController(max_in_flight=2, max_queue=8, queue_timeout=None)
+    order = []
+
+    async def request(name, hold):
+        await controller.acquire("admission_test")
+        order.append(name)
+        assert controller.in_flight <= 2
+        await asyncio.sleep(hold)
+        controller.release(run_seconds=hold)
+
+    async def scenario():
+        first = [asyncio.ensure_future(request(name, 0.02)) for name in "ab"]
+        await asyncio.sleep(0)
+        queued = [asyncio.ensure_future(request(name, 0.0)) for name in "cdef"]
+        await asyncio.sleep(0)
+        # A cancelled waiter leaves the queue without taking a slot
+        queued[1].cancel()
+        await asyncio.gather(*first, *queued, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert order == list("abcef") and controller.pending == 0
+    print("✅ FIFO slot hand-over, cancelled waiters skipped")
+
+
+def test_executor_releases_slots_from_workers():
+    executor = GenerationExecutor(kind='thread', workers=1, queue_size=4, queue_timeout=5)
+
+    async def scenario():
+        _release.clear()
+        runs = [asyncio.ensure_future(executor.run(_blocking_task, i, task="blocking")) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert (executor.admission.in_flight, executor.admission.waiting) == (1, 2)
+        _release.set()
+        return await asyncio.gather(*runs)
+
+    try:
+        assert asyncio.run(scenario()) == [0, 1, 2]
+    finally:
+        _release.set()
+        executor.shutdown()
+    assert executor.pending == 0
+    print("✅ executor admits one generation per slot, queued ones run as slots free up")
+
+
+def test_weighted_fair_sharing():
+    controller = AdmissionController(max_in_flight=1, max_queue=64, queue_timeout=None, interactive_reserve=0,
+                                     class_limits={BATCH: 1})
+    order = []
+
+    async def request(priority):
+        await controller.acquire("admission_test", priority)
+        order.append(priority)
+        await asyncio.sleep(0)
+        controller.release(priority)
+
+    async def scenario():
+        await controller.acquire("admission_test", STANDARD)
+        queued = [asyncio.ensure_future(request(priority)) for priority in (BATCH, STANDARD, INTERACTIVE)
+                  for _ in range(13)]
+        await asyncio.sleep(0)
+        assert controller.waiting == 39
+        controller.release(STANDARD)
+        await asyncio.gather(*queued)
+
+    asyncio.run(scenario())
+    # Contended slots split 8:4:1, so batch work still moves under a stream of previews
+    first_round = [STANDARD] + order[:12]  # the slot holder was the first standard grant
+    assert [first_round.count(p) for p in (INTERACTIVE, STANDARD, BATCH)] == [8, 4, 1], first_round
+    assert order[-1] == BATCH and controller.pending == 0
+    print("✅ slots shared 8:4:1 between interactive, standard and batch")
+
+
+def test_class_limits_and_interactive_reserve():
+    controller = AdmissionController(max_in_flight=2, max_queue=8, queue_timeout=None)
+
+    async def scenario():
+        batch = [asyncio.ensure_future(controller.acquire("admission_test", BATCH)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert controller.stats()[BATCH] == dict(weight=1.0, max_in_flight=1, in_flight=1, waiting=1)
+
+        # Batch is capped at half the slots: standard work still gets one
+        await controller.acquire("admission_test", STANDARD)
+        # Every shared slot is busy, a preview still starts at once on the reserved slot
+        await controller.acquire("admission_test", INTERACTIVE)
+        assert controller.in_flight == 3 and controller.waiting == 1
+        second = asyncio.ensure_future(controller.acquire("admission_test", INTERACTIVE))
+        await asyncio.sleep(0)
+        assert controller.stats()[INTERACTIVE]['waiting'] == 1
+
+        # A freed batch slot goes to the waiting preview before the next batch job
+        controller.release(BATCH)
+        await asyncio.wait_for(second, 1)
+        assert controller.stats()[BATCH]['waiting'] == 1
+        controller.release(INTERACTIVE)
+        await asyncio.wait_for(asyncio.gather(*batch), 1)
+        for priority in (BATCH, STANDARD, INTERACTIVE):
+            controller.release(priority)
+
+    asyncio.run(scenario())
+    assert controller.pending == 0
+    try:
+        controller.release("export")
+        raise AssertionError("unknown class accepted")
+    except KeyError:
+        pass
+    print("✅ per-class caps, reserved interactive slot")
+
+
+def test_previews_not_stuck_behind_arrangements():
+    executor = GenerationExecutor(kind='thread', workers=1, queue_size=8)
+    executor.start()
+    structure = [{'type': f"verse_{i}", 'bars': 8} for i in range(16)]
+    preview = dict(description="techno kick", style="techno", instrument="kick", bars=1, seed=3)
+
+    async def scenario():
+        finished = []
+
+        async def track(name, coro):
+            await coro
+            finished.append(name)
+
+        arrangements = [track(f"arrangement {i}", executor.run(generate_arrangement_task, dict(
+            structure=structure, style='techno', seed=i), priority=BATCH)) for i in range(2)]
+        jobs = [asyncio.ensure_future(job) for job in arrangements]
+        await asyncio.sleep(0.01)
+        await track("preview", executor.run(generate_midi_task, preview, priority=INTERACTIVE))
+        await asyncio.gather(*jobs)
+        return finished
+
+    try:
+        assert asyncio.run(scenario())[0] == "preview"
+    finally:
+        executor.shutdown()
+    assert executor.pool_size == 2
+    print("✅ interactive preview finishes while arrangements are still rendering")
+
+
+if __name__ == "__main__":
+    test_queue_is_bounded_in_size_and_time()
+    test_slots_handed_over_in_order()
+    test_executor_releases_slots_from_workers()
+    test_weighted_fair_sharing()
+    test_class_limits_and_interactive_reserve()
+    test_previews_not_stuck_behind_arrangements()
@@ -0,0 +1,98 @@
+import sys
+import os
+import io
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.arrangement_service import ArrangementService
+from services.generation_executor import generate_arrangement_task
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from utils.metrics import metrics
+
+STRUCTURE = [
+    {'type': 'intro', 'bars': 4, 'intensity': 'low'},
+    {'type': 'verse', 'bars': 4},
+    {'type': 'chorus', 'bars': 4, 'intensity': 'high'},
+    {'type': 'verse', 'bars': 4},
+    {'type': 'chorus', 'bars': 4, 'intensity': 'high'},
+]
+
+
+def _cells(source):
+    return metrics.counter("arrangement_cells_total", source=source).value
+
+
+def test_repeated_sections_render_once():
+    metrics.reset()
+    service = ArrangementService(IntegratedMidiGenerator(), cache_size=0)
+    data = service.generate_arrangement(STRUCTURE, 'techno', seed=11, output='bytes')
+    # 3 distinct sections x 4 tracks rendered, the repeats reuse them
+    assert _cells('rendered') == 12 and _cells('deduplicated') == 8
+
+    # A repeat with its own seed (e.g. regenerated on its own) is rendered separately
+    structure = [dict(block) for block in STRUCTURE]
+    structure[3]['seed'] = 5
+    assert service.generate_arrangement(structure, 'techno', seed=11, output='bytes') != data
+    assert _cells('rendered') == 12 + 16
+    print("✅ repeated sections rendered once")
+
+
+def test_pool_output_is_deterministic():
+    generator = IntegratedMidiGenerator()
+    inline = ArrangementService(generator).generate_arrangement(STRUCTURE, 'house', seed=4, output='bytes')
+    # Threads by default: the service already runs inside a generation executor worker
+    pooled = ArrangementService(generator, workers=3)
+    assert pooled.kind == 'thread'
+    if "ARRANGEMENT_EXECUTOR" not in os.environ:
+        assert ArrangementService.from_env(generator).kind == 'thread'
+    try:
+        assert pooled.generate_arrangement(STRUCTURE, 'house', seed=4, output='bytes') == inline
+    finally:
+        pooled.shutdown()
+    print("✅ pooled rendering matches inline rendering")
+
+
+def test_cell_cache():
+    metrics.reset()
+    service = ArrangementService(IntegratedMidiGenerator())
+    first = service.generate_arrangement(STRUCTURE, 'techno', seed=2, output='bytes')
+    assert service.generate_arrangement(STRUCTURE, 'techno', seed=2, output='bytes') == first
+    assert _cells('cached') == 12 and _cells('rendered') == 12
+    print("✅ cells cached across arrangements")
+
+
+def test_streamed_arrangement():
+    service = ArrangementService(IntegratedMidiGenerator(), spool_bytes=1024)
+    out = io.BytesIO()
+    written = service.write_arrangement(out, STRUCTURE, 'techno', seed=8)
+    assert written == len(out.getvalue())
+    assert out.getvalue() == service.generate_arrangement(STRUCTURE, 'techno', seed=8, output='bytes')
+
+    # The task streams straight to the destination file
+    params = dict(structure=STRUCTURE, style='techno', seed=8)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'song.mid')
+        result = generate_arrangement_task(params, path)
+        with open(path, 'rb') as f:
+            stored = f.read()
+        assert stored == generate_arrangement_task(params).midi_bytes
+
+        # A failed render leaves the stored arrangement (and no temporary file) behind
+        try:
+            generate_arrangement_task(dict(params, style=None), path)
+            assert False, "render without a style succeeded"
+        except Exception:
+            pass
+        with open(path, 'rb') as f:
+            assert f.read() == stored
+        assert os.listdir(tmp) == ['song.mid']
+    assert result.midi_bytes == b'' and result.track_count == 4 and result.seed == 8
+    print("✅ arrangement streamed to a file")
+
+
+if __name__ == "__main__":
+    test_repeated_sections_render_once()
+    test_pool_output_is_deterministic()
+    test_cell_cache()
+    test_streamed_arrangement()
@@ -0,0 +1,37 @@
+import sys
+import os
+import copy
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from benchmarks.bench_suite import compare, run_suite
+
+
+def test_suite_and_compare():
+    result = run_suite(['techno'], ['drums', 'bass'], ['intro', 'drop'], [4], repeat=2, progress=False)
+    assert len(result['cases']) == 4 and not result['errors']
+    case = result['cases']['techno/drums/drop/4']
+    assert case['events'] > 0 and case['peak_kb'] > 0 and 'encode' in case['stages_ms']
+    assert result['summary']['by_instrument'].keys() == {'drums', 'bass'}
+
+    report = compare(result, result)
+    assert report['same_config'] and not report['regressions'] and not report['improvements']
+
+    # Baseline twice as fast -> every case and aggregate regressed on latency
+    baseline = copy.deepcopy(result)
+    for stats in [*baseline['cases'].values(), baseline['summary']['overall']]:
+        stats['p50_ms'] /= 2
+    report = compare(baseline, result, threshold=0.15, min_delta_ms=0.0)
+    names = {r['name'] for r in report['regressions']}
+    assert set(result['cases']) | {'overall'} <= names
+    assert all(r['metrics'] == ['p50_ms'] for r in report['regressions'])
+
+    # Different sweep: only the common cases are compared
+    subset = run_suite(['techno'], ['drums'], ['intro'], [4], repeat=1, progress=False)
+    report = compare(result, subset)
+    assert not report['same_config'] and report['compared'] == 1 and len(report['missing']) == 3
+    print("✅ benchmark suite JSON + compare mode")
+
+
+if __name__ == "__main__":
+    test_suite_and_compare()
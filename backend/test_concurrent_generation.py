@@ -0,0 +1,77 @@
+import sys
+import os
+import io
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.integrated_midi_generator import IntegratedMidiGenerator
+
+logging.basicConfig(level=logging.ERROR)
+
+# (instrument, extra kwargs) - covers drums, melodic, chords, arp and the basic generator
+CASES = [
+    ('drums', {'style': 'techno'}),
+    ('hat', {'style': 'jazz'}),
+    ('bass', {'style': 'house'}),
+    ('lead', {'style': 'trap', 'complexity': 0.9}),
+    ('pad', {'style': 'lofi', 'sub_option': 'chords'}),
+    ('synth', {'style': 'techno', 'sub_option': 'arp'}),
+    ('drums', {'style': 'jazz', 'sub_option': 'chorus'}),
+    ('kick', {'style': 'techno', 'use_dna': False}),
+]
+SEEDS = [1, 7, 42, 1234]
+THREADS = 8
+ROUNDS = 3
+
+
+def render(generator, instrument, kwargs, seed):
+    midi, used_seed = generator.generate(description="stress test", instrument=instrument,
+                                         bars=8, seed=seed, humanize=True, **kwargs)
+    assert used_seed == seed
+    buffer = io.BytesIO()
+    midi.save(file=buffer)
+    return buffer.getvalue()
+
+
+def test_concurrent_generation_matches_single_threaded():
+    generator = IntegratedMidiGenerator()
+    jobs = [(instrument, kwargs, seed) for instrument, kwargs in CASES for seed in SEEDS]
+
+    # Reference: one job at a time
+    expected = {i: render(generator, *job) for i, job in enumerate(jobs)}
+
+    # Force frequent thread switches so engine calls interleave as much as possible
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for round_idx in range(ROUNDS):
+            order = list(expected)
+            random.Random(round_idx).shuffle(order)
+            with ThreadPoolExecutor(max_workers=THREADS) as pool:
+                # One shared generator instance, like the API routers use
+                results = dict(zip(order, pool.map(lambda i: render(generator, *jobs[i]), order)))
+            for i, data in results.items():
+                assert data == expected[i], f"round {round_idx}: {jobs[i]} differs from single-threaded output"
+    finally:
+        sys.setswitchinterval(old_interval)
+
+    print(f"✅ {len(jobs) * ROUNDS} concurrent generations matched single-threaded output")
+
+
+def test_global_random_state_is_untouched():
+    generator = IntegratedMidiGenerator()
+    random.seed(99)
+    expected = [random.random() for _ in range(3)]
+
+    random.seed(99)
+    generator.generate(description="techno", instrument='drums', bars=4, seed=5)
+    assert [random.random() for _ in range(3)] == expected
+    print("✅ generation does not consume or reseed the global RNG")
+
+
+if __name__ == "__main__":
+    test_concurrent_generation_matches_single_threaded()
+    test_global_random_state_is_untouched()
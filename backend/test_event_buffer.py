@@ -0,0 +1,85 @@
+import sys
+import os
+import io
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.event_buffer import EventBuffer, NO_PITCH, FLAG_GHOST, check_ppq, instrument_code
+from services.integrated_midi_generator import IntegratedMidiGenerator
+
+
+def test_dict_round_trip():
+    events = [
+        {'time': 0.0, 'duration': 0.25, 'velocity': 100, 'pitch': 36, 'channel': 9, 'instrument_type': 'kick'},
+        {'time': 0.5, 'duration': 0.125, 'velocity': 30, 'pitch': 38, 'channel': 9, 'type': 'ghost'},
+        {'time': 1.0, 'duration': 1.0, 'velocity': 80, 'channel': 0, 'articulation': 'accent'},
+    ]
+    buf = EventBuffer.from_dicts(events)
+    assert len(buf) == 3
+    assert buf.pitch[2] == NO_PITCH
+    assert buf.has_flag(FLAG_GHOST).tolist() == [False, True, False]
+
+    # Beats in, integer ticks inside, beats out
+    assert buf.time.tolist() == [0, 240, 480] and buf.duration.tolist() == [120, 60, 480]
+    assert EventBuffer.from_dicts(events, ppq=96).time.tolist() == [0, 48, 96]
+    back = buf.to_dicts()
+    assert [e['time'] for e in back] == [0.0, 0.5, 1.0]
+    assert back[0]['instrument_type'] == 'kick'
+    assert back[1]['type'] == 'ghost'
+    assert back[2]['articulation'] == 'accent'
+    assert 'pitch' not in back[2]
+    print("✅ dict round trip")
+
+
+def test_row_operations():
+    buf = EventBuffer.from_columns(time=[480, 0, 240], velocity=[10, 20, 30],
+                                   instrument=instrument_code('snare'))
+    buf.sort_by_time()
+    assert buf.time.tolist() == [0, 240, 480]
+    assert buf.velocity.tolist() == [20, 30, 10]
+
+    shifted = buf.shifted(1920)
+    assert shifted.time.tolist() == [1920, 2160, 2400]
+    assert buf.time.tolist() == [0, 240, 480]  # original untouched
+
+    joined = EventBuffer.concatenate([buf, shifted])
+    assert len(joined) == 6 and joined.ppq == 480
+    joined.keep(joined.velocity > 15)
+    assert len(joined) == 4 and joined.take(joined.velocity > 25).ppq == 480
+    print("✅ row operations")
+
+
+def test_tick_resolution_checks():
+    for bad in [lambda: EventBuffer.from_columns(time=[0.5]),  # beats where ticks are expected
+                lambda: EventBuffer.concatenate([EventBuffer(1), EventBuffer(1, ppq=960)]),
+                lambda: check_ppq(100), lambda: check_ppq(0), lambda: check_ppq(40000)]:
+        try:
+            bad()
+            assert False, "accepted"
+        except ValueError:
+            pass
+    assert check_ppq(96) == 96 and check_ppq(960) == 960
+    assert EventBuffer.from_columns(time=[1.0, 2.0]).time.dtype.kind == 'i'  # whole numbers are fine
+    print("✅ ticks and PPQ are validated")
+
+
+def test_generation_is_deterministic():
+    gen = IntegratedMidiGenerator()
+    for instrument in ['kick', 'drums', 'bass', 'lead', 'pad']:
+        outputs = []
+        for _ in range(2):
+            midi, seed = gen.generate(description="dark techno", instrument=instrument, bars=4, seed=42)
+            buffer = io.BytesIO()
+            midi.save(file=buffer)
+            outputs.append(buffer.getvalue())
+        assert outputs[0] == outputs[1], f"{instrument} output differs for the same seed"
+        notes = [m for m in midi.tracks[0] if m.type == 'note_on']
+        assert notes, f"{instrument} produced no notes"
+    print("✅ deterministic buffer pipeline")
+
+
+if __name__ == "__main__":
+    test_dict_round_trip()
+    test_row_operations()
+    test_tick_resolution_checks()
+    test_generation_is_deterministic()
@@ -0,0 +1,141 @@
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+from dataclasses import asdict
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.generation_cache import GenerationCache, canonical_request_key
+from services.generation_executor import GenerationExecutor, GenerationResult, generate_midi_task
+from utils.metrics import metrics
+
+PARAMS = dict(description="techno kick", style="techno", instrument="kick", bars=2, seed=7)
+
+
+def _result(payload: bytes, seed=7) -> GenerationResult:
+    return GenerationResult(midi_bytes=payload, seed=seed, track_count=1)
+
+
+def test_canonical_key():
+    reordered = dict(reversed(list(PARAMS.items())))
+    assert canonical_request_key("generate_midi", PARAMS) == canonical_request_key("generate_midi", reordered)
+    assert canonical_request_key("generate_midi", PARAMS) != canonical_request_key("generate_midi", dict(PARAMS, seed=8))
+    assert canonical_request_key("generate_midi", PARAMS) != canonical_request_key("generate_arrangement", PARAMS)
+
+    cache = GenerationCache(cache_dir=None)
+    assert cache.key("generate_midi", dict(PARAMS, seed=None)) is None
+    assert cache.get(None) is None
+    print("✅ canonical request key (order independent, unseeded requests bypass)")
+
+
+def test_memory_and_disk_tiers():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GenerationCache(cache_dir=tmp)
+        key = cache.key("generate_midi", PARAMS)
+        assert cache.get(key) is None
+
+        cache.put(key, _result(b"MThd-pattern"))
+        assert cache.get(key).midi_bytes == b"MThd-pattern"
+
+        # Fresh process: memory tier empty, disk tier still has it
+        restarted = GenerationCache(cache_dir=tmp)
+        disk_hits = metrics.counter("generation_cache_hits_total", tier="disk")
+        before = disk_hits.value
+        hit = restarted.get(key)
+        assert hit.midi_bytes == b"MThd-pattern" and hit.seed == 7
+        assert disk_hits.value == before + 1
+
+        # Identical output for a different request is stored once
+        other = cache.key("generate_midi", dict(PARAMS, bars=4))
+        cache.put(other, _result(b"MThd-pattern"))
+        assert len(os.listdir(os.path.join(tmp, "objects"))) == 1
+    print("✅ memory LRU + content-addressed disk store")
+
+
+def test_size_based_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GenerationCache(cache_dir=tmp, memory_bytes=250, disk_bytes=250)
+        keys = [cache.key("generate_midi", dict(PARAMS, seed=seed)) for seed in range(5)]
+        for seed, key in enumerate(keys):
+            cache.put(key, _result(bytes([seed]) * 100, seed))
+
+        stats = cache.stats()
+        assert stats['memory_bytes'] <= 250 and stats['disk_bytes'] <= 250
+        assert cache.get(keys[-1]) is not None
+        cache.clear()
+        assert cache.get(keys[0]) is None  # evicted from both tiers
+    print("✅ size-based eviction in both tiers")
+
+
+def test_cached_generation_matches_fresh():
+    executor = GenerationExecutor(kind='thread', workers=1, queue_size=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GenerationCache(cache_dir=tmp)
+        key = cache.key("generate_midi", PARAMS)
+        try:
+            fresh = asyncio.run(executor.run(generate_midi_task, dict(PARAMS)))
+        finally:
+            executor.shutdown()
+        cache.put(key, fresh)
+        cached = GenerationCache(cache_dir=tmp).get(key)
+    assert cached.midi_bytes == fresh.midi_bytes
+    assert cached.track_count == fresh.track_count
+    print("✅ cached bytes identical to a fresh seeded generation")
+
+
+def test_disk_hit_returns_every_field():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GenerationCache(cache_dir=tmp, memory_bytes=150)
+        key, other = (cache.key("generate_midi", dict(PARAMS, seed=seed)) for seed in (7, 8))
+        stored = GenerationResult(midi_bytes=b"M" * 100, seed=7, track_count=2,
+                                  generation_ms=12, stages_ms={'base_rhythm': 4.5, 'encode': 0.25})
+        cache.put(key, stored)
+        cache.put(other, _result(b"N" * 100, 8))  # evicts `key` from the memory tier
+
+        disk_hits = metrics.counter("generation_cache_hits_total", tier="disk")
+        before = disk_hits.value
+        hit = cache.get(key)
+        assert disk_hits.value == before + 1
+    assert asdict(hit) == asdict(stored)
+    print("✅ disk tier returns the same GenerationResult as the memory tier")
+
+
+def test_async_disk_tier_off_event_loop():
+    disk_threads = []
+
+    class RecordingCache(GenerationCache):
+        def _write_disk(self, key, result):
+            disk_threads.append(threading.get_ident())
+            super()._write_disk(key, result)
+
+        def _read_disk(self, key):
+            disk_threads.append(threading.get_ident())
+            return super()._read_disk(key)
+
+    async def scenario(cache, key):
+        loop_thread = threading.get_ident()
+        await cache.put_async(key, _result(b"MThd-async"))
+        assert cache._get_memory(key).midi_bytes == b"MThd-async"  # memory tier filled inline
+        cache.clear()
+        hit = await cache.get_async(key)  # memory empty: read from disk
+        return loop_thread, hit
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RecordingCache(cache_dir=tmp)
+        key = cache.key("generate_midi", PARAMS)
+        loop_thread, hit = asyncio.run(scenario(cache, key))
+        assert hit.midi_bytes == b"MThd-async"
+        assert len(os.listdir(os.path.join(tmp, "objects"))) == 1
+    assert len(disk_threads) == 2 and loop_thread not in disk_threads
+    print("✅ async get/put keep disk I/O off the event loop")
+
+
+if __name__ == "__main__":
+    test_canonical_key()
+    test_memory_and_disk_tiers()
+    test_size_based_eviction()
+    test_cached_generation_matches_fresh()
+    test_disk_hit_returns_every_field()
+    test_async_disk_tier_off_event_loop()
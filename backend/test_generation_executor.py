@@ -0,0 +1,118 @@
+import sys
+import os
+import io
+import time
+import asyncio
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+import mido
+
+from services.generation_executor import (
+    GenerationExecutor, GenerationQueueFull, generate_midi_task, generate_arrangement_task
+)
+from utils.metrics import metrics
+
+_release = threading.Event()
+
+
+def _blocking_task(value):
+    _release.wait(timeout=10)
+    return value
+
+
+def test_runs_generation_on_worker():
+    executor = GenerationExecutor(kind='thread', workers=2, queue_size=4)
+    executor.start()
+    try:
+        result = asyncio.run(executor.run(generate_midi_task, dict(
+            description="techno kick", style="techno", instrument="kick", bars=2, seed=11
+        )))
+    finally:
+        executor.shutdown()
+
+    midi = mido.MidiFile(file=io.BytesIO(result.midi_bytes))
+    assert result.seed == 11
+    assert result.track_count == len(midi.tracks) == 1
+    assert any(msg.type == 'note_on' for msg in midi.tracks[0])
+    print("✅ generation on executor worker")
+
+
+def test_bounded_queue_rejects_overflow():
+    executor = GenerationExecutor(kind='thread', workers=1, queue_size=1)
+    rejected = metrics.counter("generation_rejected_total", task="blocking")
+    rejected_before = rejected.value
+
+    async def scenario():
+        _release.clear()
+        running = asyncio.ensure_future(executor.run(_blocking_task, 1, task="blocking"))
+        queued = asyncio.ensure_future(executor.run(_blocking_task, 2, task="blocking"))
+        await asyncio.sleep(0.05)
+        assert executor.pending == 2
+        try:
+            await executor.run(_blocking_task, 3, task="blocking")
+            raise AssertionError("third request should have been rejected")
+        except GenerationQueueFull:
+            pass
+        _release.set()
+        return await asyncio.gather(running, queued)
+
+    try:
+        assert asyncio.run(scenario()) == [1, 2]
+    finally:
+        _release.set()
+        executor.shutdown()
+
+    assert executor.pending == 0
+    assert rejected.value == rejected_before + 1
+    assert metrics.histogram("generation_queue_wait_seconds", task="blocking").count >= 2
+    print("✅ bounded queue rejects overflow with GenerationQueueFull")
+
+
+def test_event_loop_stays_responsive():
+    executor = GenerationExecutor(kind='thread', workers=2, queue_size=4)
+    executor.start()
+    structure = [{'type': block, 'bars': 8} for block in ['intro', 'verse', 'chorus', 'verse', 'chorus', 'outro']]
+
+    async def scenario():
+        generation = asyncio.ensure_future(executor.run(generate_arrangement_task, dict(
+            structure=structure, style='techno', bpm=128
+        )))
+        worst_lag = 0.0
+        while not generation.done():
+            before = time.perf_counter()
+            await asyncio.sleep(0.005)
+            worst_lag = max(worst_lag, time.perf_counter() - before - 0.005)
+        await generation
+        return worst_lag
+
+    try:
+        worst_lag = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    # Inline generation would block the loop for the whole arrangement
+    assert worst_lag < 0.1, f"event loop stalled for {worst_lag * 1000:.0f} ms"
+    print(f"✅ event loop responsive during arrangement (worst lag {worst_lag * 1000:.1f} ms)")
+
+
+def test_process_pool_workers():
+    executor = GenerationExecutor(kind='process', workers=1, queue_size=2)
+    executor.start()
+    try:
+        result = asyncio.run(executor.run(generate_midi_task, dict(
+            description="house drums", style="house", instrument="drums", bars=2, seed=3
+        )))
+    finally:
+        executor.shutdown()
+    assert result.seed == 3
+    assert mido.MidiFile(file=io.BytesIO(result.midi_bytes)).tracks
+    print("✅ process pool returns picklable results")
+
+
+if __name__ == "__main__":
+    test_runs_generation_on_worker()
+    test_bounded_queue_rejects_overflow()
+    test_event_loop_stays_responsive()
+    test_process_pool_workers()
@@ -0,0 +1,59 @@
+import sys
+import os
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.generator_registry import GeneratorRegistry, generator_registry
+from services.integrated_midi_generator import IntegratedMidiGenerator
+
+
+def test_shared_instances():
+    generator = generator_registry.get('integrated')
+    assert isinstance(generator, IntegratedMidiGenerator)
+    assert generator_registry.get('integrated') is generator
+    # The arrangement service reuses the shared generator instead of building its own
+    assert generator_registry.get('arrangement').generator is generator
+    print("✅ registry hands out one shared instance per generator")
+
+
+def test_concurrent_first_use_builds_once():
+    builds = []
+    registry = GeneratorRegistry()
+    registry.register('slow', lambda: builds.append(1) or object())
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(registry.get('slow'))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(builds) == 1
+    assert all(r is results[0] for r in results)
+    print("✅ concurrent first use builds the generator once")
+
+
+def test_prewarm():
+    registry = GeneratorRegistry()
+    registry.register('integrated', lambda: IntegratedMidiGenerator(enable_humanization=True))
+    elapsed = registry.prewarm()
+    assert registry.is_built('integrated') and elapsed > 0
+    try:
+        registry.get('missing')
+        raise AssertionError("unknown generator should raise KeyError")
+    except KeyError:
+        pass
+    print(f"✅ prewarm builds generators and warms every style ({elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    test_shared_instances()
+    test_concurrent_first_use_builds_once()
+    test_prewarm()
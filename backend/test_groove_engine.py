@@ -0,0 +1,84 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.event_buffer import EventBuffer
+from services.generation_context import GenerationContext
+from services.groove_engine import GrooveEngine, swing_offset_table
+
+engine = GrooveEngine()
+
+
+def scalar_swing_offset(tick, swing_amount, ppq):
+    """The per-event off-beat detection the swing table replaced (exact on the tick grid)."""
+    pos_in_beat = tick % ppq
+    if swing_amount <= 0:
+        return 0
+    if pos_in_beat == ppq // 2:
+        return round(swing_amount * 0.15 * ppq)
+    if pos_in_beat in (ppq // 4, 3 * ppq // 4):
+        return round(swing_amount * 0.1 * ppq)
+    return 0
+
+
+def test_swing_table_matches_scalar_detection():
+    rng = np.random.default_rng(0)
+    for ppq in [96, 480, 960]:
+        sixteenth = ppq // 4
+        times = np.concatenate([
+            np.arange(0, 16 * ppq, sixteenth),          # 16th grid
+            np.arange(0, 16 * ppq, ppq // 3 + 1),       # off grid
+            np.arange(0, 16 * ppq, sixteenth) + 1,      # one tick late: no swing
+            rng.integers(0, 16 * ppq, 200),
+        ])
+        for swing in [0.0, 0.1, 0.6, 0.67, 0.3]:
+            offsets = engine.swing_offsets(times, swing, ppq)
+            expected = [scalar_swing_offset(t, swing, ppq) for t in times.tolist()]
+            assert offsets.dtype.kind == 'i' and offsets.tolist() == expected, (ppq, swing)
+    print("✅ swing offset tables match the per-event off-beat detection")
+
+
+def test_swing_tables_memoized_and_readonly():
+    assert swing_offset_table(0.6) is swing_offset_table(0.6)
+    assert swing_offset_table(0.6, 960) is not swing_offset_table(0.6)
+    assert not swing_offset_table(0.6).flags.writeable
+    print("✅ swing tables are memoized and read-only")
+
+
+def test_dicts_and_buffer_agree():
+    events = [{'time': t, 'velocity': 100, 'duration': 0.25, 'pitch': 42, 'channel': 9}
+              for t in np.arange(0, 8, 0.25).tolist()]
+    snapshot = [dict(e) for e in events]
+    for style, swing in [('house', None), ('jazz', 0.6), ('techno', 0.0), ('lofi', None)]:
+        grooved = engine.apply_groove(events, style, 0.5, custom_swing=swing, ctx=GenerationContext(9))
+        buffer = engine.apply_groove(EventBuffer.from_dicts(events), style, 0.5, custom_swing=swing,
+                                     ctx=GenerationContext(9))
+        assert events == snapshot  # inputs untouched
+        assert [e['time'] for e in grooved] == (buffer.time / buffer.ppq).tolist()
+        assert [e['velocity'] for e in grooved] == buffer.velocity.tolist()
+        assert all(type(e['velocity']) is int and 1 <= e['velocity'] <= 127 for e in grooved)
+        assert min(e['time'] for e in grooved) >= 0
+
+        again = engine.apply_groove(events, style, 0.5, custom_swing=swing, ctx=GenerationContext(9))
+        assert again == grooved
+    print("✅ list and EventBuffer paths agree and are seed-stable")
+
+
+def test_robotic_has_no_jitter():
+    engine_robotic = GrooveEngine()
+    engine_robotic.GROOVE_TEMPLATES = dict(GrooveEngine.GROOVE_TEMPLATES, straight={'swing': 0, 'humanize': 0})
+    events = EventBuffer.from_columns(time=np.arange(0, 4 * 480, 120), velocity=100)
+    engine_robotic.apply_groove(events, 'techno', 0.5, ctx=GenerationContext(1))
+    assert events.time.tolist() == np.arange(0, 4 * 480, 120).tolist()
+    assert (events.velocity == 100).all()
+    print("✅ zero humanize leaves timing and velocity untouched")
+
+
+if __name__ == "__main__":
+    test_swing_table_matches_scalar_detection()
+    test_swing_tables_memoized_and_readonly()
+    test_dicts_and_buffer_agree()
+    test_robotic_has_no_jitter()
@@ -0,0 +1,93 @@
+import sys
+import os
+import math
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.event_buffer import EventBuffer
+from services.generation_context import GenerationContext
+from services.humanization_engine import HumanizationEngine
+from services.production_engine import VelocityAutomation
+
+# Per-event formulas of the deterministic curves, as they were written before batching
+SCALAR_CURVES = {
+    'machine_gun': lambda t: 127,
+    'crescendo': lambda t: 20 + (107 * t),
+    'diminuendo': lambda t: 127 - (107 * t),
+    'accent_pattern': lambda t: 127 if int(t * 16) % 4 == 0 else 80,
+}
+
+
+def make_events(n=64):
+    return [{'time': i * 0.25, 'velocity': 100, 'duration': 0.25, 'pitch': 36} for i in range(n)]
+
+
+def test_deterministic_curves_match_scalar_formulas():
+    automation = VelocityAutomation()
+    events = make_events()
+    for curve_type, formula in SCALAR_CURVES.items():
+        for intensity in [1.0, 0.7, 1.3]:
+            result = automation.apply_velocity_curve([dict(e) for e in events], curve_type, intensity,
+                                                     ctx=GenerationContext(0))
+            max_time = events[-1]['time']
+            expected = [max(1, min(127, int(formula(e['time'] / max_time) * intensity))) for e in events]
+            assert [e['velocity'] for e in result] == expected, (curve_type, intensity)
+    print("✅ batched curves match the per-event formulas")
+
+
+def test_noisy_curves_bounded_and_seed_stable():
+    automation = VelocityAutomation()
+    events = make_events(256)
+    t = np.array([e['time'] for e in events]) / events[-1]['time']
+    centers = {
+        'human_drummer': (80 + 20 * np.sin(t * math.pi), 5),
+        'jazz_brush': (60 + 10 * np.sin(t * 2 * math.pi), 3 * 6),
+        'natural': (np.full(len(t), 90.0), 5 * 6),
+    }
+    for curve_type, (center, spread) in centers.items():
+        first = automation.apply_velocity_curve([dict(e) for e in events], curve_type, ctx=GenerationContext(4))
+        second = automation.apply_velocity_curve([dict(e) for e in events], curve_type, ctx=GenerationContext(4))
+        velocities = np.array([e['velocity'] for e in first])
+        assert first == second
+        assert all(type(e['velocity']) is int for e in first)
+        assert (np.abs(velocities - center) <= spread + 1).all(), curve_type
+    print("✅ noisy curves are bounded and seed-stable")
+
+
+def test_curve_dicts_and_buffer_agree():
+    automation = VelocityAutomation()
+    events = make_events()
+    for curve_type in list(automation.CURVES) + ['unknown']:
+        dicts = automation.apply_velocity_curve([dict(e) for e in events], curve_type, ctx=GenerationContext(2))
+        buffer = automation.apply_velocity_curve(EventBuffer.from_dicts(events), curve_type, ctx=GenerationContext(2))
+        assert [e['velocity'] for e in dicts] == buffer.velocity.tolist(), curve_type
+    assert automation.apply_velocity_curve([], 'natural') == []
+    print("✅ dict wrapper and EventBuffer path agree")
+
+
+def test_humanize_bulk_jitter():
+    engine = HumanizationEngine()
+    events = make_events(512) + [{'pitch': 40}]
+    snapshot = [dict(e) for e in events]
+    humanized = engine.humanize_midi(events, ctx=GenerationContext(8))
+    assert events == snapshot  # copies, inputs untouched
+    assert humanized[-1] == {'pitch': 40}
+    for before, after in zip(events[:-1], humanized[:-1]):
+        assert abs(after['velocity'] - before['velocity']) <= 5
+        assert abs(after['time'] - before['time']) <= 0.01 and after['time'] >= 0
+    assert humanized == engine.humanize_midi(events, ctx=GenerationContext(8))
+
+    dicts = engine.humanize_midi(events[:-1], ctx=GenerationContext(8))
+    buffer = engine.humanize_midi(EventBuffer.from_dicts(events[:-1]), ctx=GenerationContext(8))
+    assert buffer.velocity.tolist() == [e['velocity'] for e in dicts]
+    assert (buffer.time / buffer.ppq).tolist() == [e['time'] for e in dicts]
+    print("✅ humanization jitter drawn in bulk, bounded and seed-stable")
+
+
+if __name__ == "__main__":
+    test_deterministic_curves_match_scalar_formulas()
+    test_noisy_curves_bounded_and_seed_stable()
+    test_curve_dicts_and_buffer_agree()
+    test_humanize_bulk_jitter()
@@ -0,0 +1,66 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services import kit_engine
+from services.advanced_midi_generator import AdvancedPatternGenerator, PatternDNA
+from services.generation_context import GenerationContext
+from services.style_patterns import StylePatterns
+
+
+def test_kit_patterns_match_style_patterns():
+    for style in ['techno', 'jazz', 'house', 'unknown_style']:
+        for kit in kit_engine.KITS:
+            voices = kit_engine.kit_voices(kit)
+            patterns = kit_engine.kit_patterns(style, voices)
+            assert patterns.shape == (len(voices), 16)
+            for voice, row in zip(voices, patterns):
+                assert row.tolist() == StylePatterns.get_pattern(style, voice), (style, voice)
+    assert kit_engine.kit_voices(None) == ('kick', 'snare', 'hat')
+    assert kit_engine.kit_voices('no_such_kit') == kit_engine.KITS['standard']
+    print("✅ kit patterns come straight from the style tables")
+
+
+def test_time_order_equals_stable_sort():
+    rng = np.random.default_rng(5)
+    for n_voices in [1, 3, 8]:
+        hits = rng.random((n_voices, 64)) < 0.4
+        ghosts = hits & (rng.random(hits.shape) < 0.3)
+        order = kit_engine.time_order(hits, ghosts)
+
+        # Reference: per-voice lists (hit, then its ghost), concatenated, stable sort by time
+        reference = []
+        rank = 0
+        for v in range(n_voices):
+            for p in np.flatnonzero(hits[v]).tolist():
+                reference.append((p * 2, v, rank, False))
+                if ghosts[v, p]:
+                    reference.append((p * 2 + 1, v, rank, True))
+                rank += 1
+        reference.sort(key=lambda item: item[0])
+
+        got = list(zip((order.position * 2 + order.ghost).tolist(), order.voice.tolist(),
+                       order.hit.tolist(), order.ghost.tolist()))
+        assert got == reference, n_voices
+    print("✅ grid readback matches concatenate + stable sort")
+
+
+def test_extended_kit_single_pass():
+    generator = AdvancedPatternGenerator()
+    dna = PatternDNA(density=0.9, complexity=0.8, groove=0.3, velocity_curve='accent', evolution=0.2)
+    events = generator.generate_pattern_with_dna('techno', 'drums', dna, 8, 0.0,
+                                                 ctx=GenerationContext(11), kit='extended')
+    times = [e['time'] for e in events]
+    assert times == sorted(times)
+    assert {e['instrument_type'] for e in events} <= set(kit_engine.KITS['extended'])
+    assert len({e['instrument_type'] for e in events}) > 3
+    print("✅ extended kit rendered in one already-ordered pass")
+
+
+if __name__ == "__main__":
+    test_kit_patterns_match_style_patterns()
+    test_time_order_equals_stable_sort()
+    test_extended_kit_single_pass()
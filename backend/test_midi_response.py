@@ -0,0 +1,43 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.midi_response import MIDI_MEDIA_TYPE, midi_response, wants_inline
+
+app = FastAPI()
+
+
+@app.get("/pattern")
+def pattern(request: Request, inline: bool = False):
+    if wants_inline(request, inline):
+        return midi_response(b"MThd", "pattern.mid", seed=9, url="/midi_files/pattern.mid", tracks=1)
+    return {"url": "/midi_files/pattern.mid"}
+
+
+client = TestClient(app)
+
+
+def test_json_by_default():
+    response = client.get("/pattern")
+    assert response.json() == {"url": "/midi_files/pattern.mid"}
+    print("✅ JSON response without inline")
+
+
+def test_inline_query_and_accept_header():
+    for response in (client.get("/pattern?inline=1"),
+                     client.get("/pattern", headers={"Accept": f"{MIDI_MEDIA_TYPE}, application/json;q=0.5"})):
+        assert response.headers["content-type"] == MIDI_MEDIA_TYPE
+        assert response.content == b"MThd"
+        assert response.headers["x-generation-seed"] == "9"
+        assert response.headers["x-generation-url"] == "/midi_files/pattern.mid"
+        assert 'filename="pattern.mid"' in response.headers["content-disposition"]
+    print("✅ ?inline=1 and Accept: audio/midi return the MIDI bytes")
+
+
+if __name__ == "__main__":
+    test_json_by_default()
+    test_inline_query_and_accept_header()
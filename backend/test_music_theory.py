@@ -0,0 +1,74 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services import music_theory
+from services.harmonic_engine import HarmonicEngine
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.music_theory import MusicTheoryService, SCALE_STEPS, scale_table
+
+theory = MusicTheoryService()
+ROOTS = list(music_theory.NOTE_NAMES) + ['Db', 'f#', 'X']
+
+
+def reference_quantize(note_value, scale_type, root_note):
+    """Per-call candidate list + min(key=distance), as quantize_to_scale used to do."""
+    valid_notes = []
+    for octave in range(9):
+        valid_notes.extend(theory.get_scale_notes(root_note, scale_type, octave))
+    return min(valid_notes, key=lambda x: abs(x - note_value))
+
+
+def test_quantize_table_matches_reference():
+    generator = IntegratedMidiGenerator()
+    for root in ROOTS:
+        for scale_type in list(SCALE_STEPS) + ['unknown']:
+            expected = [reference_quantize(n, scale_type, root) for n in range(-3, 131)]
+            assert theory.quantize(np.arange(-3, 131), root, scale_type).tolist() == expected, (root, scale_type)
+            assert generator.quantize_to_scale(61, scale_type, root) == expected[64]
+    print("✅ 128-entry quantize table matches the per-call search (all roots / scales)")
+
+
+def test_tables_memoized_and_immutable():
+    table = scale_table('D', 'dorian')
+    assert table is scale_table('D', 'dorian')
+    for array in (table.in_scale, table.nearest, table.chords):
+        assert not array.flags.writeable
+    assert table.names == ('D', 'E', 'F', 'G', 'A', 'B', 'C')
+    assert theory._get_scale_notes('D', 'dorian') == list(table.names)
+    assert theory._get_scale_notes('C', 'major') is not theory._get_scale_notes('C', 'major')  # callers get lists
+    assert table.in_scale[np.array([62, 64, 65, 67, 69, 71, 72])].all() and not table.in_scale[63]
+    print("✅ scale tables are memoized and read-only")
+
+
+def test_modes_and_legacy_scales():
+    assert theory._get_scale_notes('C', 'major') == ['C', 'D', 'E', 'F', 'G', 'A', 'B']
+    assert theory._get_scale_notes('A', 'minor') == ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+    assert theory._get_scale_notes('A', 'weird') == theory._get_scale_notes('A', 'minor')
+    assert theory._get_scale_notes('E', 'phrygian') == ['E', 'F', 'G', 'A', 'B', 'C', 'D']
+    assert theory.SCALES['minor'] == [0, 2, 3, 5, 7, 8, 10]
+    assert theory.SCALES['mixolydian'] == [0, 2, 4, 5, 7, 9, 10]
+    assert theory._note_to_midi('C', 4) == 60 and theory._note_to_midi('F#', 2) == 42
+    print("✅ major/minor unchanged, extra modes served from the same tables")
+
+
+def test_chord_tones_match_harmonic_engine():
+    engine = HarmonicEngine()
+    for root in ['C', 'F#', 'A']:
+        for scale_type in SCALE_STEPS:
+            for octave in [2, 4]:
+                scale_notes = theory.get_scale_notes(root, scale_type, octave)
+                for degree in range(7):
+                    assert theory.chord_tones(root, scale_type, degree, octave) == \
+                        engine.get_chord_tones_from_scale(scale_notes, degree), (root, scale_type, degree)
+    print("✅ chord-tone tables match get_chord_tones_from_scale")
+
+
+if __name__ == "__main__":
+    test_quantize_table_matches_reference()
+    test_tables_memoized_and_immutable()
+    test_modes_and_legacy_scales()
+    test_chord_tones_match_harmonic_engine()
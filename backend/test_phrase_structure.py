@@ -0,0 +1,104 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.event_buffer import EventBuffer
+from services.generation_context import GenerationContext
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.midi_splice import START
+from services.pattern_intelligence import PatternIntelligence, PhraseLayout, PhraseStructure
+
+BASE = [{'time': t, 'velocity': 100, 'duration': 0.25, 'pitch': 36, 'channel': 9} for t in np.arange(0, 4, 0.5).tolist()]
+
+
+def reference_structure(base: EventBuffer, structure, variation_engine, ctx, bars):
+    """Per-bar shifted copies of each section, concatenated (the pre-layout expansion)."""
+    form = PhraseStructure.STRUCTURES[structure]
+    sections = {0: base}
+    parts = []
+    for bar_idx in range(bars):
+        section_id = form[bar_idx % len(form)]
+        if section_id not in sections:
+            sections[section_id] = variation_engine.generate_variation(base, intensity=0.3 * section_id, ctx=ctx)
+        parts.append(sections[section_id].shifted(bar_idx * 4 * base.ppq))
+    return EventBuffer.concatenate(parts)
+
+
+def test_layout_matches_per_bar_copies():
+    engine = PatternIntelligence()
+    base = EventBuffer.from_dicts(BASE)
+    for structure in PhraseStructure.STRUCTURES:
+        for bars in [4, 6, 16, 64]:
+            got = engine.phrase_structure.apply_structure(base, structure, engine, ctx=GenerationContext(3), bars=bars)
+            expected = reference_structure(base, structure, engine, GenerationContext(3), bars)
+            for name in EventBuffer.COLUMNS:
+                assert getattr(got, name).tolist() == getattr(expected, name).tolist(), (structure, bars, name)
+    print("✅ layout materialization matches per-bar section copies")
+
+
+def test_layout_shares_sections():
+    engine = PatternIntelligence()
+    base = EventBuffer.from_dicts(BASE)
+    layout = engine.phrase_structure.layout_structure(base, 'AABA', engine, ctx=GenerationContext(1), bars=64)
+    assert layout.bars == 64 and len(layout.sections) == 2
+    assert layout.sections[0] is base
+    assert len(layout) == len(layout.materialize())
+
+    events = layout.materialize()
+    events.time += 1  # materialized rows are copies, templates untouched
+    assert base.to_dicts() == EventBuffer.from_dicts(BASE).to_dicts()
+    assert len(PhraseLayout([], np.zeros(0, dtype=np.int64)).materialize()) == 0
+    print("✅ repeated sections share one template until materialized")
+
+
+def test_dict_path_and_bar_count():
+    structure = PhraseStructure()
+    events = structure.apply_structure(BASE, 'AABA')
+    assert len(events) == 4 * len(BASE)
+    assert events[len(BASE)]['time'] == 4.0 and BASE[0]['time'] == 0.0
+
+    long_form = structure.apply_structure(BASE, 'AABA', bars=16)
+    assert len(long_form) == 16 * len(BASE)
+    assert long_form[-1]['time'] == 15 * 4 + BASE[-1]['time']
+
+    engine = PatternIntelligence()
+    buffer = engine.generate_intelligent_pattern(EventBuffer.from_dicts(BASE), {'bars': 2}, ctx=GenerationContext(2))
+    assert [e['time'] for e in buffer.to_dicts()] == [e['time'] for e in BASE] + [e['time'] + 4 for e in BASE]
+    print("✅ dict wrapper and requested bar counts honoured")
+
+
+def test_paths_agree_without_variation_engine():
+    structure = PhraseStructure()
+    for form in PhraseStructure.STRUCTURES:
+        ctx = GenerationContext(5)
+        state = ctx.rng.getstate()
+        layout = structure.layout_structure(EventBuffer.from_dicts(BASE), form, ctx=ctx, bars=8)
+        assert len(layout.sections) == 1 and ctx.rng.getstate() == state  # B/C repeat A, no draws
+        from_dicts = EventBuffer.from_dicts(structure.apply_structure(BASE, form, bars=8))
+        for name in EventBuffer.COLUMNS:
+            assert getattr(layout.materialize(), name).tolist() == getattr(from_dicts, name).tolist(), (form, name)
+    print("✅ buffer and dict paths give the same form without a variation engine")
+
+
+def test_generator_fills_requested_bars():
+    generator = IntegratedMidiGenerator()
+    for instrument in ('drums', 'bass', 'pad'):
+        params = dict(description=f"techno {instrument}", style='techno', instrument=instrument, seed=3)
+        four, _ = generator.generate(bars=4, output='notes', **params)
+        notes, _ = generator.generate(bars=16, output='notes', **params)
+        bar_of_note = notes[:, START] // (4 * generator.ppq)
+        # The AABA form repeats over all 16 bars: every bar has notes, the last one is bar 15
+        assert set(bar_of_note.tolist()) == set(range(16)), instrument
+        assert len(notes) == 4 * len(four), instrument
+    print("✅ 16-bar generation fills all 16 bars")
+
+
+if __name__ == "__main__":
+    test_layout_matches_per_bar_copies()
+    test_layout_shares_sections()
+    test_dict_path_and_bar_count()
+    test_paths_agree_without_variation_engine()
+    test_generator_fills_requested_bars()
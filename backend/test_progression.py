@@ -0,0 +1,61 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.generation_context import GenerationContext
+from services.music_theory_engine import MusicTheoryEngine, Progression, parse_chord
+
+engine = MusicTheoryEngine()
+
+
+def test_parse_chord_cached():
+    parse_chord.cache_clear()
+    first = parse_chord('V7', 60, 'major')
+    assert first is parse_chord('V7', 60, 'major')
+    assert parse_chord.cache_info().hits == 1
+    assert first.root == 67 and first.absolute_notes == (67, 71, 74, 77)
+    assert parse_chord('??', 57, 'minor').absolute_notes == (57, 61, 64)  # unknown numeral -> major triad
+    assert parse_chord.cache_info().maxsize == 1024
+    print("✅ parsed chords come from a bounded cache")
+
+
+def test_generate_progression_shape():
+    for style in ['pop', 'jazz', 'lofi', 'techno', 'gospel']:
+        progression = engine.generate_progression(style, 60, 'minor', ctx=GenerationContext(4))
+        assert isinstance(progression, Progression) and isinstance(progression, list)
+        for chord in progression:
+            assert chord['absolute_notes'] == [chord['root'] + i for i in chord['intervals']]
+        # Requests get their own dicts; editing one never leaks into the cache
+        expected = list(progression[0]['absolute_notes'])
+        progression[0]['absolute_notes'].append(0)
+        again = engine.generate_progression(style, 60, 'minor', ctx=GenerationContext(4))
+        assert again[0]['absolute_notes'] == expected
+    print("✅ generate_progression returns a Progression of independent chord dicts")
+
+
+def test_progression_tables():
+    progression = Progression([
+        {'name': 'I', 'root': 60, 'intervals': [0, 4, 7], 'absolute_notes': [60, 64, 67]},
+        {'name': 'V7', 'root': 67, 'intervals': [0, 4, 7, 10], 'absolute_notes': [67, 71, 74, 77]},
+        {'name': '?', 'root': 60, 'intervals': [], 'absolute_notes': []},
+    ])
+    times = np.array([0.0, 3.99, 4.0, 8.5, 12.0, 27.75])
+    assert progression.bar_index(times).tolist() == [int(t / 4) % 3 for t in times]
+    assert progression.roots.tolist() == [60, 67, 60]
+    assert progression.chord_tones(1) == (67, 71, 74, 77)
+
+    tones, counts = progression.tone_table(default=(60, 64, 67, 72))
+    assert counts.tolist() == [3, 4, 4]
+    assert tones[2].tolist() == [60, 64, 67, 72] and tones[0, :3].tolist() == [60, 64, 67]
+    assert Progression.coerce(progression) is progression
+    assert len(Progression.coerce(None)) == 0
+    print("✅ per-bar chord lookups are table indexing")
+
+
+if __name__ == "__main__":
+    test_parse_chord_cached()
+    test_generate_progression_shape()
+    test_progression_tables()
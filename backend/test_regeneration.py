@@ -0,0 +1,129 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+import mido
+
+from services.arrangement_service import ArrangementService, TICKS_PER_BAR
+from services.generation_executor import (
+    generate_arrangement_task, generate_midi_task, regenerate_bars_task, regenerate_block_task
+)
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.midi_splice import PITCH, START, encode_track, track_notes
+from services.smf_writer import META, META_MARKER, encode_file, read_midi_file, split_file
+
+PATTERN = dict(description="techno drums", style="techno", instrument="drums", bars=4)
+STRUCTURE = [
+    {'type': 'intro', 'bars': 4},
+    {'type': 'verse', 'bars': 8},
+    {'type': 'bridge', 'bars': 2},
+    {'type': 'chorus', 'bars': 4},
+]
+
+
+def _notes_in(body, start, end):
+    notes, _ = track_notes(body)
+    return sorted(map(tuple, notes[(notes[:, START] >= start) & (notes[:, START] < end)].tolist()))
+
+
+def test_track_round_trip():
+    data, _ = IntegratedMidiGenerator().generate(seed=5, output='bytes', **PATTERN)
+    midi_type, ticks_per_beat, bodies = split_file(data)
+    notes, others = track_notes(bodies[0])
+    assert len(notes) > 0 and others
+    # Byte-identical to the generator's own encoding
+    assert encode_file([encode_track(notes, others)], ticks_per_beat, midi_type) == data
+
+    # Same notes as mido reads them, and as the generator hands them over
+    mido_notes = [msg.note for msg in read_midi_file(data).tracks[0] if msg.type == 'note_on' and msg.velocity]
+    assert notes[:, PITCH].tolist() == mido_notes
+    direct, _ = IntegratedMidiGenerator().generate(seed=5, output='notes', **PATTERN)
+    assert direct.tolist() == notes.tolist()
+    print(f"✅ note-level round trip ({len(notes)} notes)")
+
+
+def test_regenerate_bars():
+    generator = IntegratedMidiGenerator()
+    base, _ = generator.generate(seed=1, output='bytes', **PATTERN)
+    edited, seed = generator.regenerate_bars(base, [2], **PATTERN)
+    fresh, _ = generator.generate(seed=seed, output='bytes', **PATTERN)
+
+    for bar in range(4):
+        window = (bar * TICKS_PER_BAR, (bar + 1) * TICKS_PER_BAR)
+        expected = fresh if bar == 2 else base
+        assert _notes_in(split_file(edited)[2][0], *window) == _notes_in(split_file(expected)[2][0], *window)
+
+    # Bars past the first AABA pass are rendered too, so re-rolling them changes them
+    long_pattern = dict(PATTERN, bars=8)
+    base, _ = generator.generate(seed=1, output='bytes', **long_pattern)
+    edited, _ = generator.regenerate_bars(base, [5], seed=2, **long_pattern)
+    window = (5 * TICKS_PER_BAR, 6 * TICKS_PER_BAR)
+    base_bar = _notes_in(split_file(base)[2][0], *window)
+    assert base_bar and _notes_in(split_file(edited)[2][0], *window) != base_bar
+    for bar in (0, 4, 6, 7):
+        window = (bar * TICKS_PER_BAR, (bar + 1) * TICKS_PER_BAR)
+        assert _notes_in(split_file(edited)[2][0], *window) == _notes_in(split_file(base)[2][0], *window)
+
+    try:
+        generator.regenerate_bars(base, [8], **long_pattern)
+        assert False, "bar out of range accepted"
+    except ValueError:
+        pass
+    print("✅ only the requested bar changes")
+
+
+def test_regenerate_bars_task_replays_edits():
+    source = dict(PATTERN, seed=generate_midi_task(dict(PATTERN, seed=9)).seed)
+    first = regenerate_bars_task(dict(source=source, bars=[1], seed=21, base=None))
+    source = dict(source, edits=[{'bars': [1], 'seed': first.seed}])
+
+    # With the stored file as base, or re-rendered from the parameters alone
+    from_file = regenerate_bars_task(dict(source=source, bars=[3], seed=22, base=first.midi_bytes))
+    from_params = regenerate_bars_task(dict(source=source, bars=[3], seed=22, base=None))
+    assert from_file.midi_bytes == from_params.midi_bytes
+    print("✅ stored edits replay to the same file")
+
+
+def test_arrangement_regenerate_block():
+    service = ArrangementService()
+    base = service.generate_arrangement(STRUCTURE, 'techno', seed=42, output='bytes')
+    assert base == service.generate_arrangement(STRUCTURE, 'techno', seed=42, output='bytes')
+    assert len(service.generate_arrangement(STRUCTURE, 'techno', seed=42).tracks) == 4
+
+    edited, block_seed = service.regenerate_block(base, STRUCTURE, 2, 'techno', seed=42)
+    offsets = service.block_offsets(STRUCTURE)
+    for base_track, edited_track in zip(split_file(base)[2], split_file(edited)[2]):
+        for index in (0, 1, 3):
+            window = (offsets[index], offsets[index + 1])
+            assert _notes_in(base_track, *window) == _notes_in(edited_track, *window)
+
+    # Splicing one block == rendering the whole song with that block's seed
+    structure = [dict(block) for block in STRUCTURE]
+    structure[2]['seed'] = block_seed
+    assert edited == service.generate_arrangement(structure, 'techno', seed=42, output='bytes')
+
+    # Every block closes with a marker at its nominal end
+    _, others = track_notes(split_file(edited)[2][1])
+    assert [tick for tick, event in others if event[:2] == bytes([META, META_MARKER])] == offsets[1:]
+    print("✅ one arrangement block regenerated, the rest kept")
+
+
+def test_regenerate_block_task():
+    source = dict(structure=STRUCTURE, style='house', key='C', scale='minor', bpm=124,
+                  instrument='full_kit')
+    generated = generate_arrangement_task(source)
+    source = dict(source, seed=generated.seed)
+    from_file = regenerate_block_task(dict(source=source, block_index=1, seed=7, base=generated.midi_bytes))
+    from_params = regenerate_block_task(dict(source=source, block_index=1, seed=7, base=None))
+    assert from_file.seed == 7 and from_file.midi_bytes == from_params.midi_bytes
+    assert isinstance(read_midi_file(from_file.midi_bytes), mido.MidiFile)
+    print("✅ block regeneration task (stored file or re-render)")
+
+
+if __name__ == "__main__":
+    test_track_round_trip()
+    test_regenerate_bars()
+    test_regenerate_bars_task_replays_edits()
+    test_arrangement_regenerate_block()
+    test_regenerate_block_task()
@@ -0,0 +1,132 @@
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.generation_executor import GenerationExecutor, GenerationQueueFull, generate_midi_task
+from services import single_flight
+from services.generation_cache import GenerationCache
+from services.single_flight import SingleFlight, cached_generation
+from utils.metrics import metrics
+
+PARAMS = dict(description="techno kick", style="techno", instrument="kick", bars=2, seed=7)
+
+
+def test_identical_requests_share_one_run():
+    flights = SingleFlight()
+    executor = GenerationExecutor(kind='thread', workers=2, queue_size=8)
+    calls = []
+    release = threading.Event()
+
+    def slow_generate(params):
+        calls.append(params['seed'])
+        release.wait(5)
+        return generate_midi_task(params)
+
+    async def request(params):
+        key = flights.key("generate_midi", params)
+        return await flights.run(key, lambda: executor.run(slow_generate, params), task="generate_midi")
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(request(dict(PARAMS))) for _ in range(5)]
+        other = asyncio.ensure_future(request(dict(PARAMS, seed=8)))
+        await asyncio.sleep(0.05)
+        assert flights.in_flight == 2
+        release.set()
+        return await asyncio.gather(*waiters), await other
+
+    coalesced = metrics.counter("generation_singleflight_total", task="generate_midi", role="coalesced")
+    before = coalesced.value
+    try:
+        results, other = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert sorted(calls) == [7, 8]
+    assert all(result is results[0] for result in results)
+    assert other.midi_bytes != results[0].midi_bytes
+    assert flights.stats() == {'in_flight': 0, 'leaders': 2, 'coalesced': 4}
+    assert coalesced.value == before + 4
+    print("✅ 5 identical concurrent requests -> 1 generation")
+
+
+def test_unseeded_cancelled_and_failed_requests():
+    flights = SingleFlight()
+    assert flights.key("generate_midi", dict(PARAMS, seed=None)) is None
+    runs = []
+
+    async def compute(value, delay=0.05):
+        runs.append(value)
+        await asyncio.sleep(delay)
+        return value
+
+    async def fail():
+        runs.append('fail')
+        await asyncio.sleep(0.01)
+        raise GenerationQueueFull(1, 1)
+
+    async def scenario():
+        # No key: never coalesced
+        assert await asyncio.gather(flights.run(None, lambda: compute(1)), flights.run(None, lambda: compute(2))) == [1, 2]
+
+        # The leader's client goes away: the follower still gets the result
+        leader = asyncio.ensure_future(flights.run("k", lambda: compute(3)))
+        follower = asyncio.ensure_future(flights.run("k", lambda: compute(4)))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == 3
+
+        # Failures reach every waiter, and the key is free again afterwards
+        outcomes = await asyncio.gather(flights.run("e", fail), flights.run("e", fail), return_exceptions=True)
+        assert all(isinstance(outcome, GenerationQueueFull) for outcome in outcomes)
+        assert await flights.run("e", lambda: compute(5, 0)) == 5
+
+    asyncio.run(scenario())
+    assert runs == [1, 2, 3, 'fail', 5] and flights.in_flight == 0
+    print("✅ unseeded requests run alone; cancellation and errors handled per waiter")
+
+
+def test_served_results_carry_their_own_time():
+    release = threading.Event()
+
+    def slow_generate(params):
+        release.wait(5)
+        return generate_midi_task(params)
+
+    async def scenario():
+        leader = asyncio.ensure_future(cached_generation("generate_midi", slow_generate, dict(PARAMS)))
+        follower = asyncio.ensure_future(cached_generation("generate_midi", slow_generate, dict(PARAMS)))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await leader, await follower, await cached_generation("generate_midi", slow_generate, dict(PARAMS))
+
+    executor = GenerationExecutor(kind='thread', workers=1, queue_size=4)
+    saved = single_flight.generation_cache, single_flight.generation_executor, single_flight.generation_flights
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GenerationCache(cache_dir=tmp)
+        single_flight.generation_cache, single_flight.generation_executor = cache, executor
+        single_flight.generation_flights = SingleFlight()
+        try:
+            generated, follower, hit = asyncio.run(scenario())
+        finally:
+            single_flight.generation_cache, single_flight.generation_executor, single_flight.generation_flights = saved
+            executor.shutdown()
+        stored = cache.get(cache.key("generate_midi", PARAMS))
+
+    assert not generated.cached and generated.generation_ms is not None
+    # The follower waited for the leader's run; the repeat was a cache hit
+    assert follower.cached and follower.generation_ms >= 40
+    assert hit.cached and hit.generation_ms < follower.generation_ms
+    assert follower.midi_bytes == hit.midi_bytes == generated.midi_bytes
+    # The shared cache entry keeps the original run's values
+    assert not stored.cached and stored.generation_ms == generated.generation_ms
+    print("✅ cached and coalesced results record this request's time, flagged cached")
+
+
+if __name__ == "__main__":
+    test_identical_requests_share_one_run()
+    test_unseeded_cancelled_and_failed_requests()
+    test_served_results_carry_their_own_time()
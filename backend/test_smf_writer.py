@@ -0,0 +1,114 @@
+import sys
+import os
+import io
+import random
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+import mido
+from mido.midifiles.meta import encode_variable_int
+
+import numpy as np
+
+from services.midi_splice import TrackEncoder, encode_track
+from services.smf_writer import (
+    META_MARKER, NOTE_OFF, NOTE_ON, SmfStreamWriter, encode_channel_events, encode_file, encode_vlq,
+    meta_message, midi_file_bytes, tempo_event, track_count
+)
+from services.integrated_midi_generator import IntegratedMidiGenerator
+
+CASES = [
+    ('techno', 'kick', 4), ('techno', 'drums', 8), ('trap', 'hihat', 2), ('house', 'bass', 4),
+    ('lofi', 'chords', 4), ('dnb', 'drums', 16), ('house', 'melody', 8),
+]
+
+
+def test_vlq_matches_mido():
+    values = [0, 1, 127, 128, 255, 16383, 16384, 2097151, 2097152, 0x0FFFFFFF]
+    values += [random.Random(1).randrange(0, 0x0FFFFFFF) for _ in range(200)]
+    for value in values:
+        assert encode_vlq(value) == bytes(encode_variable_int(value)), value
+    print("✅ VLQ encoding matches mido")
+
+
+def test_channel_events_match_mido():
+    rng = random.Random(7)
+    rows = []
+    for _ in range(500):
+        rows.append((rng.choice([0, 0, 1, 60, 200, 20000, 3000000]), rng.choice([NOTE_ON, NOTE_OFF]) | rng.choice([0, 9]),
+                     rng.randrange(128), rng.randrange(128)))
+
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(133)))
+    for delta, status, note, velocity in rows:
+        track.append(mido.Message('note_on' if status & 0xF0 == NOTE_ON else 'note_off',
+                                  channel=status & 0x0F, note=note, velocity=velocity, time=delta))
+    reference = mido.MidiFile()
+    reference.tracks.append(track)
+
+    deltas, status, notes, velocities = zip(*rows)
+    body = tempo_event(mido.bpm2tempo(133)) + encode_channel_events(deltas, status, notes, velocities)
+    data = encode_file([body])
+    assert data == midi_file_bytes(reference)
+    assert track_count(data) == 1
+    print("✅ running-status channel events byte-identical to mido")
+
+
+def test_generator_bytes_match_mido():
+    generator = IntegratedMidiGenerator(enable_humanization=True)
+    for style, instrument, bars in CASES:
+        for seed in (1, 42):
+            params = dict(description=f"{style} {instrument}", style=style, instrument=instrument,
+                          bars=bars, seed=seed, bpm=127)
+            midi, _ = generator.generate(**params)
+            data, used_seed = generator.generate(output='bytes', **params)
+            assert used_seed == seed
+            assert data == midi_file_bytes(midi), (style, instrument, bars, seed)
+    print(f"✅ native encoder output identical to mido for {len(CASES) * 2} generations")
+
+
+def test_out_of_range_rejected():
+    try:
+        encode_channel_events([0], [NOTE_ON], [128], [100])
+        raise AssertionError("note 128 should be rejected")
+    except ValueError:
+        pass
+    print("✅ out-of-range data bytes rejected")
+
+
+def test_windowed_encoding_and_stream_writer():
+    rng = np.random.default_rng(3)
+    starts = np.sort(rng.integers(0, 64 * 480, 400))
+    notes = np.column_stack([starts, starts + rng.integers(0, 8 * 480, 400),  # some ring for bars
+                             rng.integers(0, 3, 400), rng.integers(30, 90, 400), rng.integers(1, 128, 400)])
+    markers = [(bar * 1920, meta_message(META_MARKER, f"bar {bar}".encode())) for bar in range(1, 16)]
+    whole = [encode_track(notes, markers), encode_track(notes[::2])]
+
+    out = io.BytesIO()
+    with SmfStreamWriter(out, ticks_per_beat=480, spool_bytes=64) as writer:  # tiny spool: goes to disk
+        tracks = [TrackEncoder(writer.track().write), TrackEncoder(writer.track().write)]
+        for window in range(0, 64 * 480, 1920):
+            in_window = (notes[:, 0] >= window) & (notes[:, 0] < window + 1920)
+            tracks[0].add(notes[in_window], [(tick, m) for tick, m in markers if window <= tick < window + 1920])
+            tracks[1].add(notes[::2][in_window[::2]])
+            for track in tracks:
+                track.flush(until=window + 1920)
+        for track in tracks:
+            track.flush()
+    assert out.getvalue() == encode_file(whole)
+    assert writer.bytes_written == len(out.getvalue())
+
+    try:
+        tracks[0].add(notes[:1])
+        raise AssertionError("event before the flushed window should be rejected")
+    except ValueError:
+        pass
+    print("✅ windowed track encoding + streamed chunks identical to whole-file encoding")
+
+
+if __name__ == "__main__":
+    test_vlq_matches_mido()
+    test_channel_events_match_mido()
+    test_generator_bytes_match_mido()
+    test_out_of_range_rejected()
+    test_windowed_encoding_and_stream_writer()
@@ -0,0 +1,99 @@
+import sys
+import os
+import asyncio
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, inspect
+
+from database import add_missing_columns
+from services.generation_executor import GenerationExecutor, generate_arrangement_task, generate_midi_task
+from utils.metrics import MetricsRegistry, metrics
+from utils.stage_timer import STAGE_HISTOGRAM, StageTimer, collect_stages
+
+DNA_STAGES = ['base_rhythm', 'ghost_notes', 'phrasing', 'pitch', 'groove', 'production',
+              'section_post', 'humanize', 'encode']
+
+
+def test_laps_and_collection():
+    registry = MetricsRegistry()
+    with collect_stages() as timings:
+        timer = StageTimer(registry)
+        timer.lap('a')
+        timer.lap('b')
+        timer.lap('a')
+    timer.lap('outside')  # not collected, still exported
+
+    assert set(timings.stages) == {'a', 'b'}
+    assert timings.total >= sum(timings.stages.values())
+    assert registry.histogram(STAGE_HISTOGRAM, stage='a').count == 2
+    assert registry.histogram(STAGE_HISTOGRAM, stage='outside').count == 1
+    print("✅ stage laps exported and collected per request")
+
+
+def test_generation_stages():
+    metrics.reset()
+    result = generate_midi_task(dict(description="techno drums", style="techno", instrument="drums",
+                                     sub_option="drop", bars=4, seed=3))
+    assert result.generation_ms is not None
+    assert list(result.stages_ms) == DNA_STAGES
+    for stage in DNA_STAGES:
+        assert metrics.histogram(STAGE_HISTOGRAM, stage=stage).count == 1
+
+    # Optional stages are only recorded when they run
+    result = generate_midi_task(dict(description="techno bass", style="techno", instrument="bass",
+                                     bars=4, seed=3, humanize=False, passing_tones=True))
+    assert 'passing_tones' in result.stages_ms
+    assert 'humanize' not in result.stages_ms and 'ghost_notes' not in result.stages_ms
+    print(f"✅ generation stages: {result.stages_ms} ({result.generation_ms} ms)")
+
+
+def test_arrangement_stages():
+    metrics.reset()
+    result = generate_arrangement_task(dict(structure=[{'type': 'intro', 'bars': 4}], style='techno'))
+    # One block per track, each generated with its own timed pipeline
+    assert metrics.histogram(STAGE_HISTOGRAM, stage='arrangement_block').count == 4
+    assert {'arrangement_block', 'stitch', 'encode'} <= set(result.stages_ms)
+    print(f"✅ arrangement stages recorded ({result.generation_ms} ms)")
+
+
+def test_process_executor_exports_stages():
+    metrics.reset()
+    executor = GenerationExecutor(kind='process', workers=1, queue_size=2)
+    try:
+        result = asyncio.run(executor.run(generate_midi_task, dict(
+            description="techno drums", style="techno", instrument="drums", bars=2, seed=3)))
+    finally:
+        executor.shutdown()
+    # Timed in the worker process, exported by the API process that awaited it
+    for stage in result.stages_ms:
+        assert metrics.histogram(STAGE_HISTOGRAM, stage=stage).count == 1, stage
+    print("✅ stages timed in worker processes reach this process's histograms")
+
+
+def test_add_missing_columns():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/old.db")
+        old = MetaData()
+        Table('generations', old, Column('id', Integer, primary_key=True), Column('description', String))
+        old.create_all(engine)
+
+        new = MetaData()
+        Table('generations', new, Column('id', Integer, primary_key=True), Column('description', String),
+              Column('generation_time_ms', Integer, nullable=True))
+        add_missing_columns(new, bind=engine)
+        add_missing_columns(new, bind=engine)  # idempotent
+
+        columns = {column['name'] for column in inspect(engine).get_columns('generations')}
+        assert 'generation_time_ms' in columns
+        engine.dispose()
+    print("✅ new nullable columns added to existing tables")
+
+
+if __name__ == "__main__":
+    test_laps_and_collection()
+    test_generation_stages()
+    test_arrangement_stages()
+    test_process_executor_exports_stages()
+    test_add_missing_columns()
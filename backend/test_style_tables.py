@@ -0,0 +1,46 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services import style_tables
+from services.style_patterns import MUSIC_STYLES, StylePatterns
+
+STYLES = list(style_tables.STYLES) + ['Techno', 'JAZZ', 'hiphop', 'unknown_style']
+INSTRUMENTS = list(style_tables.VOICES) + ['hihat', 'clap', 'Kick', 'open_hat', 'ride_cymbal', 'melody', 'lead', 'Bass']
+
+
+def test_tables_shape_and_readonly():
+    assert style_tables.PATTERNS.shape == (len(style_tables.STYLES), len(style_tables.VOICES) + 1, 16)
+    assert style_tables.PATTERNS.dtype.name == 'uint8'
+    assert not style_tables.PATTERNS[:, style_tables.SILENT].any()
+    try:
+        style_tables.PATTERNS[0, 0, 0] = 1
+        raise AssertionError("style tables must be read-only")
+    except ValueError:
+        pass
+    print("✅ dense read-only (styles x voices x 16) pattern table")
+
+
+def test_patterns_match_get_pattern():
+    for style in STYLES:
+        for instrument in INSTRUMENTS:
+            assert style_tables.pattern(style, instrument).tolist() == StylePatterns.get_pattern(style, instrument), \
+                (style, instrument)
+    print(f"✅ table lookups match StylePatterns.get_pattern ({len(STYLES) * len(INSTRUMENTS)} combinations)")
+
+
+def test_metadata_arrays():
+    for style in STYLES:
+        assert style_tables.style_swing(style) == MUSIC_STYLES.get(style, {'swing': 0.0}).get('swing', 0.0)
+        assert style_tables.has_patterns(style) == (style in StylePatterns.PATTERNS)
+        if style in MUSIC_STYLES:
+            assert style_tables.style_bpm(style) == MUSIC_STYLES[style]['bpm']
+            assert style_tables.style_energy(style) == MUSIC_STYLES[style]['energy']
+    print("✅ swing / BPM / energy arrays match MUSIC_STYLES")
+
+
+if __name__ == "__main__":
+    test_tables_shape_and_readonly()
+    test_patterns_match_get_pattern()
+    test_metadata_arrays()
@@ -0,0 +1,92 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from services.advanced_midi_generator import AdvancedPatternGenerator, PatternDNA
+from services.arrangement_service import ArrangementService
+from services.event_buffer import EventBuffer
+from services.generation_context import GenerationContext
+from services.integrated_midi_generator import IntegratedMidiGenerator
+from services.midi_splice import PITCH, START, track_notes
+from services.smf_writer import META, META_MARKER, split_file
+
+DNA = PatternDNA(density=0.8, complexity=0.9, groove=0.2, velocity_curve='accent', evolution=0.3)
+STRUCTURE = [{'type': 'intro', 'bars': 2}, {'type': 'drop', 'bars': 4}, {'type': 'outro', 'bars': 2}]
+
+
+def test_pattern_buffer_matches_dicts():
+    generator = AdvancedPatternGenerator()
+    for style, instrument in [('techno', 'full_kit'), ('jazz', 'drums'), ('house', 'chords'),
+                              ('trap', 'hat'), ('pop', 'arp'), ('latin', 'pad')]:
+        dicts = generator.generate_pattern_with_dna(style, instrument, DNA, 2, ctx=GenerationContext(11))
+        buffer = generator.generate_pattern_buffer(style, instrument, DNA, 2, ctx=GenerationContext(11))
+        expected = EventBuffer.from_dicts(dicts)
+        for name in EventBuffer.COLUMNS:
+            assert getattr(buffer, name).tolist() == getattr(expected, name).tolist(), (style, instrument, name)
+
+        # Integer grid: the same pattern at any PPQ, exactly proportional
+        for ppq in [96, 960]:
+            scaled = generator.generate_pattern_buffer(style, instrument, DNA, 2, ctx=GenerationContext(11), ppq=ppq)
+            assert scaled.ppq == ppq and scaled.time.dtype == np.int64
+            assert (scaled.time * 480).tolist() == (buffer.time * ppq).tolist()
+            assert (scaled.duration * 480).tolist() == (buffer.duration * ppq).tolist()
+    print("✅ pattern grids are rendered in exact ticks at any PPQ")
+
+
+def test_generator_resolution():
+    generator = IntegratedMidiGenerator()
+    for instrument, sub_option in [('drums', 'chorus'), ('bass', 'groove_bass'), ('lead', 'arp'), ('pad', 'chords')]:
+        params = dict(description=f"house {instrument}", style='house', instrument=instrument,
+                      sub_option=sub_option, bars=4, seed=5)
+        default, _ = generator.generate(output='notes', **params)
+        fine, _ = generator.generate(output='notes', ppq=960, **params)
+        assert split_file(generator.generate(output='bytes', ppq=960, **params)[0])[1] == 960
+        assert generator.generate(ppq=960, **params)[0].ticks_per_beat == 960
+
+        # Same notes; swing, groove jitter and humanization each round to a whole tick
+        assert sorted(fine[:, PITCH].tolist()) == sorted(default[:, PITCH].tolist()), instrument
+        assert np.abs(np.sort(fine[:, START]) - 2 * np.sort(default[:, START])).max() <= 3, instrument
+
+    assert IntegratedMidiGenerator(ppq=96).generate(output='bytes', **params)[0][12:14] == (96).to_bytes(2, 'big')
+    for bad in (100, 0):
+        try:
+            generator.generate(ppq=bad, **params)
+            assert False, f"PPQ {bad} accepted"
+        except ValueError:
+            pass
+    print("✅ generator timeline and output at the requested PPQ")
+
+
+def test_arrangement_and_edits_keep_resolution():
+    service = ArrangementService(ppq=960)
+    data = service.generate_arrangement(STRUCTURE, 'techno', seed=4, output='bytes')
+    _, ticks_per_beat, bodies = split_file(data)
+    offsets = service.block_offsets(STRUCTURE, 960)
+    assert ticks_per_beat == 960 and offsets[-1] == 8 * 4 * 960
+    _, others = track_notes(bodies[0])
+    assert [tick for tick, event in others if event[:2] == bytes([META, META_MARKER])] == offsets[1:]
+
+    # Block edits render at the stored file's resolution, whatever the service default
+    edited, _ = ArrangementService().regenerate_block(data, STRUCTURE, 1, 'techno', seed=4, block_seed=9)
+    assert split_file(edited)[1] == 960
+    for body in split_file(edited)[2]:
+        notes, _ = track_notes(body)
+        assert notes[:, START].max(initial=0) < offsets[-1]
+
+    generator = IntegratedMidiGenerator()
+    pattern = dict(description="techno drums", style='techno', instrument='drums', bars=4)
+    base, _ = generator.generate(seed=1, output='bytes', ppq=960, **pattern)
+    edited, _ = generator.regenerate_bars(base, [3], seed=2, **pattern)
+    kept = lambda data: track_notes(split_file(data)[2][0])[0]
+    first_bars = lambda notes: notes[notes[:, START] < 3 * 4 * 960].tolist()
+    assert split_file(edited)[1] == 960 and first_bars(kept(edited)) == first_bars(kept(base))
+    print("✅ arrangements and edits keep their PPQ")
+
+
+if __name__ == "__main__":
+    test_pattern_buffer_matches_dicts()
+    test_generator_resolution()
+    test_arrangement_and_edits_keep_resolution()
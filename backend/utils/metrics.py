@@ -0,0 +1,170 @@
+import bisect
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+
+def _nearest_rank(sorted_samples: List[float], q: float) -> Optional[float]:
+    if not sorted_samples:
+        return None
+    index = int(round(q / 100.0 * (len(sorted_samples) - 1)))
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, index))]
+
+
+class Counter:
+    """Monotonic counter."""
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down (queue depth, in-flight requests...)."""
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """
+    Bucketed histogram (cumulative counts, Prometheus style) plus a bounded
+    reservoir of recent samples for p50/p90/p99.
+    """
+    # Seconds: covers a 1 ms pattern up to a long arrangement
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets: Optional[Iterable[float]] = None, reservoir_size: int = 2048):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._bucket_counts: List[int] = [0] * (len(self.buckets) + 1)  # last = +Inf
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent: Deque[float] = deque(maxlen=reservoir_size)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+            self._recent.append(value)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentile (0-100) over the recent-sample reservoir."""
+        with self._lock:
+            samples = sorted(self._recent)
+        return _nearest_rank(samples, q)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = sorted(self._recent)
+            bucket_counts = list(self._bucket_counts)
+            count, total, maximum = self._count, self._sum, self._max
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], bucket_counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+
+        return {
+            'count': count,
+            'sum': total,
+            'mean': (total / count) if count else None,
+            'max': maximum if count else None,
+            'p50': _nearest_rank(samples, 50),
+            'p90': _nearest_rank(samples, 90),
+            'p99': _nearest_rank(samples, 99),
+            'buckets': cumulative,
+        }
+
+
+def _metric_key(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry of named metrics. Metrics are created on first use:
+
+        metrics.counter("generation_rejected_total", task="midi").inc()
+        metrics.histogram("generation_run_seconds", task="midi").observe(0.12)
+    """
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, store: Dict, key: str, factory):
+        metric = store.get(key)
+        if metric is None:
+            with self._lock:
+                metric = store.get(key)
+                if metric is None:
+                    metric = factory()
+                    store[key] = metric
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get_or_create(self._counters, _metric_key(name, labels), Counter)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get_or_create(self._gauges, _metric_key(name, labels), Gauge)
+
+    def histogram(self, name: str, buckets: Optional[Iterable[float]] = None, **labels) -> Histogram:
+        return self._get_or_create(self._histograms, _metric_key(name, labels), lambda: Histogram(buckets))
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+        return {
+            'counters': {k: c.value for k, c in sorted(counters.items())},
+            'gauges': {k: g.value for k, g in sorted(gauges.items())},
+            'histograms': {k: h.snapshot() for k, h in sorted(histograms.items())},
+        }
+
+    def reset(self) -> None:
+        """Drop every metric (used by tests and benchmarks)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Shared registry for the whole backend process
+metrics = MetricsRegistry()
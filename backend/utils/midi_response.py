@@ -0,0 +1,83 @@
+"""
+Inline MIDI responses for the generation endpoints.
+
+By default a generate call writes the .mid under STORAGE_DIR and returns JSON
+with a URL the client fetches in a second round trip. With `?inline=1` (or an
+`Accept: audio/midi` header) the encoded bytes are returned in the response
+body instead; the file + history row are written by a background task after
+the response is sent, or skipped entirely with `?persist=0` (previews).
+"""
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from database import SessionLocal
+from models import models
+
+logger = logging.getLogger(__name__)
+
+MIDI_MEDIA_TYPE = "audio/midi"
+
+# Response headers carrying what the JSON body would have contained
+INLINE_HEADERS = ["Content-Disposition", "X-Generation-Seed", "X-Generation-Url", "X-Generation-Tracks"]
+
+
+def wants_inline(request: Request, inline: bool = False) -> bool:
+    """?inline=1, or the client explicitly accepts audio/midi."""
+    return inline or MIDI_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def midi_response(midi_bytes: bytes, filename: str, seed: Optional[int] = None,
+                  url: Optional[str] = None, tracks: Optional[int] = None) -> Response:
+    headers: Dict[str, str] = {"Content-Disposition": f'inline; filename="{filename}"'}
+    if seed is not None:
+        headers["X-Generation-Seed"] = str(seed)
+    if url is not None:
+        headers["X-Generation-Url"] = url
+    if tracks is not None:
+        headers["X-Generation-Tracks"] = str(tracks)
+    return Response(content=midi_bytes, media_type=MIDI_MEDIA_TYPE, headers=headers)
+
+
+def generation_params(task: str, params: Dict[str, Any], **overrides) -> Dict[str, Any]:
+    """Generation.params value: the executor task and the parameters (incl. seed) that reproduce the file."""
+    return {'task': task, 'params': {**params, **overrides}}
+
+
+def stored_midi_bytes(db, generation: models.Generation) -> Optional[bytes]:
+    """
+    The .mid written for `generation`, or None if it is gone or was overwritten
+    by a later generation saved under the same filename (callers then re-render
+    it from generation.params).
+    """
+    path = Path(generation.file_path)
+    overwritten = db.query(models.Generation.id).filter(
+        models.Generation.file_path == generation.file_path,
+        models.Generation.id > generation.id
+    ).first()
+    if overwritten or not path.exists():
+        return None
+    return path.read_bytes()
+
+
+def persist_generation(file_path: Path, midi_bytes: bytes, description: str, user_id: int,
+                       generation_ms: Optional[int] = None, params: Optional[Dict[str, Any]] = None,
+                       cached: bool = False) -> None:
+    """
+    Write the file and its history row. Runs as a BackgroundTask after an inline
+    response, so it opens its own DB session instead of reusing the request's.
+    """
+    try:
+        file_path.write_bytes(midi_bytes)
+        db = SessionLocal()
+        try:
+            db.add(models.Generation(description=description, file_path=str(file_path), user_id=user_id,
+                                     generation_time_ms=generation_ms, cached=cached, params=params))
+            db.commit()
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Deferred save of {file_path.name} failed: {e}", exc_info=True)
@@ -0,0 +1,117 @@
+"""
+Per-stage timing for the generation pipeline.
+
+Every stage of a generation (base rhythm, ghost notes, phrasing, pitch, groove,
+encode...) is timed with perf_counter and observed into the
+`generation_stage_seconds{stage=...}` histogram, always on. A StageTimer marks
+the end of each stage with `lap()`, so instrumenting a pipeline is one line per
+stage:
+
+    timer = StageTimer()
+    events = render_base(...)
+    timer.lap('base_rhythm')
+    events = apply_groove(events)
+    timer.lap('groove')
+
+To get the numbers for one request (e.g. to store on its history row), wrap
+the work in `collect_stages()`; every lap taken inside it, including those of
+nested generations (an arrangement's blocks), is summed per stage:
+
+    with collect_stages() as timings:
+        data, seed = generator.generate(...)
+    timings.total_ms, timings.stages_ms
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from utils.metrics import MetricsRegistry, metrics
+
+STAGE_HISTOGRAM = "generation_stage_seconds"
+
+
+class StageTimings:
+    """Stage durations (seconds) collected for one request."""
+
+    __slots__ = ('stages', 'total')
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.total = 0.0
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @property
+    def total_ms(self) -> int:
+        return int(round(self.total * 1000))
+
+    @property
+    def stages_ms(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+_active: ContextVar[Optional[StageTimings]] = ContextVar('generation_stage_timings', default=None)
+
+
+class StageTimer:
+    """
+    Lap timer for one pass through a pipeline. Each `lap(stage)` records the time
+    since the previous lap (or since the timer was created).
+    """
+
+    __slots__ = ('_registry', '_last')
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self._registry = registry or metrics
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self._registry.histogram(STAGE_HISTOGRAM, stage=stage).observe(elapsed)
+        timings = _active.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+        return elapsed
+
+    def reset(self) -> None:
+        """Start the next lap now (excludes work that belongs to no stage)."""
+        self._last = time.perf_counter()
+
+
+def export_stages(stages: Dict[str, float], registry: Optional[MetricsRegistry] = None) -> None:
+    """
+    Observe stage seconds measured in another process into this process's
+    histograms. Laps on a process-pool worker only reach the worker's own
+    registry, so the parent exports the collected stages it gets back.
+    """
+    registry = registry or metrics
+    for stage, seconds in stages.items():
+        registry.histogram(STAGE_HISTOGRAM, stage=stage).observe(seconds)
+
+
+def record_stages(stages: Dict[str, float]) -> None:
+    """
+    Add stage seconds measured elsewhere (e.g. collected on a pool worker) to the
+    current collection, if any. This does not export them: see export_stages.
+    """
+    timings = _active.get()
+    if timings is not None:
+        for stage, seconds in stages.items():
+            timings.add(stage, seconds)
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTimings]:
+    """Collect every lap taken in this context; `total` is the wall time of the block."""
+    timings = StageTimings()
+    token = _active.set(timings)
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings.total = time.perf_counter() - started
+        _active.reset(token)